@@ -1,10 +1,14 @@
+import ipaddress
 import json
 from pathlib import Path
+from typing import Literal
 
 import structlog
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator, model_validator
 from pydantic_settings import BaseSettings
 
+from app.src.models import RecordType
+
 logger = structlog.get_logger()
 
 
@@ -12,22 +16,253 @@ class DNSRecordConfig(BaseModel):
     name: str = Field(..., description="DNS record name")
     proxied: bool = Field(default=False, description="Whether to proxy through Cloudflare")
     ttl: int = Field(default=300, description="DNS record TTL in seconds")
+    comment: str | None = Field(default=None, description="Record comment to enforce; unset leaves it unmanaged")
+    type: Literal["A", "AAAA", "both"] = Field(
+        default="A",
+        description="Record type to manage; 'both' keeps an A and an AAAA record of this name",
+    )
+    ipv6_suffix: str | None = Field(
+        default=None,
+        description="Host part combined with the detected IPv6 prefix instead of using the detected address",
+    )
+    priority: int = Field(default=0, description="Records with a higher priority are written first after an IP change")
+    verify_interval: int | None = Field(
+        default=None,
+        ge=1,
+        description="Seconds between read-backs of this record from Cloudflare; unset follows DRIFT_CHECK_INTERVAL",
+    )
+
+    @field_validator("ipv6_suffix")
+    @classmethod
+    def _check_ipv6_suffix(cls, value: str | None) -> str | None:
+        if value is not None:
+            ipaddress.IPv6Address(value)
+        return value
+
+    @property
+    def record_types(self) -> list[RecordType]:
+        return ["A", "AAAA"] if self.type == "both" else [self.type]
+
+
+class ZoneConfig(BaseModel):
+    zone_id: str | None = Field(default=None, description="Cloudflare Zone ID")
+    zone_name: str | None = Field(default=None, description="Zone name, resolved to its ID when zone_id is unset")
+    api_token: str | None = Field(default=None, description="API token for this zone (defaults to the global one)")
+    records: list[DNSRecordConfig] = Field(..., description="List of DNS records to manage in this zone")
+
+    @model_validator(mode="after")
+    def _check_zone(self) -> "ZoneConfig":
+        if not self.zone_id and not self.zone_name:
+            msg = "Each zone needs a zone_id or a zone_name"
+            raise ValueError(msg)
+        return self
+
+    @property
+    def key(self) -> str:
+        return self.zone_id or f"name:{self.zone_name}"
 
 
 class DNSRecordsConfig(BaseModel):
-    records: list[DNSRecordConfig] = Field(..., description="List of DNS records to manage")
+    records: list[DNSRecordConfig] = Field(
+        default_factory=list,
+        description="DNS records in the zone given by CLOUDFLARE_ZONE_ID",
+    )
+    zones: list[ZoneConfig] = Field(default_factory=list, description="DNS records grouped by zone")
+
+    @model_validator(mode="after")
+    def _check_not_empty(self) -> "DNSRecordsConfig":
+        if not self.records and not self.zones:
+            msg = "At least one record or zone must be configured"
+            raise ValueError(msg)
+        return self
 
 
 class Config(BaseSettings):
-    cloudflare_api_token: str = Field(..., description="Cloudflare API token")
-    cloudflare_zone_id: str = Field(..., description="Cloudflare Zone ID")
+    cloudflare_api_token: str | None = Field(default=None, description="Cloudflare API token")
+    cloudflare_zone_id: str | None = Field(default=None, description="Cloudflare Zone ID")
     records_config_path: str = Field(
         default="./config/records.json",
         description="Path to DNS records configuration file (JSON)",
     )
     update_interval: int = Field(default=300, description="Update check interval in seconds")
+    records_watch_interval: float = Field(
+        default=5.0,
+        ge=0,
+        description="Seconds between checks of the records file for changes to reload (0 reloads on SIGHUP only)",
+    )
+    bulk_fetch: bool = Field(
+        default=True,
+        description="Fetch all zone records once per cycle instead of one lookup per record",
+    )
+    records_page_size: int = Field(default=1000, description="Page size used when listing zone records in bulk")
+    max_concurrency: int = Field(default=10, ge=1, description="Maximum number of records reconciled concurrently")
+    batch_updates: bool = Field(
+        default=False,
+        description="Submit the creates and updates of a cycle through the zone's batch endpoint",
+    )
+    batch_size: int = Field(default=200, ge=1, description="Maximum number of changes per batch request")
+    api_rate_limit: int = Field(
+        default=1200,
+        ge=1,
+        description="Cloudflare API requests allowed per API_RATE_LIMIT_PERIOD (Cloudflare's global per-user limit)",
+    )
+    api_rate_limit_period: float = Field(default=300.0, gt=0, description="Window of API_RATE_LIMIT in seconds")
+    api_max_retries: int = Field(
+        default=4,
+        ge=0,
+        description="Retries of a Cloudflare request that was rate limited or failed transiently",
+    )
+    retry_interval: int = Field(
+        default=15,
+        ge=1,
+        description="Seconds before failed records are retried, doubling per failed attempt up to UPDATE_INTERVAL",
+    )
+    state_path: str | None = Field(
+        default=None,
+        description="Optional JSON file caching the last applied IP and record state across restarts",
+    )
+    state_max_age: int = Field(
+        default=86400,
+        description="Seconds after which cached record state is re-verified against Cloudflare",
+    )
+    drift_check_interval: int = Field(
+        default=3600,
+        ge=1,
+        description="Seconds between sweeps that re-read every record and correct content, ttl, proxied or comment",
+    )
+    ip_detector: Literal["http", "dns", "interface", "push"] = Field(
+        default="http",
+        description=(
+            "How the public IP is detected: HTTPS providers, a UDP DNS query, a local interface, "
+            "or only dyndns2 pushes from the router"
+        ),
+    )
+    ip_interface: str | None = Field(
+        default=None,
+        description="Network interface holding the public address (required for the interface detector)",
+    )
+    ipv6_prefix_length: int = Field(
+        default=64,
+        ge=0,
+        le=128,
+        description="Length of the detected IPv6 prefix kept when a record sets an ipv6_suffix",
+    )
+    ip_hedge_delay: float = Field(
+        default=1.0,
+        ge=0,
+        description="Seconds to wait for an IP provider before also querying the next one (0 queries all at once)",
+    )
+    ip_provider_cooldown: float = Field(
+        default=300.0,
+        description="Seconds a repeatedly failing IP provider is skipped before it is tried again",
+    )
+    ip_provider_stats_path: str | None = Field(
+        default=None,
+        description="Optional JSON file used to persist IP provider statistics across restarts",
+    )
+    http_port: int | None = Field(
+        default=None,
+        ge=0,
+        le=65535,
+        description="Port of the built-in HTTP server (/metrics, /healthz, /readyz, /status); unset disables it",
+    )
+    http_host: str = Field(default="0.0.0.0", description="Address the built-in HTTP server binds to")  # noqa: S104
+    dyndns_username: str | None = Field(
+        default=None,
+        description="Basic-auth user for the dyndns2 /nic/update endpoint; unset disables the endpoint",
+    )
+    dyndns_password: str | None = Field(default=None, description="Basic-auth password for /nic/update")
+    dyndns_coalesce_delay: float = Field(
+        default=2.0,
+        ge=0,
+        description="Seconds to collect further dyndns2 pushes before applying them in one cycle",
+    )
+    lease_path: str | None = Field(
+        default=None,
+        description="File shared by replicas to elect the one that updates records; unset runs without coordination",
+    )
+    lease_duration: float = Field(
+        default=30.0,
+        gt=0,
+        description="Seconds a replica's lease lasts; a follower takes over within this long after the leader stops",
+    )
+    ready_max_missed_cycles: int = Field(
+        default=3,
+        ge=1,
+        description="Update intervals without a successful cycle after which /readyz reports not ready",
+    )
+
+    log_format: Literal["console", "json"] = Field(
+        default="console",
+        description="Log output: coloured lines for humans, or one JSON object per line written from a queue",
+    )
+    log_sample_rate: int = Field(
+        default=1,
+        ge=1,
+        description="Log only one in N of the repetitive 'IP unchanged' and 'Record already up to date' lines",
+    )
+    log_queue_size: int = Field(
+        default=10000,
+        ge=1,
+        description="Rendered log lines buffered for the JSON writer; lines beyond it are dropped and counted",
+    )
+
+    @model_validator(mode="after")
+    def _check_ip_interface(self) -> "Config":
+        if self.ip_detector == "interface" and not self.ip_interface:
+            msg = "IP_INTERFACE is required when IP_DETECTOR=interface"
+            raise ValueError(msg)
+        return self
+
+    @model_validator(mode="after")
+    def _check_dyndns(self) -> "Config":
+        if bool(self.dyndns_username) != bool(self.dyndns_password):
+            msg = "DYNDNS_USERNAME and DYNDNS_PASSWORD must be set together"
+            raise ValueError(msg)
+        if self.ip_detector == "push" and not (self.dyndns_enabled and self.http_port is not None):
+            msg = "IP_DETECTOR=push requires HTTP_PORT, DYNDNS_USERNAME and DYNDNS_PASSWORD"
+            raise ValueError(msg)
+        return self
+
+    @property
+    def dyndns_enabled(self) -> bool:
+        return bool(self.dyndns_username and self.dyndns_password)
+
+    @property
+    def reverify_interval(self) -> int:
+        """Seconds cached record state is trusted before every record is read back from Cloudflare."""
+        return min(self.state_max_age, self.drift_check_interval)
 
     def load_dns_records(self) -> list[DNSRecordConfig]:
+        return [record for zone in self.load_zones() for record in zone.records]
+
+    def load_zones(self) -> list[ZoneConfig]:
+        """Load the records file as zone groups, each with the API token it should use.
+
+        Top-level ``records`` belong to ``CLOUDFLARE_ZONE_ID``; zones without their own ``api_token``
+        use ``CLOUDFLARE_API_TOKEN``.
+        """
+        records_config = self._read_records_config()
+        zones = [
+            zone.model_copy(update={"api_token": zone.api_token or self.cloudflare_api_token})
+            for zone in records_config.zones
+        ]
+        if records_config.records:
+            if not self.cloudflare_zone_id:
+                msg = "CLOUDFLARE_ZONE_ID is required for top-level records"
+                raise ValueError(msg)
+            default_zone = ZoneConfig(
+                zone_id=self.cloudflare_zone_id,
+                api_token=self.cloudflare_api_token,
+                records=records_config.records,
+            )
+            zones.insert(0, default_zone)
+        if any(not zone.api_token for zone in zones):
+            msg = "Every zone needs an api_token or CLOUDFLARE_API_TOKEN"
+            raise ValueError(msg)
+        return zones
+
+    def _read_records_config(self) -> DNSRecordsConfig:
         try:
             config_path = Path(self.records_config_path)
             with config_path.open() as f:
@@ -37,4 +272,4 @@ class Config(BaseSettings):
             logger.exception("Failed to load DNS records")
             raise
         else:
-            return records_config.records
+            return records_config
@@ -1,61 +1,409 @@
+import argparse
 import asyncio
 import sys
-from typing import NoReturn
+import time
+from collections.abc import Collection, Mapping, Sequence
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import TYPE_CHECKING, NoReturn
 
 import structlog
 
-from app.config import Config
-from app.src.cloudflare_client import CloudflareClient
-from app.src.dns_updater import DNSUpdater
-from app.src.ip_detector import PublicIPDetector
-
-structlog.configure(
-    processors=[
-        structlog.contextvars.merge_contextvars,
-        structlog.processors.add_log_level,
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.dev.ConsoleRenderer(),
-    ],
-    wrapper_class=structlog.make_filtering_bound_logger(20),  # INFO level
-    context_class=dict,
-    logger_factory=structlog.PrintLoggerFactory(),
-    cache_logger_on_first_use=False,
-)
+from app.config import Config, ZoneConfig
+from app.src.ip_detector import IPChangeNotifier, IPDetector, IPFamily, PublicIPDetector, detect_ips
+from app.src.logs import configure_logging
+from app.src.models import RecordType
+from app.src.reload import ReloadTrigger
+from app.src.state import StateStore
+
+# The Cloudflare SDK, the updaters and the alternative detectors are imported where they are used,
+# so a --once run that finds nothing to do never pays for loading them.
+if TYPE_CHECKING:
+    from app.src.dns_ip_detector import DNSIPDetector
+    from app.src.dns_updater import DNSUpdater
+    from app.src.dyndns import PushedIPDetector, PushedIPs
+    from app.src.interface_ip_detector import InterfaceIPDetector
+    from app.src.lease import FileLease
+    from app.src.multi_zone import MultiZoneUpdater
+
+    AnyIPDetector = PublicIPDetector | DNSIPDetector | InterfaceIPDetector | PushedIPDetector
+
+EXIT_UNCHANGED = 0
+EXIT_ERROR = 1
+# 2 is taken by argparse for usage errors.
+EXIT_CHANGED = 3
+
+# Shortest wait between cycles woken for scheduled record verifications.
+_MIN_CYCLE_DELAY = 1.0
+
+configure_logging()
 
 logger = structlog.get_logger()
 
 
-async def run_daemon(config: Config) -> NoReturn:
-    dns_records = config.load_dns_records()
+def build_ip_detector(config: Config, family: IPFamily = 4, pushed: "PushedIPs | None" = None) -> "AnyIPDetector":
+    if config.ip_detector == "push":
+        if pushed is None:
+            msg = "IP_DETECTOR=push only works in daemon mode, where routers can push their address"
+            raise ValueError(msg)
+        from app.src.dyndns import PushedIPDetector  # noqa: PLC0415
+
+        return PushedIPDetector(pushed, "A" if family == 4 else "AAAA")  # noqa: PLR2004
+    if config.ip_detector == "dns":
+        from app.src.dns_ip_detector import DNSIPDetector  # noqa: PLC0415
+
+        return DNSIPDetector(family=family)
+    if config.ip_detector == "interface" and config.ip_interface:
+        from app.src.interface_ip_detector import InterfaceIPDetector  # noqa: PLC0415
+
+        return InterfaceIPDetector(config.ip_interface, family=family)
+    stats_path = Path(config.ip_provider_stats_path) if config.ip_provider_stats_path else None
+    if stats_path is not None and family == 6:  # noqa: PLR2004
+        stats_path = stats_path.with_name(f"{stats_path.stem}.ipv6{stats_path.suffix}")
+    return PublicIPDetector(
+        hedge_delay=config.ip_hedge_delay,
+        stats_path=stats_path,
+        cooldown=config.ip_provider_cooldown,
+        family=family,
+    )
+
+
+def build_ip_detectors(
+    config: Config,
+    zones: list[ZoneConfig],
+    exclude: Collection[RecordType] = (),
+    pushed: "PushedIPs | None" = None,
+) -> "dict[RecordType, AnyIPDetector]":
+    """Build a detector for each address family the configured records need, except those in ``exclude``."""
+    record_types = {record_type for zone in zones for record in zone.records for record_type in record.record_types}
+    record_types -= set(exclude)
+    ip_detectors: dict[RecordType, AnyIPDetector] = {}
+    if "A" in record_types:
+        ip_detectors["A"] = build_ip_detector(config, pushed=pushed)
+    if "AAAA" in record_types:
+        ip_detectors["AAAA"] = build_ip_detector(config, family=6, pushed=pushed)
+    return ip_detectors
+
+
+async def close_ip_detectors(ip_detectors: "Mapping[RecordType, AnyIPDetector]") -> None:
+    for ip_detector in ip_detectors.values():
+        await ip_detector.close()
+
+
+async def build_updater(
+    config: Config,
+    zones: list[ZoneConfig],
+    ip_detectors: Mapping[RecordType, IPDetector],
+    state_store: StateStore | None,
+    exit_stack: AsyncExitStack,
+) -> "MultiZoneUpdater":
+    """Create the zone updaters and the connection pool they share, closed when ``exit_stack`` unwinds."""
+    from cloudflare import DefaultAsyncHttpxClient  # noqa: PLC0415
 
-    ip_detector = PublicIPDetector()
-    cloudflare_client = CloudflareClient(config.cloudflare_api_token, config.cloudflare_zone_id)
-    updater = DNSUpdater(config, ip_detector, cloudflare_client, dns_records)
+    from app.src.multi_zone import MultiZoneUpdater, ZoneIDCache, build_zone_updaters  # noqa: PLC0415
+    from app.src.rate_limit import RequestScheduler  # noqa: PLC0415
 
-    await logger.ainfo(
-        "Daemon started",
-        interval=config.update_interval,
-        records=[r.name for r in dns_records],
-        config_file=config.records_config_path,
+    scheduler = RequestScheduler(
+        config.api_rate_limit,
+        config.api_rate_limit_period,
+        max_retries=config.api_max_retries,
     )
+    http_client = DefaultAsyncHttpxClient(event_hooks={"response": [scheduler.on_response]})
+    exit_stack.push_async_callback(http_client.aclose)
+
+    # Kept across reloads, so zones that come back are not resolved again.
+    zone_ids: ZoneIDCache = {}
+
+    async def build_zones(zones: list[ZoneConfig]) -> "list[DNSUpdater]":
+        return await build_zone_updaters(
+            config,
+            zones,
+            ip_detectors,
+            http_client,
+            state_store,
+            scheduler=scheduler,
+            zone_ids=zone_ids,
+        )
+
+    updaters = await build_zones(zones)
+    return MultiZoneUpdater(ip_detectors, updaters, zones=zones, build_updaters=build_zones)
+
+
+async def run_plan(config: Config, output_format: str) -> None:
+    """Print the changes a cycle would make, reading from Cloudflare but never writing."""
+    from app.src.plan import render_json, render_table  # noqa: PLC0415
+
+    zones = config.load_zones()
+    async with AsyncExitStack() as exit_stack:
+        ip_detectors = build_ip_detectors(config, zones)
+        exit_stack.push_async_callback(close_ip_detectors, ip_detectors)
+        # No state store: the plan must reflect Cloudflare as it is, and must not write the state file.
+        updater = await build_updater(config, zones, ip_detectors, None, exit_stack)
+        plans = await updater.plan()
+    output = render_json(plans) if output_format == "json" else render_table(plans)
+    sys.stdout.write(output + "\n")
+
+
+async def run_once(config: Config) -> int:
+    """Run a single cycle and return the process exit status.
+
+    With a state file, an IP that matches the last applied one is settled without contacting Cloudflare.
+    """
+    zones = config.load_zones()
+    state_store = StateStore(Path(config.state_path)) if config.state_path else None
+    async with AsyncExitStack() as exit_stack:
+        ip_detectors = build_ip_detectors(config, zones)
+        exit_stack.push_async_callback(close_ip_detectors, ip_detectors)
+        current_ips = await detect_ips(ip_detectors)
+        if state_store is not None and _state_is_current(config, zones, state_store, current_ips):
+            await logger.ainfo("IP unchanged, skipping update")
+            return EXIT_UNCHANGED
+
+        updater = await build_updater(config, zones, ip_detectors, state_store, exit_stack)
+        changed = await updater.update(current_ips)
+
+    if updater.had_errors:
+        return EXIT_ERROR
+    return EXIT_CHANGED if changed else EXIT_UNCHANGED
+
+
+def _state_is_current(
+    config: Config,
+    zones: list[ZoneConfig],
+    state_store: StateStore,
+    current_ips: Mapping[RecordType, str],
+) -> bool:
+    for zone in zones:
+        zone_id = zone.zone_id or state_store.get_zone_id(zone.zone_name or "", zone.api_token or "")
+        if zone_id is None or not state_store.is_current(zone_id, zone.records, current_ips, config.reverify_interval):
+            return False
+    return True
+
+
+async def run_daemon(config: Config) -> NoReturn:
+    zones = config.load_zones()
+    state_store = StateStore(Path(config.state_path)) if config.state_path else None
 
-    while True:
-        try:
+    pushed = None
+    if config.dyndns_enabled:
+        from app.src.dyndns import PushedIPs  # noqa: PLC0415
+
+        pushed = PushedIPs()
+
+    async with AsyncExitStack() as exit_stack:
+        ip_detectors = build_ip_detectors(config, zones, pushed=pushed)
+        exit_stack.push_async_callback(close_ip_detectors, ip_detectors)
+        updater = await build_updater(config, zones, ip_detectors, state_store, exit_stack)
+        reload_trigger = ReloadTrigger(Path(config.records_config_path), config.records_watch_interval)
+        reload_trigger.start()
+        exit_stack.push_async_callback(reload_trigger.stop)
+        lease = await start_lease(config, exit_stack)
+        if config.http_port is not None:
+            await start_http_server(config, config.http_port, updater, exit_stack, pushed=pushed, lease=lease)
+
+        await logger.ainfo(
+            "Daemon started",
+            interval=config.update_interval,
+            zones=[zone.zone_name or zone.zone_id for zone in zones],
+            records=[r.name for zone in zones for r in zone.records],
+            config_file=config.records_config_path,
+        )
+
+        # Router pushes, and becoming leader, start a cycle right away.
+        wake = [reload_trigger.event, *([pushed.event] if pushed else []), *([lease.event] if lease else [])]
+        retry_delay = config.retry_interval
+        delay: float
+        while True:
+            if reload_trigger.consume():
+                await reload_records(config, updater, ip_detectors, pushed=pushed)
+            failed = await run_cycle(config, updater, pushed, lease)
+
+            # Failed records are retried on a short, growing timer; the records already in place are
+            # confirmed from the cycle cache, so a retry only touches Cloudflare for the failed ones.
+            if failed:
+                delay = min(retry_delay, config.update_interval)
+                retry_delay *= 2
+                await logger.ainfo("Retrying failed records", delay=delay)
+            else:
+                delay = config.update_interval
+                retry_delay = config.retry_interval
+                next_verification = updater.next_verification
+                if next_verification is not None:
+                    # Records with their own verify_interval may be due before the next regular cycle.
+                    delay = min(delay, max(next_verification - time.time(), _MIN_CYCLE_DELAY))
+            await wait_for_next_cycle(list(ip_detectors.values()), delay, wake=wake)
+
+
+async def start_lease(config: Config, exit_stack: AsyncExitStack) -> "FileLease | None":
+    """Join the leader election on ``LEASE_PATH``, if set; the lease is released when ``exit_stack`` unwinds."""
+    if not config.lease_path:
+        return None
+    from app.src.lease import FileLease  # noqa: PLC0415
+
+    lease = FileLease(Path(config.lease_path), config.lease_duration)
+    await lease.start()
+    exit_stack.push_async_callback(lease.stop)
+    return lease
+
+
+async def run_cycle(
+    config: Config,
+    updater: "MultiZoneUpdater",
+    pushed: "PushedIPs | None",
+    lease: "FileLease | None" = None,
+) -> bool:
+    """Run one daemon cycle and return whether it failed; pending router pushes take precedence over detection.
+
+    With a ``lease``, only the leader touches Cloudflare; followers drop pending pushes, keeping the
+    latest address for when they take over.
+    """
+    if lease is not None and not lease.is_leader:
+        if pushed is not None:
+            pushed.take()
+        await logger.ainfo("Standing by, another replica holds the lease", current_holder=lease.current_holder)
+        return False
+    if lease is not None and lease.consume():
+        # The previous leader may have changed records since this replica last saw them.
+        updater.invalidate()
+    try:
+        if pushed is not None and pushed.event.is_set():
+            # Let a burst of notifications settle so it is applied in one cycle.
+            await asyncio.sleep(config.dyndns_coalesce_delay)
+            await updater.update_pushed(pushed.take())
+        elif pushed is not None and config.ip_detector == "push" and not pushed.received:
+            await logger.ainfo("Waiting for the first dyndns2 push")
+        else:
             await updater.update()
-        except Exception:  # noqa: BLE001
-            await logger.aexception("Update failed")
+    except Exception:  # noqa: BLE001
+        await logger.aexception("Update failed")
+        return True
+    return updater.had_errors
 
-        await asyncio.sleep(config.update_interval)
 
+async def reload_records(
+    config: Config,
+    updater: "MultiZoneUpdater",
+    ip_detectors: "dict[RecordType, AnyIPDetector]",
+    *,
+    pushed: "PushedIPs | None" = None,
+) -> None:
+    """Apply the current records file; an invalid one is logged and the running configuration kept.
 
-def main() -> None:
+    Only the records file is re-read; settings from the environment need a restart.
+    """
     try:
-        config = Config()  # type: ignore[call-arg]
+        zones = config.load_zones()
+    except Exception as e:  # noqa: BLE001
+        await logger.aerror("Invalid records configuration, keeping the previous one", error=str(e))
+        return
+    # A reload may add the first records of an address family.
+    for record_type, detector in build_ip_detectors(config, zones, ip_detectors.keys(), pushed).items():
+        ip_detectors[record_type] = detector
+    try:
+        await updater.reload(zones, ip_detectors)
+    except Exception:  # noqa: BLE001
+        await logger.aexception("Failed to apply records configuration, keeping the previous one")
+
+
+async def start_http_server(  # noqa: PLR0913
+    config: Config,
+    port: int,
+    updater: "MultiZoneUpdater",
+    exit_stack: AsyncExitStack,
+    *,
+    pushed: "PushedIPs | None" = None,
+    lease: "FileLease | None" = None,
+) -> None:
+    """Serve the operational endpoints, and the dyndns2 receiver when enabled, until ``exit_stack`` unwinds."""
+    from app.src.health import HealthEndpoints  # noqa: PLC0415
+    from app.src.http_server import HTTPServer, metrics_endpoint  # noqa: PLC0415
+
+    server = HTTPServer(config.http_host, port)
+    server.route("/metrics", metrics_endpoint)
+    HealthEndpoints(updater, config.update_interval * config.ready_max_missed_cycles, lease=lease).register(server)
+    if pushed is not None and config.dyndns_username and config.dyndns_password:
+        from app.src.dyndns import DynDNSReceiver  # noqa: PLC0415
+
+        DynDNSReceiver(updater, pushed, config.dyndns_username, config.dyndns_password).register(server)
+    await server.start()
+    exit_stack.push_async_callback(server.close)
+
+
+async def wait_for_next_cycle(
+    ip_detectors: list[IPDetector],
+    interval: float,
+    *,
+    wake: Sequence[asyncio.Event] = (),
+) -> None:
+    """Sleep until the next cycle; detectors that push changes, or setting a ``wake`` event, end the wait early."""
+    notifiers = [detector for detector in ip_detectors if isinstance(detector, IPChangeNotifier)]
+    waiters: list[asyncio.Task[object]] = [
+        asyncio.create_task(notifier.wait_for_change(interval)) for notifier in notifiers
+    ]
+    waiters.extend(asyncio.create_task(event.wait()) for event in wake)
+    if not waiters:
+        await asyncio.sleep(interval)
+        return
+    try:
+        await asyncio.wait(waiters, timeout=interval, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="cloudflare-ddns",
+        description="Keep Cloudflare DNS records on your public IP.",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="print the creates and updates the next cycle would make, then exit without changing anything",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help=(
+            f"run a single cycle and exit: {EXIT_UNCHANGED} if nothing changed, {EXIT_CHANGED} if records were "
+            f"changed, {EXIT_ERROR} on errors"
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        choices=["table", "json"],
+        default="table",
+        dest="output_format",
+        help="output format for --plan (default: table)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(argv)
+    # Keep stdout for the plan itself so it can be piped, e.g. into jq.
+    log_stream = sys.stderr if args.plan else sys.stdout
+    configure_logging(stream=log_stream)
+
+    try:
+        config = Config()
     except Exception:
         logger.exception("Failed to load configuration")
         sys.exit(1)
+    configure_logging(
+        config.log_format,
+        sample_rate=config.log_sample_rate,
+        queue_size=config.log_queue_size,
+        stream=log_stream,
+    )
 
     try:
+        if args.plan:
+            asyncio.run(run_plan(config, args.output_format))
+            return
+        if args.once:
+            sys.exit(asyncio.run(run_once(config)))
         asyncio.run(run_daemon(config))
     except KeyboardInterrupt:
         logger.info("Interrupted by user")
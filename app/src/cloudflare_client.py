@@ -1,32 +1,132 @@
-from typing import TYPE_CHECKING, Literal
+import functools
+import json
+from collections.abc import Awaitable, Callable, Collection
+from typing import TYPE_CHECKING, Any, TypeVar
 
+import httpx
 import structlog
-from cloudflare import Cloudflare
-from cloudflare.types.dns import RecordResponse, record_list_params
+from cloudflare import NOT_GIVEN, AsyncCloudflare
+from cloudflare.types.dns import (
+    AAAARecordParam,
+    ARecordParam,
+    BatchPatchParam,
+    RecordResponse,
+    batch_patch_param,
+    record_batch_params,
+    record_list_params,
+)
 
 if TYPE_CHECKING:
-    from cloudflare.pagination import SyncV4PagePaginationArray
+    from cloudflare import AsyncAPIResponse
+    from cloudflare.pagination import AsyncV4PagePaginationArray
 
-from app.src.models import DNSRecord
+    from app.src.rate_limit import RequestScheduler
+
+from app.src import metrics
+from app.src.models import DNSRecord, RecordChange, RecordType
 
 logger = structlog.get_logger()
 
+_T = TypeVar("_T")
+
+_DEFAULT_PAGE_SIZE = 1000
+
 
-_RECORD_TYPE: Literal["A"] = "A"
+async def resolve_zone_id(
+    api_token: str,
+    zone_name: str,
+    *,
+    base_url: str | None = None,
+    http_client: httpx.AsyncClient | None = None,
+    scheduler: "RequestScheduler | None" = None,
+) -> str:
+    """Look up the ID of the zone called ``zone_name``."""
+    client = _sdk_client(api_token, base_url, http_client, scheduler)
+    try:
+        if scheduler is None:
+            zones = await client.zones.list(name=zone_name)
+        else:
+            zones = await scheduler.call(lambda: client.zones.list(name=zone_name), idempotent=True)
+    finally:
+        if http_client is None:
+            await client.close()
+    if not zones.result:
+        msg = f"Cloudflare zone {zone_name} not found"
+        raise RuntimeError(msg)
+    await logger.ainfo("Resolved zone", zone_name=zone_name, zone_id=zones.result[0].id)
+    return zones.result[0].id
+
+
+def _sdk_client(
+    api_token: str,
+    base_url: str | None,
+    http_client: httpx.AsyncClient | None,
+    scheduler: "RequestScheduler | None",
+) -> AsyncCloudflare:
+    # With a scheduler, retries happen there, paced by the shared token bucket, instead of in the SDK.
+    if scheduler is None:
+        return AsyncCloudflare(api_token=api_token, base_url=base_url, http_client=http_client)
+    return AsyncCloudflare(api_token=api_token, base_url=base_url, http_client=http_client, max_retries=0)
 
 
 class CloudflareClient:
-    def __init__(self, api_token: str, zone_id: str) -> None:
-        self._client = Cloudflare(api_token=api_token)
+    """DNS record operations for one zone.
+
+    With a ``scheduler``, every request waits for a token from its rate-limit bucket and transient
+    failures are retried there: reads and PATCH edits on 429, 5xx and connection errors, creates and
+    batches (which may not be repeated once Cloudflare has acted on them) only on 429.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        api_token: str,
+        zone_id: str,
+        *,
+        page_size: int = _DEFAULT_PAGE_SIZE,
+        base_url: str | None = None,
+        http_client: httpx.AsyncClient | None = None,
+        scheduler: "RequestScheduler | None" = None,
+    ) -> None:
+        # A shared ``http_client`` lets clients for several zones reuse one connection pool; its owner closes it.
+        self._client = _sdk_client(api_token, base_url, http_client, scheduler)
+        self._owns_http_client = http_client is None
+        self._scheduler = scheduler
         self._zone_id = zone_id
+        self._page_size = page_size
+        self._request_count = 0
+
+    @property
+    def zone_id(self) -> str:
+        return self._zone_id
+
+    @property
+    def request_count(self) -> int:
+        """Number of Cloudflare API requests this client has issued."""
+        return self._request_count
 
-    async def get_dns_record(self, record_name: str) -> DNSRecord | None:
-        await logger.adebug("Fetching DNS record", record_name=record_name, record_type=_RECORD_TYPE)
+    async def close(self) -> None:
+        if self._owns_http_client:
+            await self._client.close()
+
+    async def _request(self, name: str, operation: Callable[[], Awaitable[_T]], *, idempotent: bool) -> _T:
+        self._request_count += 1
+        latency = metrics.CLOUDFLARE_API_SECONDS.labels(operation=name)
+
+        async def timed() -> _T:
+            with latency.time():
+                return await operation()
+
+        if self._scheduler is None:
+            return await timed()
+        return await self._scheduler.call(timed, idempotent=idempotent)
+
+    async def get_dns_record(self, record_name: str, record_type: RecordType = "A") -> DNSRecord | None:
+        await logger.adebug("Fetching DNS record", record_name=record_name, record_type=record_type)
         name_filter: record_list_params.Name = {"exact": record_name}
-        records: SyncV4PagePaginationArray[RecordResponse] = self._client.dns.records.list(
-            zone_id=self._zone_id,
-            name=name_filter,
-            type=_RECORD_TYPE,
+        records: AsyncV4PagePaginationArray[RecordResponse] = await self._request(
+            "get",
+            lambda: self._client.dns.records.list(zone_id=self._zone_id, name=name_filter, type=record_type),
+            idempotent=True,
         )
 
         if not records.result:
@@ -34,57 +134,172 @@ class CloudflareClient:
 
         return self._to_dns_record(records.result[0])
 
-    async def create_dns_record(
+    async def list_dns_records(
+        self,
+        record_names: Collection[str],
+        record_type: RecordType = "A",
+    ) -> dict[str, DNSRecord]:
+        """Page through every ``record_type`` record of the zone and index the requested names.
+
+        Names are matched case-insensitively and the returned mapping is keyed by the lowercased name.
+        """
+        wanted = {name.lower() for name in record_names}
+        index: dict[str, DNSRecord] = {}
+        page = 1
+        while True:
+            await logger.adebug("Fetching DNS records page", page=page, per_page=self._page_size)
+            response: AsyncAPIResponse[AsyncV4PagePaginationArray[RecordResponse]] = await self._request(
+                "list",
+                functools.partial(
+                    self._client.dns.records.with_raw_response.list,
+                    zone_id=self._zone_id,
+                    type=record_type,
+                    page=page,
+                    per_page=self._page_size,
+                ),
+                idempotent=True,
+            )
+            # Skip the SDK's models: only the requested records are built, straight from the JSON, and
+            # the page is released before the next one is fetched.
+            payload = json.loads(await response.read())
+            raw_records: list[dict[str, Any]] = payload.get("result") or []
+            for raw_record in raw_records:
+                name = raw_record["name"].lower()
+                if name in wanted and name not in index:
+                    index[name] = _record_from_json(raw_record)
+
+            total_pages = (payload.get("result_info") or {}).get("total_pages")
+            if len(raw_records) < self._page_size or (total_pages is not None and page >= total_pages):
+                break
+            page += 1
+
+        await logger.adebug("Fetched DNS records", pages=page, matched=len(index), requested=len(wanted))
+        return index
+
+    async def create_dns_record(  # noqa: PLR0913
         self,
         record_name: str,
         content: str,
         *,
         ttl: int = 300,
         proxied: bool = False,
+        record_type: RecordType = "A",
+        comment: str | None = None,
     ) -> DNSRecord:
         await logger.adebug(
             "Creating DNS record",
             record_name=record_name,
-            record_type=_RECORD_TYPE,
+            record_type=record_type,
             content=content,
         )
-        raw_record = self._client.dns.records.create(
-            zone_id=self._zone_id,
-            name=record_name,
-            type=_RECORD_TYPE,
-            content=content,
-            ttl=ttl,
-            proxied=proxied,
+        raw_record = await self._request(
+            "create",
+            lambda: self._client.dns.records.create(
+                zone_id=self._zone_id,
+                name=record_name,
+                type=record_type,
+                content=content,
+                ttl=ttl,
+                proxied=proxied,
+                comment=NOT_GIVEN if comment is None else comment,
+            ),
+            idempotent=False,
         )
 
         return self._to_dns_record(self._ensure_record_response(raw_record, "created", record_name))
 
-    async def update_dns_record(
-        self,
-        record_id: str,
-        record_name: str,
-        content: str,
-        *,
-        ttl: int = 300,
-        proxied: bool = False,
-    ) -> DNSRecord:
+    async def edit_dns_record(self, change: RecordChange) -> DNSRecord:
+        """PATCH an existing record, sending only the attributes listed in ``change.fields``."""
+        if change.record_id is None:
+            msg = f"Cannot edit DNS record {change.name} without a record ID"
+            raise ValueError(msg)
         await logger.adebug(
-            "Updating DNS record",
-            record_id=record_id,
-            record_name=record_name,
-            content=content,
+            "Editing DNS record",
+            record_id=change.record_id,
+            record_name=change.name,
+            fields=change.fields,
         )
-        raw_record = self._client.dns.records.update(
-            dns_record_id=record_id,
-            zone_id=self._zone_id,
-            name=record_name,
-            type=_RECORD_TYPE,
-            content=content,
-            ttl=ttl,
-            proxied=proxied,
+        record_id = change.record_id
+        # Setting attributes to fixed values is idempotent, so a PATCH is safe to repeat.
+        raw_record = await self._request(
+            "update",
+            lambda: self._client.dns.records.edit(
+                dns_record_id=record_id,
+                zone_id=self._zone_id,
+                name=change.name,
+                type=change.type,
+                content=change.content if "content" in change.fields else NOT_GIVEN,
+                ttl=change.ttl if "ttl" in change.fields else NOT_GIVEN,
+                proxied=change.proxied if "proxied" in change.fields else NOT_GIVEN,
+                comment=(change.comment or "") if "comment" in change.fields else NOT_GIVEN,
+            ),
+            idempotent=True,
         )
 
-        return self._to_dns_record(self._ensure_record_response(raw_record, "updated", record_id))
+        return self._to_dns_record(self._ensure_record_response(raw_record, "edited", record_id))
+
+    async def batch_dns_records(self, changes: list[RecordChange]) -> list[DNSRecord]:
+        """Apply creates and updates in a single ``dns_records/batch`` request.
+
+        Cloudflare applies a batch atomically, so either every change succeeds or the call raises.
+        The returned records are aligned with ``changes``.
+        """
+        posts: list[record_batch_params.Post] = []
+        patches: list[BatchPatchParam] = []
+        for change in changes:
+            if change.record_id is None:
+                posts.append(self._batch_post(change))
+            else:
+                patches.append(self._batch_patch(change, change.record_id))
+
+        await logger.adebug("Submitting DNS record batch", posts=len(posts), patches=len(patches))
+        response = await self._request(
+            "batch",
+            lambda: self._client.dns.records.batch(zone_id=self._zone_id, posts=posts, patches=patches),
+            idempotent=False,
+        )
+        if response is None:
+            msg = f"Cloudflare returned an empty response for a batch of {len(changes)} DNS records"
+            raise RuntimeError(msg)
+
+        created = iter(response.posts or [])
+        updated = iter(response.patches or [])
+        results: list[DNSRecord] = []
+        for change in changes:
+            raw_record = next(created if change.record_id is None else updated, None)
+            results.append(self._to_dns_record(self._ensure_record_response(raw_record, "batched", change.name)))
+        return results
+
+    @staticmethod
+    def _batch_post(change: RecordChange) -> record_batch_params.Post:
+        post: AAAARecordParam | ARecordParam
+        if change.type == "AAAA":
+            post = AAAARecordParam(name=change.name, type="AAAA")
+        else:
+            post = ARecordParam(name=change.name, type="A")
+        post["content"] = change.content
+        post["ttl"] = change.ttl
+        post["proxied"] = change.proxied
+        if change.comment is not None:
+            post["comment"] = change.comment
+        return post
+
+    @staticmethod
+    def _batch_patch(change: RecordChange, record_id: str) -> BatchPatchParam:
+        patch: batch_patch_param.AAAARecord | batch_patch_param.ARecord
+        if change.type == "AAAA":
+            patch = batch_patch_param.AAAARecord(id=record_id, name=change.name, type="AAAA")
+        else:
+            patch = batch_patch_param.ARecord(id=record_id, name=change.name, type="A")
+        if "content" in change.fields:
+            patch["content"] = change.content
+        if "ttl" in change.fields:
+            patch["ttl"] = change.ttl
+        if "proxied" in change.fields:
+            patch["proxied"] = change.proxied
+        if "comment" in change.fields:
+            patch["comment"] = change.comment or ""
+        return patch
 
     def _ensure_record_response(self, record: RecordResponse | None, action: str, identifier: str) -> RecordResponse:
         if record is None:
@@ -95,8 +310,25 @@ class CloudflareClient:
     def _to_dns_record(self, raw_record: RecordResponse) -> DNSRecord:
         content = getattr(raw_record, "content", None)
         normalized_content = None if content is None else str(content)
+        ttl = getattr(raw_record, "ttl", None)
         return DNSRecord(
             id=raw_record.id,
             name=raw_record.name,
             content=normalized_content,
+            ttl=None if ttl is None else int(ttl),
+            proxied=getattr(raw_record, "proxied", None),
+            comment=getattr(raw_record, "comment", None),
         )
+
+
+def _record_from_json(raw_record: dict[str, Any]) -> DNSRecord:
+    content = raw_record.get("content")
+    ttl = raw_record.get("ttl")
+    return DNSRecord(
+        id=raw_record["id"],
+        name=raw_record["name"],
+        content=None if content is None else str(content),
+        ttl=None if ttl is None else int(ttl),
+        proxied=raw_record.get("proxied"),
+        comment=raw_record.get("comment"),
+    )
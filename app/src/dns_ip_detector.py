@@ -0,0 +1,207 @@
+import asyncio
+import ipaddress
+import secrets
+import struct
+import time
+from enum import IntEnum
+from typing import Literal
+
+import structlog
+from pydantic import BaseModel, ConfigDict
+
+from . import metrics
+
+logger = structlog.get_logger()
+
+_HEADER = struct.Struct("!HHHHHH")
+_RR_FIXED = struct.Struct("!HHIH")
+_FLAG_RESPONSE = 0x8000
+_FLAG_RECURSION_DESIRED = 0x0100
+_RCODE_MASK = 0x000F
+_POINTER_MASK = 0xC0
+
+
+class QueryType(IntEnum):
+    A = 1
+    TXT = 16
+    AAAA = 28
+
+
+class QueryClass(IntEnum):
+    IN = 1
+    CH = 3
+
+
+class DNSProvider(BaseModel):
+    """A resolver that answers ``qname`` with the address the query came from."""
+
+    model_config = ConfigDict(frozen=True)
+
+    resolver: str
+    qname: str
+    qtype: QueryType
+    qclass: QueryClass = QueryClass.IN
+    port: int = 53
+
+
+DEFAULT_DNS_PROVIDERS = (
+    DNSProvider(resolver="1.1.1.1", qname="whoami.cloudflare", qtype=QueryType.TXT, qclass=QueryClass.CH),
+    DNSProvider(resolver="208.67.222.222", qname="myip.opendns.com", qtype=QueryType.A),
+    DNSProvider(resolver="1.0.0.1", qname="whoami.cloudflare", qtype=QueryType.TXT, qclass=QueryClass.CH),
+)
+
+DEFAULT_DNS6_PROVIDERS = (
+    DNSProvider(resolver="2606:4700:4700::1111", qname="whoami.cloudflare", qtype=QueryType.TXT, qclass=QueryClass.CH),
+    DNSProvider(resolver="2620:119:35::35", qname="myip.opendns.com", qtype=QueryType.AAAA),
+    DNSProvider(resolver="2606:4700:4700::1001", qname="whoami.cloudflare", qtype=QueryType.TXT, qclass=QueryClass.CH),
+)
+
+
+class DNSIPDetector:
+    """Detects the public IP with a single UDP DNS query per check instead of an HTTPS round-trip.
+
+    With ``family=6`` the default providers are reached over IPv6, so they echo the IPv6 address.
+    """
+
+    def __init__(
+        self,
+        providers: tuple[DNSProvider, ...] | None = None,
+        timeout: float = 2.0,
+        family: Literal[4, 6] = 4,
+    ) -> None:
+        self._providers = providers or (DEFAULT_DNS6_PROVIDERS if family == 6 else DEFAULT_DNS_PROVIDERS)  # noqa: PLR2004
+        self._timeout = timeout
+        self._family = family
+
+    async def close(self) -> None:
+        return None
+
+    async def get_current_ip(self) -> str:
+        for provider in self._providers:
+            started = time.perf_counter()
+            try:
+                ip = await self._query(provider)
+                await logger.adebug("IP detected from provider", provider=provider.resolver, ip=ip)
+            except (OSError, TimeoutError, ValueError, struct.error) as e:
+                self._observe(provider, started, "failure")
+                await logger.awarning("IP detection failed", provider=provider.resolver, error=str(e))
+                continue
+            else:
+                self._observe(provider, started, "success")
+                return ip
+        msg = "Failed to detect public IP from all DNS providers"
+        raise RuntimeError(msg)
+
+    @staticmethod
+    def _observe(provider: DNSProvider, started: float, result: str) -> None:
+        latency = time.perf_counter() - started
+        metrics.IP_DETECTION_SECONDS.labels(provider=f"dns://{provider.resolver}", result=result).observe(latency)
+
+    async def _query(self, provider: DNSProvider) -> str:
+        query_id = secrets.randbits(16)
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: _ResponseProtocol(loop, query_id),
+            remote_addr=(provider.resolver, provider.port),
+        )
+        try:
+            transport.sendto(build_query(query_id, provider.qname, provider.qtype, provider.qclass))
+            async with asyncio.timeout(self._timeout):
+                response = await protocol.response
+        finally:
+            transport.close()
+        ip = parse_response(response, query_id, provider.qtype)
+        if ipaddress.ip_address(ip).version != self._family:
+            msg = f"Expected an IPv{self._family} address, got {ip}"
+            raise ValueError(msg)
+        return ip
+
+
+class _ResponseProtocol(asyncio.DatagramProtocol):
+    """Resolves :attr:`response` with the first reply to ``query_id`` from the queried server.
+
+    Datagrams from other addresses or with another ID are dropped, so a stray or spoofed packet can
+    neither fail the query nor stand in for its answer.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, query_id: int) -> None:
+        self.response: asyncio.Future[bytes] = loop.create_future()
+        self._query_id = query_id
+        self._server: tuple[str | int, ...] | None = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self._server = tuple(transport.get_extra_info("peername")[:2])
+
+    def datagram_received(self, data: bytes, addr: tuple[str | int, ...]) -> None:
+        if self.response.done() or tuple(addr[:2]) != self._server:
+            return
+        if len(data) < _HEADER.size or int.from_bytes(data[:2]) != self._query_id:
+            return
+        self.response.set_result(data)
+
+    def error_received(self, exc: Exception) -> None:
+        if not self.response.done():
+            self.response.set_exception(exc)
+
+
+def build_query(query_id: int, qname: str, qtype: QueryType, qclass: QueryClass) -> bytes:
+    header = _HEADER.pack(query_id, _FLAG_RECURSION_DESIRED, 1, 0, 0, 0)
+    return header + _encode_name(qname) + struct.pack("!HH", qtype, qclass)
+
+
+def parse_response(data: bytes, query_id: int, qtype: QueryType) -> str:
+    """Return the first address of type ``qtype`` in the answer section of ``data``."""
+    if len(data) < _HEADER.size:
+        msg = "DNS response is truncated"
+        raise ValueError(msg)
+    response_id, flags, qdcount, ancount, _, _ = _HEADER.unpack_from(data)
+    if response_id != query_id or not flags & _FLAG_RESPONSE:
+        msg = "DNS response does not match the query"
+        raise ValueError(msg)
+    if flags & _RCODE_MASK:
+        msg = f"DNS query failed with rcode {flags & _RCODE_MASK}"
+        raise ValueError(msg)
+
+    offset = _HEADER.size
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, _, _, rdlength = _RR_FIXED.unpack_from(data, offset)
+        offset += _RR_FIXED.size
+        rdata = data[offset : offset + rdlength]
+        offset += rdlength
+        if rtype == qtype:
+            return _decode_address(rdata, qtype)
+
+    msg = "DNS response has no matching answer"
+    raise ValueError(msg)
+
+
+def _decode_address(rdata: bytes, qtype: QueryType) -> str:
+    if qtype == QueryType.TXT:
+        # First <character-string>: one length byte followed by the text.
+        text = rdata[1 : 1 + rdata[0]].decode("ascii") if rdata else ""
+        return str(ipaddress.ip_address(text.strip('"')))
+    return str(ipaddress.ip_address(rdata))
+
+
+def _encode_name(name: str) -> bytes:
+    encoded = b""
+    for label in name.rstrip(".").split("."):
+        raw = label.encode("ascii")
+        encoded += bytes([len(raw)]) + raw
+    return encoded + b"\x00"
+
+
+def _skip_name(data: bytes, offset: int) -> int:
+    while True:
+        if offset >= len(data):
+            msg = "DNS response is truncated"
+            raise ValueError(msg)
+        length = data[offset]
+        if length & _POINTER_MASK == _POINTER_MASK:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
@@ -1,79 +1,565 @@
+import asyncio
+import ipaddress
+import math
+import time
+from collections.abc import Awaitable, Mapping
+from typing import TypeVar
+
 import structlog
 
 from app.config import Config, DNSRecordConfig
 
+from . import metrics
 from .cloudflare_client import CloudflareClient
-from .ip_detector import IPDetector
+from .ip_detector import IPDetector, detect_ips
+from .models import DNSRecord, RecordChange, RecordStatus, RecordType, SyncState, ZonePlan, ZoneStatus, record_key
+from .reconcile import diff_record
+from .state import RecordState, StateStore, ZoneState, records_config_hash
+from .verify_schedule import VerifySchedule
 
 logger = structlog.get_logger()
 
+_T = TypeVar("_T")
+
 
 class DNSUpdater:
-    def __init__(
+    """Keeps the A and AAAA records of one zone pointed at the detected addresses.
+
+    A record configured with ``type: both`` is managed as two records. IPv4 and IPv6 are tracked
+    separately, so a failure in one family never forces the other to be re-applied.
+    """
+
+    def __init__(  # noqa: PLR0913
         self,
         config: Config,
-        ip_detector: IPDetector,
+        ip_detector: IPDetector | None,
         cloudflare_client: CloudflareClient,
         dns_records: list[DNSRecordConfig],
+        state_store: StateStore | None = None,
+        *,
+        ipv6_detector: IPDetector | None = None,
     ) -> None:
         self._config = config
-        self._ip_detector = ip_detector
         self._cloudflare_client = cloudflare_client
-        self._dns_records = dns_records
-        self._last_ip: str | None = None
+        self._config_hash = records_config_hash(dns_records)
+        self._dns_records = _expand_records(dns_records)
+        self._record_types: set[RecordType] = {_record_type(r) for r in self._dns_records}
+        detectors: dict[RecordType, IPDetector | None] = {"A": ip_detector, "AAAA": ipv6_detector}
+        self._ip_detectors = _select_detectors(self._record_types, detectors)
+        # Keys of added or changed records, reconciled by the next cycle even when the IP is unchanged.
+        self._dirty: set[str] = set()
+        self._last_ips: dict[RecordType, str] = {}
+        # Most recently detected addresses, which :meth:`status` compares the records with.
+        self._current_ips: dict[RecordType, str] = {}
+        self._had_errors = False
+        # Last confirmed Cloudflare state per ``record_key``; lets unchanged records skip the API.
+        self._confirmed: dict[str, RecordState] = {}
+        # Error of the last failed attempt per ``record_key``, until the record is confirmed again.
+        self._record_errors: dict[str, str] = {}
+        self._verified_at = 0.0
+        # Records with their own verify_interval, and the keys of those due for a read-back.
+        self._verify_schedule = VerifySchedule()
+        self._verify_schedule.set_intervals(_verify_intervals(self._dns_records), time.time())
+        self._verifying: set[str] = set()
+        self._state_store = state_store
+        if state_store is not None:
+            self._restore_state(state_store)
+
+    @property
+    def zone_id(self) -> str:
+        return self._cloudflare_client.zone_id
+
+    @property
+    def record_types(self) -> set[RecordType]:
+        return set(self._record_types)
+
+    @property
+    def record_names(self) -> set[str]:
+        """Lowercased names of the managed records."""
+        return {r.name.lower() for r in self._dns_records}
+
+    @property
+    def next_verification(self) -> float | None:
+        """When the next record with its own ``verify_interval`` is due, as a timestamp."""
+        return self._verify_schedule.next_due()
+
+    @property
+    def had_errors(self) -> bool:
+        """Whether the last :meth:`update` failed to detect an address or to apply a record."""
+        return self._had_errors
+
+    def status(self) -> ZoneStatus:
+        """Sync state of every managed record against the last detected addresses, from memory only."""
+        records = []
+        for record_config in self._dns_records:
+            record_type = _record_type(record_config)
+            key = record_key(record_config.name, record_type)
+            confirmed = self._confirmed.get(key)
+            error = self._record_errors.get(key)
+            state: SyncState
+            if error is not None:
+                state = "failed"
+            elif confirmed is not None and self._is_confirmed(record_config, self._current_ips):
+                state = "synced"
+            else:
+                state = "pending"
+            records.append(
+                RecordStatus(
+                    name=record_config.name,
+                    type=record_type,
+                    state=state,
+                    content=confirmed.content if confirmed else None,
+                    error=error,
+                ),
+            )
+        return ZoneStatus(zone_id=self.zone_id, last_ips=dict(self._last_ips), records=records)
+
+    def set_records(
+        self,
+        dns_records: list[DNSRecordConfig],
+        ip_detectors: Mapping[RecordType, IPDetector] | None = None,
+    ) -> None:
+        """Switch to a new record configuration, keeping what is known about the records that did not change.
+
+        Added and changed records are reconciled by the next :meth:`update` even when the IP is unchanged.
+        Removed records are no longer managed but are left in Cloudflare. Raises ``ValueError``, and keeps
+        the current configuration, when a newly needed address family has no detector.
+        """
+        records = _expand_records(dns_records)
+        record_types: set[RecordType] = {_record_type(r) for r in records}
+        self._ip_detectors = _select_detectors(record_types, {**self._ip_detectors, **(ip_detectors or {})})
+
+        previous = {record_key(r.name, _record_type(r)): r for r in self._dns_records}
+        keys = set()
+        for record_config in records:
+            key = record_key(record_config.name, _record_type(record_config))
+            keys.add(key)
+            if previous.get(key) != record_config:
+                self._dirty.add(key)
+        for key in previous.keys() - keys:
+            self._confirmed.pop(key, None)
+            self._record_errors.pop(key, None)
+            self._dirty.discard(key)
+            self._verifying.discard(key)
+
+        self._verify_schedule.set_intervals(_verify_intervals(records), time.time())
+        self._dns_records = records
+        self._record_types = record_types
+        self._config_hash = records_config_hash(dns_records)
+
+    def invalidate(self) -> None:
+        """Read every record back from Cloudflare next cycle, as in a drift sweep, instead of trusting the cache."""
+        self._verified_at = 0.0
 
-    async def update(self) -> bool:
-        current_ip = await self._ip_detector.get_current_ip()
-        await logger.ainfo("Current IP detected", ip=current_ip)
+    async def update(self, current_ips: Mapping[RecordType, str] | None = None) -> bool:
+        """Reconcile the records with ``current_ips``, detecting the addresses first when they are not given.
 
-        if current_ip == self._last_ip:
+        Records of a type missing from ``current_ips`` are left untouched this cycle.
+        """
+        with metrics.CYCLE_SECONDS.labels(zone_id=self.zone_id).time():
+            updated = await self._update(current_ips)
+        if not self._had_errors:
+            metrics.LAST_SUCCESS.labels(zone_id=self.zone_id).set(time.time())
+        return updated
+
+    async def _update(self, current_ips: Mapping[RecordType, str] | None) -> bool:
+        self._had_errors = False
+        if current_ips is None:
+            current_ips = await detect_ips(self._ip_detectors)
+        self._current_ips.update(current_ips)
+        self._had_errors = any(t not in current_ips for t in self._record_types)
+
+        await self._expire_confirmed()
+
+        changed = {t for t in self._record_types if t in current_ips and current_ips[t] != self._last_ips.get(t)}
+        reconcile = self._dirty | self._verifying
+        dirty = [
+            r
+            for r in self._dns_records
+            if _record_type(r) in current_ips.keys() - changed and record_key(r.name, _record_type(r)) in reconcile
+        ]
+        unchanged = sum(1 for r in self._dns_records if _record_type(r) in current_ips.keys() - changed) - len(dirty)
+        if not changed and not dirty:
+            metrics.RECORDS.labels(result="skipped").inc(unchanged)
             await logger.ainfo("IP unchanged, skipping update")
             return False
 
-        updated = False
-        had_errors = False
+        records = [r for r in self._dns_records if _record_type(r) in changed] + dirty
+        pending = [r for r in records if not self._is_confirmed(r, current_ips)]
+        # Stable, so records of equal priority keep the file order; the semaphore and the batches follow it.
+        pending.sort(key=lambda r: -r.priority)
+        metrics.RECORDS.labels(result="skipped").inc(unchanged + len(records) - len(pending))
+        if len(pending) < len(records):
+            await logger.adebug("Skipping confirmed records", skipped=len(records) - len(pending))
 
-        for record_config in self._dns_records:
+        existing_records: dict[str, DNSRecord] | None = None
+        # A few scheduled verifications are cheaper read one by one than by paging through the whole zone.
+        if self._config.bulk_fetch and any(record_key(r.name, _record_type(r)) not in self._verifying for r in pending):
+            # Confirmed records are updated by their known ID, so only the others are looked up.
+            existing_records = await self._list_records(
+                [r for r in pending if record_key(r.name, _record_type(r)) not in self._confirmed],
+            )
+
+        semaphore = asyncio.Semaphore(self._config.max_concurrency)
+        if self._config.batch_updates:
+            updated, failed = await self._update_batched(semaphore, current_ips, pending, existing_records)
+        else:
+            results = await asyncio.gather(
+                *(
+                    self._guarded(
+                        semaphore,
+                        [record_config],
+                        self._update_record(current_ips, record_config, existing_records),
+                    )
+                    for record_config in pending
+                ),
+            )
+            updated = any(record_updated for record_updated, _ in results)
+            failed = {
+                _record_type(record_config)
+                for record_config, (_, record_failed) in zip(pending, results, strict=True)
+                if record_failed
+            }
+
+        self._had_errors |= bool(failed)
+        reconciled = {key for r in records if (key := record_key(r.name, _record_type(r))) not in self._record_errors}
+        self._dirty -= reconciled
+        self._verifying -= reconciled
+        for record_type in changed:
+            if record_type in failed:
+                self._last_ips.pop(record_type, None)
+            else:
+                self._last_ips[record_type] = current_ips[record_type]
+        await self._save_state()
+        return updated
+
+    async def _expire_confirmed(self) -> None:
+        """Forget the cached state of the records that are due to be read back from Cloudflare."""
+        if time.time() - self._verified_at > self._config.reverify_interval:
+            # Drift sweep: forget the cached state so every record is read back and diffed, even if the IP is
+            # unchanged. Records with their own verify_interval are left to their schedule, except after
+            # invalidate(), when nothing in the cache can be trusted.
+            swept = {
+                key
+                for r in self._dns_records
+                if (key := record_key(r.name, _record_type(r))) not in self._verify_schedule or not self._verified_at
+            }
+            if self._verified_at:
+                await logger.ainfo("Checking records for drift", records=len(swept))
+            for key in swept:
+                self._confirmed.pop(key, None)
+            self._dirty |= swept
+            self._verified_at = time.time()
+        for key in self._verify_schedule.pop_due(time.time()):
+            self._confirmed.pop(key, None)
+            self._verifying.add(key)
+
+    async def plan(self, current_ips: Mapping[RecordType, str] | None = None) -> ZonePlan:
+        """Compute the changes :meth:`update` would make, without writing anything to Cloudflare.
+
+        Records are looked up the way a real cycle does, by a bulk listing or with ``bulk_fetch`` off one
+        request per record, and diffed with the same logic, so plan and apply agree. Cached state is
+        ignored, and left as it is: every record is compared with Cloudflare.
+        """
+        if current_ips is None:
+            current_ips = await detect_ips(self._ip_detectors)
+        records = [r for r in self._dns_records if _record_type(r) in current_ips]
+        requests_before = self._cloudflare_client.request_count
+        existing_records = await self._list_records(records) if self._config.bulk_fetch else None
+        semaphore = asyncio.Semaphore(self._config.max_concurrency)
+
+        async def lookup(record_config: DNSRecordConfig) -> DNSRecord | None:
+            async with semaphore:
+                return await self._lookup_record(record_config, existing_records)
+
+        existing = await asyncio.gather(*(lookup(record_config) for record_config in records))
+        planned = [
+            self._diff_record(current_ips, record_config, existing_record)
+            for record_config, existing_record in zip(records, existing, strict=True)
+        ]
+        changes = [change for change in planned if change is not None]
+        return ZonePlan(
+            zone_id=self.zone_id,
+            changes=changes,
+            read_calls=self._cloudflare_client.request_count - requests_before,
+            write_calls=self._write_calls(len(changes)),
+        )
+
+    def _write_calls(self, changes: int) -> int:
+        if self._config.batch_updates:
+            return math.ceil(changes / self._config.batch_size)
+        return changes
+
+    async def _list_records(self, records: list[DNSRecordConfig]) -> dict[str, DNSRecord]:
+        """Bulk-fetch ``records``, one listing per record type; keyed by ``record_key``."""
+        lookups: dict[RecordType, list[str]] = {}
+        for record_config in records:
+            lookups.setdefault(_record_type(record_config), []).append(record_config.name)
+        listings = await asyncio.gather(
+            *(self._cloudflare_client.list_dns_records(names, record_type) for record_type, names in lookups.items()),
+        )
+        return {
+            record_key(name, record_type): record
+            for record_type, listing in zip(lookups, listings, strict=True)
+            for name, record in listing.items()
+        }
+
+    def _content(self, record_config: DNSRecordConfig, current_ips: Mapping[RecordType, str]) -> str:
+        """Desired record content: the detected address, or the detected IPv6 prefix plus ``ipv6_suffix``."""
+        current_ip = current_ips[_record_type(record_config)]
+        if record_config.ipv6_suffix is None or _record_type(record_config) != "AAAA":
+            return current_ip
+        network = ipaddress.IPv6Network((current_ip, self._config.ipv6_prefix_length), strict=False)
+        host = int(ipaddress.IPv6Address(record_config.ipv6_suffix)) & int(network.hostmask)
+        return str(ipaddress.IPv6Address(int(network.network_address) | host))
+
+    def _is_confirmed(self, record_config: DNSRecordConfig, current_ips: Mapping[RecordType, str]) -> bool:
+        confirmed = self._confirmed.get(record_key(record_config.name, _record_type(record_config)))
+        if confirmed is None or _record_type(record_config) not in current_ips:
+            return False
+        return not diff_record(record_config, self._content(record_config, current_ips), confirmed)
+
+    def _confirm(self, record: DNSRecord, record_type: RecordType) -> None:
+        key = record_key(record.name, record_type)
+        self._record_errors.pop(key, None)
+        self._verify_schedule.verified(key, time.time())
+        self._confirmed[key] = RecordState(
+            id=record.id,
+            content=record.content,
+            ttl=record.ttl,
+            proxied=record.proxied,
+            comment=record.comment,
+        )
+
+    def _restore_state(self, state_store: StateStore) -> None:
+        zone_state = state_store.load(
+            self._cloudflare_client.zone_id,
+            self._config_hash,
+            self._config.state_max_age,
+        )
+        if zone_state is None:
+            return
+        self._last_ips = dict(zone_state.last_ips)
+        self._confirmed = zone_state.records
+        self._verified_at = zone_state.verified_at
+        logger.info("Restored state", last_ips=self._last_ips, records=len(self._confirmed))
+
+    async def _save_state(self) -> None:
+        if self._state_store is None:
+            return
+        zone_state = ZoneState(
+            config_hash=self._config_hash,
+            last_ips=self._last_ips,
+            verified_at=self._verified_at,
+            records=self._confirmed,
+        )
+        await self._state_store.save(self._cloudflare_client.zone_id, zone_state)
+
+    async def _guarded(
+        self,
+        semaphore: asyncio.Semaphore,
+        records: list[DNSRecordConfig] | list[RecordChange],
+        operation: Awaitable[_T],
+    ) -> tuple[_T | None, bool]:
+        """Await ``operation`` under the concurrency limit; returns ``(result, failed)``."""
+        async with semaphore:
             try:
-                updated |= await self._update_record(current_ip, record_config)
-            except Exception:  # noqa: BLE001
-                await logger.aexception(
-                    "Failed to update record",
-                    record_name=record_config.name,
+                return await operation, False
+            except Exception as e:  # noqa: BLE001
+                keys = [(r.name, r.type if isinstance(r, RecordChange) else _record_type(r)) for r in records]
+                metrics.RECORDS.labels(result="failed").inc(len(keys))
+                for record_name, record_type in keys:
+                    self._confirmed.pop(record_key(record_name, record_type), None)
+                    self._record_errors[record_key(record_name, record_type)] = str(e) or type(e).__name__
+                if len(keys) == 1:
+                    await logger.aexception("Failed to update record", record_name=keys[0][0], record_type=keys[0][1])
+                else:
+                    await logger.aexception("Failed to apply DNS record batch", records=len(keys))
+                    for record_name, record_type in keys:
+                        await logger.aerror(
+                            "Failed to update record",
+                            record_name=record_name,
+                            record_type=record_type,
+                            error=str(e),
+                        )
+                return None, True
+
+    async def _update_batched(
+        self,
+        semaphore: asyncio.Semaphore,
+        current_ips: Mapping[RecordType, str],
+        record_configs: list[DNSRecordConfig],
+        existing_records: dict[str, DNSRecord] | None,
+    ) -> tuple[bool, set[RecordType]]:
+        """Plan every record, then submit the changes through the batch endpoint in chunks.
+
+        Returns whether anything was applied and the record types that had a failure.
+        """
+        planned = await asyncio.gather(
+            *(
+                self._guarded(
+                    semaphore,
+                    [record_config],
+                    self._plan_record(current_ips, record_config, existing_records),
                 )
-                had_errors = True
+                for record_config in record_configs
+            ),
+        )
+        failed_plans = [
+            record_config
+            for record_config, (_, plan_failed) in zip(record_configs, planned, strict=True)
+            if plan_failed
+        ]
+        failed = {_record_type(record_config) for record_config in failed_plans}
+        changes = [change for change, _ in planned if change is not None]
+        metrics.RECORDS.labels(result="skipped").inc(len(planned) - len(changes) - len(failed_plans))
 
-        self._last_ip = None if had_errors else current_ip
-        return updated
+        batch_size = self._config.batch_size
+        chunks = [changes[i : i + batch_size] for i in range(0, len(changes), batch_size)]
+        applied = await asyncio.gather(
+            *(self._guarded(semaphore, chunk, self._apply_batch(chunk)) for chunk in chunks),
+        )
+        updated = any(not chunk_failed for _, chunk_failed in applied)
+        for chunk, (_, chunk_failed) in zip(chunks, applied, strict=True):
+            if chunk_failed:
+                failed.update(change.type for change in chunk)
+        return updated, failed
 
-    async def _update_record(self, current_ip: str, record_config: DNSRecordConfig) -> bool:
-        existing_record = await self._cloudflare_client.get_dns_record(record_config.name)
+    async def _update_record(
+        self,
+        current_ips: Mapping[RecordType, str],
+        record_config: DNSRecordConfig,
+        existing_records: dict[str, DNSRecord] | None,
+    ) -> bool:
+        change = await self._plan_record(current_ips, record_config, existing_records)
+        if change is None:
+            metrics.RECORDS.labels(result="skipped").inc()
+            return False
+
+        await self._apply_change(change)
+        return True
 
-        if existing_record:
-            if existing_record.content == current_ip:
-                await logger.ainfo("Record already up to date", record_name=record_config.name, ip=current_ip)
-                return False
+    async def _plan_record(
+        self,
+        current_ips: Mapping[RecordType, str],
+        record_config: DNSRecordConfig,
+        existing_records: dict[str, DNSRecord] | None,
+    ) -> RecordChange | None:
+        record_type = _record_type(record_config)
+        confirmed = self._confirmed.get(record_key(record_config.name, record_type))
+        if confirmed is not None:
+            # The record ID is known from an earlier cycle, so no lookup is needed to update it.
+            existing_record: DNSRecord | None = DNSRecord(name=record_config.name, **confirmed.model_dump())
+        else:
+            existing_record = await self._lookup_record(record_config, existing_records)
 
-            await self._cloudflare_client.update_dns_record(
-                record_id=existing_record.id,
+        change = self._diff_record(current_ips, record_config, existing_record)
+        if change is None and existing_record is not None:
+            await logger.ainfo(
+                "Record already up to date",
                 record_name=record_config.name,
-                content=current_ip,
-                ttl=record_config.ttl,
-                proxied=record_config.proxied,
+                record_type=record_type,
+                ip=existing_record.content,
             )
+            self._confirm(existing_record, record_type)
+        return change
+
+    async def _lookup_record(
+        self,
+        record_config: DNSRecordConfig,
+        existing_records: dict[str, DNSRecord] | None,
+    ) -> DNSRecord | None:
+        """The record as it is in Cloudflare: from the bulk listing, or fetched on its own without one."""
+        record_type = _record_type(record_config)
+        if existing_records is None:
+            return await self._cloudflare_client.get_dns_record(record_config.name, record_type)
+        return existing_records.get(record_key(record_config.name, record_type))
+
+    def _diff_record(
+        self,
+        current_ips: Mapping[RecordType, str],
+        record_config: DNSRecordConfig,
+        existing_record: DNSRecord | None,
+    ) -> RecordChange | None:
+        """The create or update that brings ``existing_record`` in line with the config, or ``None``."""
+        content = self._content(record_config, current_ips)
+        fields = [] if existing_record is None else diff_record(record_config, content, existing_record)
+        if existing_record is not None and not fields:
+            return None
+
+        return RecordChange(
+            name=record_config.name,
+            content=content,
+            ttl=record_config.ttl,
+            proxied=record_config.proxied,
+            comment=record_config.comment,
+            type=_record_type(record_config),
+            record_id=existing_record.id if existing_record else None,
+            old_content=existing_record.content if existing_record else None,
+            fields=fields,
+        )
+
+    async def _apply_change(self, change: RecordChange) -> None:
+        if change.record_id is not None:
+            record = await self._cloudflare_client.edit_dns_record(change)
+        else:
+            record = await self._cloudflare_client.create_dns_record(
+                record_name=change.name,
+                content=change.content,
+                ttl=change.ttl,
+                proxied=change.proxied,
+                record_type=change.type,
+                comment=change.comment,
+            )
+        self._confirm(record, change.type)
+        await self._log_applied(change)
+
+    async def _apply_batch(self, changes: list[RecordChange]) -> None:
+        records = await self._cloudflare_client.batch_dns_records(changes)
+        for record, change in zip(records, changes, strict=True):
+            self._confirm(record, change.type)
+            await self._log_applied(change)
+
+    async def _log_applied(self, change: RecordChange) -> None:
+        metrics.RECORDS.labels(result="created" if change.record_id is None else "updated").inc()
+        if change.record_id is not None:
             await logger.ainfo(
                 "Record updated",
-                record_name=record_config.name,
-                old_ip=existing_record.content,
-                new_ip=current_ip,
+                record_name=change.name,
+                record_type=change.type,
+                fields=change.fields,
+                old_ip=change.old_content,
+                new_ip=change.content,
             )
         else:
-            await self._cloudflare_client.create_dns_record(
-                record_name=record_config.name,
-                content=current_ip,
-                ttl=record_config.ttl,
-                proxied=record_config.proxied,
-            )
-            await logger.ainfo("Record created", record_name=record_config.name, ip=current_ip)
+            await logger.ainfo("Record created", record_name=change.name, record_type=change.type, ip=change.content)
 
-        return True
+
+def _expand_records(dns_records: list[DNSRecordConfig]) -> list[DNSRecordConfig]:
+    """One entry per managed record; ``type: both`` is split into an A and an AAAA entry."""
+    return [
+        record.model_copy(update={"type": record_type}) for record in dns_records for record_type in record.record_types
+    ]
+
+
+def _verify_intervals(records: list[DNSRecordConfig]) -> dict[str, float]:
+    return {record_key(r.name, _record_type(r)): r.verify_interval for r in records if r.verify_interval is not None}
+
+
+def _select_detectors(
+    record_types: set[RecordType],
+    detectors: Mapping[RecordType, IPDetector | None],
+) -> dict[RecordType, IPDetector]:
+    selected: dict[RecordType, IPDetector] = {}
+    for record_type in record_types:
+        detector = detectors.get(record_type)
+        if detector is None:
+            msg = f"{record_type} records require an IPv{4 if record_type == 'A' else 6} detector"
+            raise ValueError(msg)
+        selected[record_type] = detector
+    return selected
+
+
+def _record_type(record_config: DNSRecordConfig) -> RecordType:
+    # Managed records are already split per type, so ``both`` never reaches here.
+    return "AAAA" if record_config.type == "AAAA" else "A"
@@ -0,0 +1,144 @@
+import asyncio
+import base64
+import binascii
+import ipaddress
+import secrets
+from collections.abc import Mapping
+from http import HTTPStatus
+
+import structlog
+
+from .http_server import HTTPServer, Request, Response
+from .models import RecordType
+from .multi_zone import MultiZoneUpdater
+
+logger = structlog.get_logger()
+
+_REALM = 'Basic realm="cloudflare-ddns"'
+
+
+class PushedIPs:
+    """Addresses pushed by routers, waiting for the daemon to apply them.
+
+    Pushes that arrive before the daemon takes them are merged, so a burst of notifications is applied
+    in one cycle with the latest address per family.
+    """
+
+    def __init__(self) -> None:
+        self._latest: dict[RecordType, str] = {}
+        self._pending: dict[RecordType, str] = {}
+        self._event = asyncio.Event()
+
+    @property
+    def event(self) -> asyncio.Event:
+        """Set while pushed addresses are waiting to be applied."""
+        return self._event
+
+    @property
+    def received(self) -> bool:
+        """Whether any address has been pushed yet."""
+        return bool(self._latest)
+
+    def latest(self, record_type: RecordType) -> str | None:
+        return self._latest.get(record_type)
+
+    def push(self, ips: Mapping[RecordType, str]) -> None:
+        self._latest.update(ips)
+        self._pending.update(ips)
+        self._event.set()
+
+    def take(self) -> dict[RecordType, str]:
+        """Return and clear the addresses pushed since the last call."""
+        pending, self._pending = self._pending, {}
+        self._event.clear()
+        return pending
+
+
+class PushedIPDetector:
+    """Reports the last address pushed for one family, for ``IP_DETECTOR=push``; nothing is polled."""
+
+    def __init__(self, pushed: PushedIPs, record_type: RecordType) -> None:
+        self._pushed = pushed
+        self._record_type = record_type
+
+    async def close(self) -> None:
+        return None
+
+    async def get_current_ip(self) -> str:
+        ip = self._pushed.latest(self._record_type)
+        if ip is None:
+            msg = f"No {self._record_type} address has been pushed yet"
+            raise RuntimeError(msg)
+        return ip
+
+
+class DynDNSReceiver:
+    """dyndns2 ``/nic/update`` endpoint for routers that report their WAN address.
+
+    Requests need HTTP basic auth. ``hostname`` lists the names being updated; names that are not managed
+    records get ``nohost``. ``myip`` (or ``myipv6``) holds the addresses, comma-separated for dual stack,
+    and defaults to the public address the request came from. Accepted addresses go to :class:`PushedIPs`,
+    and every managed record is pointed at them. Replies follow the dyndns2 return codes, one line per
+    hostname.
+    """
+
+    def __init__(self, updater: MultiZoneUpdater, pushed: PushedIPs, username: str, password: str) -> None:
+        self._updater = updater
+        self._pushed = pushed
+        self._credentials = f"{username}:{password}".encode()
+
+    def register(self, server: HTTPServer) -> None:
+        server.route("/nic/update", self.update)
+
+    async def update(self, request: Request) -> Response:
+        if not self._authorized(request):
+            await logger.awarning("Rejected dyndns update", reason="bad credentials", client=request.client)
+            return Response(HTTPStatus.UNAUTHORIZED, "badauth\n", headers={"WWW-Authenticate": _REALM})
+
+        hostnames = [h.strip().lower() for h in ",".join(request.query.get("hostname", [])).split(",") if h.strip()]
+        if not hostnames:
+            return Response(HTTPStatus.OK, "notfqdn\n")
+        ips = self._addresses(request)
+        if ips is None:
+            return Response(HTTPStatus.BAD_REQUEST, "911\n")
+
+        managed = self._updater.record_names
+        current = self._updater.current_ips
+        code = "nochg" if all(current.get(t) == ip for t, ip in ips.items()) else "good"
+        if ips and any(hostname in managed for hostname in hostnames):
+            self._pushed.push(ips)
+            await logger.ainfo("Received dyndns update", hostnames=hostnames, ips=ips, client=request.client)
+        reply = f"{code} {','.join(ips.values())}".rstrip()
+        lines = [reply if hostname in managed else "nohost" for hostname in hostnames]
+        return Response(HTTPStatus.OK, "\n".join(lines) + "\n")
+
+    def _authorized(self, request: Request) -> bool:
+        scheme, _, encoded = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "basic":
+            return False
+        try:
+            credentials = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            return False
+        return secrets.compare_digest(credentials, self._credentials)
+
+    def _addresses(self, request: Request) -> dict[RecordType, str] | None:
+        """Parse the pushed addresses, keeping the families some record needs; ``None`` if there is no valid one."""
+        values = [v for param in ("myip", "myipv6") for value in request.query.get(param, []) for v in value.split(",")]
+        values = [value.strip() for value in values if value.strip()]
+        if not values:
+            # dyndns2 falls back to the sender's address; only a public one can be the WAN address.
+            if request.client is None or not ipaddress.ip_address(request.client).is_global:
+                return None
+            values = [request.client]
+        needed = self._updater.record_types
+        ips: dict[RecordType, str] = {}
+        for value in values:
+            try:
+                ip = ipaddress.ip_address(value)
+            except ValueError:
+                return None
+            record_type: RecordType = "A" if ip.version == 4 else "AAAA"  # noqa: PLR2004
+            if record_type in needed:
+                ips[record_type] = str(ip)
+        return ips
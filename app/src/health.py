@@ -0,0 +1,53 @@
+import time
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+from .http_server import HTTPServer, Request, Response
+from .multi_zone import MultiZoneUpdater
+
+if TYPE_CHECKING:
+    from .lease import FileLease
+
+
+class HealthEndpoints:
+    """``/healthz``, ``/readyz`` and ``/status`` for orchestrators, answered without touching Cloudflare.
+
+    Liveness only proves the event loop still serves requests. Readiness requires a cycle without
+    errors within the last ``ready_window`` seconds; with a ``lease``, a follower standing by is ready.
+    """
+
+    def __init__(self, updater: MultiZoneUpdater, ready_window: float, *, lease: "FileLease | None" = None) -> None:
+        self._updater = updater
+        self._ready_window = ready_window
+        self._lease = lease
+
+    def register(self, server: HTTPServer) -> None:
+        server.route("/healthz", self.healthz)
+        server.route("/readyz", self.readyz)
+        server.route("/status", self.status)
+
+    def is_ready(self) -> bool:
+        if self._is_standing_by():
+            return True
+        last_success = self._updater.last_success
+        return last_success is not None and time.time() - last_success <= self._ready_window
+
+    async def healthz(self, _request: Request) -> Response:
+        return Response(HTTPStatus.OK, "ok\n")
+
+    async def readyz(self, _request: Request) -> Response:
+        if self._is_standing_by():
+            return Response(HTTPStatus.OK, "standing by\n")
+        if self.is_ready():
+            return Response(HTTPStatus.OK, "ready\n")
+        if self._updater.last_success is None:
+            return Response(HTTPStatus.SERVICE_UNAVAILABLE, "no successful cycle yet\n")
+        age = int(time.time() - self._updater.last_success)
+        return Response(HTTPStatus.SERVICE_UNAVAILABLE, f"last successful cycle {age}s ago\n")
+
+    async def status(self, _request: Request) -> Response:
+        body = self._updater.status().model_dump_json()
+        return Response(HTTPStatus.OK, body, content_type="application/json")
+
+    def _is_standing_by(self) -> bool:
+        return self._lease is not None and not self._lease.is_leader
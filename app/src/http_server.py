@@ -0,0 +1,152 @@
+import asyncio
+from collections.abc import Awaitable, Callable
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+import structlog
+
+from . import metrics
+
+logger = structlog.get_logger()
+
+_MAX_HEADER_LINES = 100
+_MAX_BODY_BYTES = 64 * 1024
+_READ_TIMEOUT = 10.0
+
+
+class Request:
+    def __init__(
+        self,
+        method: str,
+        target: str,
+        headers: dict[str, str],
+        body: bytes = b"",
+        client: str | None = None,
+    ) -> None:
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = parse_qs(url.query)
+        # Header names are lowercased.
+        self.headers = headers
+        self.body = body
+        # Address of the peer that sent the request.
+        self.client = client
+
+
+class Response:
+    def __init__(
+        self,
+        status: HTTPStatus,
+        body: str | bytes = b"",
+        content_type: str = "text/plain; charset=utf-8",
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        self.status = status
+        self.body = body.encode() if isinstance(body, str) else body
+        self.content_type = content_type
+        self.headers = headers or {}
+
+
+Handler = Callable[[Request], Awaitable[Response]]
+
+
+class HTTPServer:
+    """Small HTTP/1.1 server for the daemon's operational endpoints, served from its own event loop.
+
+    Each connection carries one request; handlers are registered per path with :meth:`route`.
+    """
+
+    def __init__(self, host: str, port: int) -> None:
+        self._host = host
+        self._port = port
+        self._routes: dict[str, Handler] = {}
+        self._server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int:
+        """The bound port, which differs from the configured one when that was ``0``."""
+        if self._server is None or not self._server.sockets:
+            return self._port
+        port: int = self._server.sockets[0].getsockname()[1]
+        return port
+
+    def route(self, path: str, handler: Handler) -> None:
+        self._routes[path] = handler
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self._host, self._port)
+        await logger.ainfo("HTTP server listening", host=self._host, port=self.port, paths=sorted(self._routes))
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            async with asyncio.timeout(_READ_TIMEOUT):
+                request = await self._read_request(reader, writer.get_extra_info("peername"))
+            if isinstance(request, Response):
+                await self._write_response(writer, request, head=False)
+                return
+            response = await self._dispatch(request)
+            await self._write_response(writer, response, head=request.method == "HEAD")
+        except (OSError, TimeoutError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self._routes.get(request.path)
+        if handler is None:
+            return Response(HTTPStatus.NOT_FOUND, "Not found\n")
+        try:
+            return await handler(request)
+        except Exception:  # noqa: BLE001
+            await logger.aexception("HTTP handler failed", path=request.path)
+            return Response(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error\n")
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader, peername: tuple[object, ...] | None) -> Request | Response:
+        """Read one request, or return the error response for a malformed one without reading its body."""
+        parts = (await reader.readline()).decode("latin-1").split()
+        if len(parts) != 3:  # noqa: PLR2004
+            return Response(HTTPStatus.BAD_REQUEST)
+        headers: dict[str, str] = {}
+        for _ in range(_MAX_HEADER_LINES):
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            return Response(HTTPStatus.BAD_REQUEST)
+        length = int(headers.get("content-length") or 0)
+        if not 0 <= length <= _MAX_BODY_BYTES:
+            return Response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large\n")
+        body = await reader.readexactly(length) if length else b""
+        method, target, _ = parts
+        return Request(method.upper(), target, headers, body, client=str(peername[0]) if peername else None)
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, response: Response, *, head: bool) -> None:
+        status = response.status
+        extra_headers = "".join(f"{name}: {value}\r\n" for name, value in response.headers.items())
+        header = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {response.content_type}\r\n"
+            f"Content-Length: {len(response.body)}\r\n"
+            f"{extra_headers}"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(header.encode("latin-1"))
+        if not head:
+            writer.write(response.body)
+        await writer.drain()
+
+
+async def metrics_endpoint(_request: Request) -> Response:
+    """Serve :data:`metrics.REGISTRY` in the Prometheus text format."""
+    return Response(HTTPStatus.OK, metrics.REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,178 @@
+import asyncio
+import ipaddress
+import socket
+import struct
+from collections.abc import Iterator
+from typing import Literal
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Linux rtnetlink constants, see rtnetlink(7) and <linux/if_addr.h>.
+_NLMSG_HEADER = struct.Struct("=IHHII")
+_IFADDRMSG = struct.Struct("=BBBBI")
+_RTATTR = struct.Struct("=HH")
+_NLMSG_ERROR = 2
+_NLMSG_DONE = 3
+_RTM_NEWADDR = 20
+_RTM_DELADDR = 21
+_RTM_GETADDR = 22
+_NLM_F_REQUEST = 0x1
+_NLM_F_DUMP = 0x300
+_IFA_ADDRESS = 1
+_IFA_LOCAL = 2
+_RT_SCOPE_UNIVERSE = 0
+_RTMGRP_IPV4_IFADDR = 0x10
+_RTMGRP_IPV6_IFADDR = 0x100
+_RECV_BUFFER = 65536
+
+
+class InterfaceIPDetector:
+    """Reads the address held by a local interface and reports address changes via rtnetlink.
+
+    Meant for hosts that own the public address directly (PPPoE, VPS). :meth:`wait_for_change`
+    lets the daemon react to ``RTM_NEWADDR``/``RTM_DELADDR`` events instead of polling. ``family``
+    selects whether the IPv4 or the IPv6 address is reported; for IPv6 only global-scope
+    addresses qualify, since link-local ones are never publicly reachable.
+    """
+
+    def __init__(self, interface: str, family: Literal[4, 6] = 4) -> None:
+        if not hasattr(socket, "AF_NETLINK"):
+            msg = "Interface IP detection requires Linux rtnetlink"
+            raise RuntimeError(msg)
+        self._interface = interface
+        self._family = family
+        self._address_family = socket.AF_INET6 if family == 6 else socket.AF_INET  # noqa: PLR2004
+        self._changed = asyncio.Event()
+        self._events_socket: socket.socket | None = None
+
+    async def close(self) -> None:
+        if self._events_socket is not None:
+            asyncio.get_running_loop().remove_reader(self._events_socket.fileno())
+            self._events_socket.close()
+            self._events_socket = None
+
+    async def get_current_ip(self) -> str:
+        # Subscribe before reading so a change racing this read still wakes the next wait_for_change.
+        self._subscribe()
+        # A dump may span many reads on hosts with lots of addresses; keep it off the event loop.
+        addresses = await asyncio.to_thread(_dump_addresses, self._interface, self._address_family)
+
+        global_addresses = [address for address, scope in addresses if scope == _RT_SCOPE_UNIVERSE]
+        if self._address_family == socket.AF_INET6:
+            candidates = global_addresses
+        else:
+            candidates = global_addresses or [address for address, _ in addresses]
+        if not candidates:
+            msg = f"No IPv{self._family} address assigned to interface {self._interface}"
+            raise RuntimeError(msg)
+        await logger.adebug("IP detected from interface", interface=self._interface, ip=candidates[0])
+        return candidates[0]
+
+    async def wait_for_change(self, max_wait: float) -> bool:
+        """Wait up to ``max_wait`` seconds for an address change on the interface; ``True`` if one occurred."""
+        self._subscribe()
+        try:
+            async with asyncio.timeout(max_wait):
+                await self._changed.wait()
+        except TimeoutError:
+            return False
+        self._changed.clear()
+        return True
+
+    def _subscribe(self) -> None:
+        if self._events_socket is not None:
+            return
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        groups = _RTMGRP_IPV6_IFADDR if self._address_family == socket.AF_INET6 else _RTMGRP_IPV4_IFADDR
+        sock.bind((0, groups))
+        sock.setblocking(False)  # noqa: FBT003
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._on_readable)
+        self._events_socket = sock
+
+    def _on_readable(self) -> None:
+        # The socket is non-blocking: read the queued events and return to the loop once none are left.
+        while self._events_socket is not None:
+            try:
+                data = self._events_socket.recv(_RECV_BUFFER)
+            except BlockingIOError:
+                return
+            self.handle_events(data)
+
+    def handle_events(self, data: bytes) -> None:
+        """Flag a change if ``data`` holds an address event for the watched interface."""
+        try:
+            index = socket.if_nametoindex(self._interface)
+        except OSError:
+            index = None
+        for msg_type, payload in _iter_messages(data):
+            if msg_type in {_RTM_NEWADDR, _RTM_DELADDR} and _IFADDRMSG.unpack_from(payload)[4] == index:
+                logger.info("Interface address changed", interface=self._interface)
+                self._changed.set()
+
+
+def _dump_request(seq: int, family: int = socket.AF_INET) -> bytes:
+    body = _IFADDRMSG.pack(family, 0, 0, 0, 0)
+    header = _NLMSG_HEADER.pack(_NLMSG_HEADER.size + len(body), _RTM_GETADDR, _NLM_F_REQUEST | _NLM_F_DUMP, seq, 0)
+    return header + body
+
+
+def _dump_addresses(interface: str, family: int) -> list[tuple[str, int]]:
+    """Ask the kernel for the ``family`` addresses of ``interface``, as ``(address, scope)``; blocking."""
+    index = socket.if_nametoindex(interface)
+    with socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE) as sock:
+        sock.sendall(_dump_request(seq=1, family=family))
+        return list(_read_dump(sock, index, family))
+
+
+def _read_dump(sock: socket.socket, index: int, family: int) -> Iterator[tuple[str, int]]:
+    while True:
+        data = sock.recv(_RECV_BUFFER)
+        for msg_type, payload in _iter_messages(data):
+            if msg_type == _NLMSG_DONE:
+                return
+            if msg_type == _NLMSG_ERROR:
+                msg = "rtnetlink address dump failed"
+                raise OSError(msg)
+            if msg_type == _RTM_NEWADDR:
+                address = parse_address(payload, index, family)
+                if address is not None:
+                    yield address
+
+
+def parse_address(payload: bytes, index: int, family: int = socket.AF_INET) -> tuple[str, int] | None:
+    """Return ``(address, scope)`` from an ``ifaddrmsg`` payload if it is a ``family`` address on ``index``."""
+    msg_family, _, _, scope, msg_index = _IFADDRMSG.unpack_from(payload)
+    if msg_family != family or msg_index != index:
+        return None
+    attributes = dict(_iter_attributes(payload[_IFADDRMSG.size :]))
+    raw = attributes.get(_IFA_LOCAL) or attributes.get(_IFA_ADDRESS)
+    if raw is None:
+        return None
+    address = ipaddress.IPv6Address(raw) if family == socket.AF_INET6 else ipaddress.IPv4Address(raw)
+    return str(address), scope
+
+
+def _iter_messages(data: bytes) -> Iterator[tuple[int, bytes]]:
+    offset = 0
+    while offset + _NLMSG_HEADER.size <= len(data):
+        length, msg_type, _, _, _ = _NLMSG_HEADER.unpack_from(data, offset)
+        if length < _NLMSG_HEADER.size:
+            return
+        yield msg_type, data[offset + _NLMSG_HEADER.size : offset + length]
+        offset += _align(length)
+
+
+def _iter_attributes(data: bytes) -> Iterator[tuple[int, bytes]]:
+    offset = 0
+    while offset + _RTATTR.size <= len(data):
+        length, attr_type = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            return
+        yield attr_type, data[offset + _RTATTR.size : offset + length]
+        offset += _align(length)
+
+
+def _align(length: int) -> int:
+    return (length + 3) & ~3
@@ -1,46 +1,305 @@
-from typing import Protocol
+import asyncio
+import ipaddress
+import json
+import time
+from collections.abc import Mapping, Sequence
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Literal, Protocol, runtime_checkable
 
 import httpx
 import structlog
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+from . import metrics
+from .models import RecordType
 
 logger = structlog.get_logger()
 
+# HTTP/2 needs the optional ``h2`` package (``httpx[http2]``); fall back to keep-alive HTTP/1.1 without it.
+_HTTP2_AVAILABLE = find_spec("h2") is not None
+
 
 class IPDetector(Protocol):
     async def get_current_ip(self) -> str: ...
 
 
+@runtime_checkable
+class IPChangeNotifier(Protocol):
+    """Detector that can push IP changes instead of relying on the polling interval."""
+
+    async def wait_for_change(self, max_wait: float) -> bool: ...
+
+
+async def detect_ips(detectors: Mapping[RecordType, IPDetector]) -> dict[RecordType, str]:
+    """Detect the address for every record type concurrently.
+
+    A family whose detection fails is left out so the other one can still be updated; only when
+    every detection fails is the first error raised.
+    """
+    results = await asyncio.gather(*(d.get_current_ip() for d in detectors.values()), return_exceptions=True)
+    ips: dict[RecordType, str] = {}
+    errors: dict[RecordType, Exception] = {}
+    for record_type, result in zip(detectors, results, strict=True):
+        if isinstance(result, Exception):
+            errors[record_type] = result
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            ips[record_type] = result
+            await logger.ainfo("Current IP detected", record_type=record_type, ip=result)
+    if errors and not ips:
+        raise next(iter(errors.values()))
+    for record_type, error in errors.items():
+        await logger.aerror("IP detection failed", record_type=record_type, error=str(error))
+    return ips
+
+
+class ProviderStats(BaseModel):
+    """Observed health of one IP provider."""
+
+    ewma_latency: float | None = None
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    last_failure: float | None = None
+
+    @property
+    def success_ratio(self) -> float:
+        total = self.successes + self.failures
+        return 1.0 if total == 0 else self.successes / total
+
+
+_ProviderStatsMap = TypeAdapter(dict[str, ProviderStats])
+
+IPFamily = Literal[4, 6]
+
+_DEFAULT_PROVIDERS: dict[IPFamily, list[str]] = {
+    4: [
+        "https://api.ipify.org",
+        "https://ifconfig.me/ip",
+        "https://icanhazip.com",
+        "https://1.1.1.1/cdn-cgi/trace",
+    ],
+    6: [
+        "https://api6.ipify.org",
+        "https://ipv6.icanhazip.com",
+        "https://ifconfig.me/ip",
+        "https://[2606:4700:4700::1111]/cdn-cgi/trace",
+    ],
+}
+
+# Binding the source address pins every connection to one address family, so a dual-stack
+# provider such as icanhazip.com reports the address of the family being detected.
+_LOCAL_ADDRESS: dict[IPFamily, str] = {4: "0.0.0.0", 6: "::"}  # noqa: S104
+
+
 class PublicIPDetector:
-    def __init__(self, timeout: float = 10.0) -> None:
+    """Detects the public IP via HTTPS providers over one long-lived, keep-alive connection pool.
+
+    The pool is created on first use and must be released with :meth:`close`.
+
+    Providers are ranked by an EWMA of their latency weighted by their success ratio, so the fastest
+    reliable endpoint goes first. A provider that fails ``failure_threshold`` times in a row is skipped
+    for ``cooldown`` seconds. Statistics are available via :attr:`provider_stats` and are persisted to
+    ``stats_path`` when given.
+
+    ``family`` selects IPv4 or IPv6 detection; connections are pinned to that address family. ``providers``
+    replaces the built-in provider list of that family.
+
+    Providers are tried in rank order. With ``hedge_delay`` set, the next provider is also started whenever
+    the running ones have not answered within that many seconds (or as soon as one fails); the first
+    valid IP wins and the remaining requests are cancelled. ``hedge_delay=0`` queries all providers at once.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        timeout: float = 10.0,
+        keepalive_expiry: float = 60.0,
+        hedge_delay: float | None = None,
+        *,
+        stats_path: Path | None = None,
+        failure_threshold: int = 3,
+        cooldown: float = 300.0,
+        ewma_alpha: float = 0.3,
+        family: IPFamily = 4,
+        providers: Sequence[str] | None = None,
+    ) -> None:
         self._timeout = timeout
-        self._providers = [
-            "https://api.ipify.org",
-            "https://ifconfig.me/ip",
-            "https://icanhazip.com",
-            "https://1.1.1.1/cdn-cgi/trace",
-        ]
+        self._keepalive_expiry = keepalive_expiry
+        self._hedge_delay = hedge_delay
+        self._family = family
+        self._providers = list(_DEFAULT_PROVIDERS[family] if providers is None else providers)
+        self._client: httpx.AsyncClient | None = None
+        self._stats_path = stats_path
+        self._failure_threshold = failure_threshold
+        self._cooldown = cooldown
+        self._ewma_alpha = ewma_alpha
+        self._stats = self._load_stats()
+
+    @property
+    def provider_stats(self) -> dict[str, ProviderStats]:
+        return {provider: stats.model_copy() for provider, stats in self._stats.items()}
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
     async def get_current_ip(self) -> str:
-        async with httpx.AsyncClient(timeout=self._timeout) as client:
-            for provider in self._providers:
-                try:
-                    response = await client.get(provider)
-                    response.raise_for_status()
-                    ip = self._parse_response(provider, response.text)
-                    await logger.adebug("IP detected from provider", provider=provider, ip=ip)
-                except (httpx.HTTPError, ValueError) as e:
-                    await logger.awarning("IP detection failed", provider=provider, error=str(e))
-                    continue
-                else:
+        client = self._get_client()
+        providers = self._ranked_providers()
+        try:
+            if self._hedge_delay is None:
+                for provider in providers:
+                    ip = await self._query_provider(client, provider)
+                    if ip is not None:
+                        return ip
+            else:
+                ip = await self._query_hedged(client, providers, self._hedge_delay)
+                if ip is not None:
                     return ip
+        finally:
+            await self._save_stats()
         msg = "Failed to detect public IP from all providers"
         raise RuntimeError(msg)
 
+    def _ranked_providers(self) -> list[str]:
+        """Order providers by score, dropping those in cooldown unless every provider is."""
+        now = time.time()
+        available = [p for p in self._providers if not self._in_cooldown(p, now)] or list(self._providers)
+        return sorted(available, key=self._score)
+
+    def _in_cooldown(self, provider: str, now: float) -> bool:
+        stats = self._stats.get(provider)
+        return (
+            stats is not None
+            and stats.last_failure is not None
+            and stats.consecutive_failures >= self._failure_threshold
+            and now - stats.last_failure < self._cooldown
+        )
+
+    def _score(self, provider: str) -> float:
+        # Providers without samples score 0 so each gets tried once; ties keep the configured order.
+        stats = self._stats.get(provider)
+        if stats is None or stats.ewma_latency is None:
+            return 0.0
+        return stats.ewma_latency / max(stats.success_ratio, 0.05)
+
+    def _record_result(self, provider: str, latency: float, *, success: bool) -> None:
+        result = "success" if success else "failure"
+        metrics.IP_DETECTION_SECONDS.labels(provider=provider, result=result).observe(latency)
+        stats = self._stats.setdefault(provider, ProviderStats())
+        if success:
+            stats.successes += 1
+            stats.consecutive_failures = 0
+        else:
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.last_failure = time.time()
+        self._record_latency(stats, latency)
+
+    def _record_latency(self, stats: ProviderStats, latency: float) -> None:
+        if stats.ewma_latency is None:
+            stats.ewma_latency = latency
+        else:
+            stats.ewma_latency += self._ewma_alpha * (latency - stats.ewma_latency)
+
+    def _load_stats(self) -> dict[str, ProviderStats]:
+        if self._stats_path is None or not self._stats_path.exists():
+            return {}
+        try:
+            return _ProviderStatsMap.validate_json(self._stats_path.read_bytes())
+        except (OSError, ValidationError) as e:
+            logger.warning("Ignoring unreadable provider stats", path=str(self._stats_path), error=str(e))
+            return {}
+
+    async def _save_stats(self) -> None:
+        if self._stats_path is None:
+            return
+        payload = json.dumps({provider: stats.model_dump() for provider, stats in self._stats.items()})
+        try:
+            await asyncio.to_thread(self._write_stats, self._stats_path, payload)
+        except OSError as e:
+            await logger.awarning("Failed to persist provider stats", path=str(self._stats_path), error=str(e))
+
+    @staticmethod
+    def _write_stats(path: Path, payload: str) -> None:
+        tmp_path = path.with_name(f"{path.name}.tmp")
+        tmp_path.write_text(payload)
+        tmp_path.replace(path)
+
+    async def _query_hedged(self, client: httpx.AsyncClient, ranked: list[str], hedge_delay: float) -> str | None:
+        providers = iter(ranked)
+        next_provider = next(providers, None)
+        pending: set[asyncio.Task[str | None]] = set()
+        try:
+            while next_provider is not None or pending:
+                if next_provider is not None:
+                    pending.add(asyncio.create_task(self._query_provider(client, next_provider)))
+                    next_provider = next(providers, None)
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=hedge_delay if next_provider is not None else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    ip = task.result()
+                    if ip is not None:
+                        return ip
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        return None
+
+    async def _query_provider(self, client: httpx.AsyncClient, provider: str) -> str | None:
+        started = time.monotonic()
+        try:
+            response = await client.get(provider)
+            response.raise_for_status()
+            ip = self._parse_response(provider, response.text)
+        except (httpx.HTTPError, ValueError) as e:
+            self._record_result(provider, time.monotonic() - started, success=False)
+            await logger.awarning("IP detection failed", provider=provider, error=str(e))
+            return None
+        except asyncio.CancelledError:
+            # A hedged loser was at least this slow; only let that raise its latency estimate.
+            stats = self._stats.setdefault(provider, ProviderStats())
+            elapsed = time.monotonic() - started
+            if stats.ewma_latency is None or elapsed > stats.ewma_latency:
+                self._record_latency(stats, elapsed)
+            raise
+        else:
+            self._record_result(provider, time.monotonic() - started, success=True)
+            await logger.adebug("IP detected from provider", provider=provider, ip=ip)
+            return ip
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            transport = httpx.AsyncHTTPTransport(
+                http2=_HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_keepalive_connections=len(self._providers),
+                    keepalive_expiry=self._keepalive_expiry,
+                ),
+                local_address=_LOCAL_ADDRESS[self._family],
+            )
+            self._client = httpx.AsyncClient(timeout=self._timeout, transport=transport)
+        return self._client
+
     def _parse_response(self, provider: str, text: str) -> str:
         if "cdn-cgi/trace" in provider:
             for line in text.split("\n"):
                 if line.startswith("ip="):
-                    return line.split("=")[1].strip()
+                    return self._validate(line.split("=")[1].strip())
             msg = "Could not parse IP from Cloudflare trace"
             raise ValueError(msg)
-        return text.strip()
+        return self._validate(text.strip())
+
+    def _validate(self, value: str) -> str:
+        ip = ipaddress.ip_address(value)
+        if ip.version != self._family:
+            msg = f"Expected an IPv{self._family} address, got {value}"
+            raise ValueError(msg)
+        return str(ip)
@@ -0,0 +1,172 @@
+import asyncio
+import fcntl
+import os
+import socket
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO
+
+import structlog
+from pydantic import BaseModel, ValidationError
+
+from app.src import metrics
+
+logger = structlog.get_logger()
+
+
+class _LeaseRecord(BaseModel):
+    holder: str
+    expires: float
+
+
+class FileLease:
+    """Elects one leader among replicas that share the file at ``path``.
+
+    The file names the holder and the Unix time its lease expires, and is only read and rewritten under
+    an exclusive ``fcntl`` lock, so the file may live on a volume shared between containers or hosts.
+    The leader renews its lease every third of ``duration``. The other replicas try to take it just as
+    often, and also right when the expiry they last read passes, so when the leader stops renewing,
+    another replica leads within ``duration`` seconds. A leader that stops cleanly releases the lease,
+    and the next attempt of a follower takes it.
+
+    A replica considers itself leader until ``duration`` after it started its last successful renewal,
+    which is never later than the expiry the others see, so two replicas never lead at the same time
+    as long as their clocks agree.
+    """
+
+    def __init__(self, path: Path, duration: float, holder: str | None = None) -> None:
+        self._path = path
+        self._duration = duration
+        self._holder = holder or f"{socket.gethostname()}:{os.getpid()}"
+        self._current_holder: str | None = None
+        # Unix time the other holder's lease expires, as of the last attempt.
+        self._held_until: float | None = None
+        # Monotonic time until which this replica leads.
+        self._valid_until = 0.0
+        self._acquired = asyncio.Event()
+        self._renewer: asyncio.Task[None] | None = None
+
+    @property
+    def holder(self) -> str:
+        """Name under which this replica holds the lease."""
+        return self._holder
+
+    @property
+    def current_holder(self) -> str | None:
+        """Holder of the lease as of the last attempt, if any."""
+        return self._current_holder
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    @property
+    def event(self) -> asyncio.Event:
+        """Set when this replica becomes leader, until :meth:`consume` is called."""
+        return self._acquired
+
+    def consume(self) -> bool:
+        """Return whether this replica became leader since the last call, clearing the flag."""
+        if not self._acquired.is_set():
+            return False
+        self._acquired.clear()
+        return True
+
+    async def start(self) -> None:
+        """Try to take the lease once, then keep renewing or retrying it in the background."""
+        await self.attempt()
+        self._renewer = asyncio.create_task(self._renew())
+
+    async def stop(self) -> None:
+        """Stop renewing and release the lease if this replica holds it."""
+        if self._renewer is not None:
+            self._renewer.cancel()
+            await asyncio.gather(self._renewer, return_exceptions=True)
+            self._renewer = None
+        if not self.is_leader:
+            return
+        self._valid_until = 0.0
+        metrics.LEADER.labels().set(0)
+        try:
+            await asyncio.to_thread(self._release)
+        except OSError as e:
+            await logger.awarning("Failed to release the lease", path=str(self._path), error=str(e))
+            return
+        await logger.ainfo("Released the lease", holder=self._holder)
+
+    async def attempt(self) -> bool:
+        """Take or renew the lease unless another replica holds it, and return whether this replica leads."""
+        was_leader = self.is_leader
+        started = time.monotonic()
+        try:
+            self._current_holder, self._held_until = await asyncio.to_thread(self._acquire)
+        except OSError as e:
+            # Keep leading until the lease runs out; the file may be back by the next renewal.
+            await logger.awarning("Failed to renew the lease", path=str(self._path), error=str(e))
+        else:
+            if self._current_holder == self._holder:
+                self._valid_until = started + self._duration
+            else:
+                self._valid_until = 0.0
+        if self.is_leader and not was_leader:
+            self._acquired.set()
+            await logger.ainfo("Acquired the lease", holder=self._holder, duration=self._duration)
+        elif was_leader and not self.is_leader:
+            await logger.awarning("Lost the lease", holder=self._holder, current_holder=self._current_holder)
+        metrics.LEADER.labels().set(1 if self.is_leader else 0)
+        return self.is_leader
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self._next_attempt_in())
+            await self.attempt()
+
+    def _next_attempt_in(self) -> float:
+        interval = self._duration / 3
+        if self.is_leader or self._held_until is None:
+            return interval
+        # Don't wait up to a renewal period past the expiry of a leader that has stopped renewing.
+        return min(interval, max(self._held_until - time.time(), 0.0))
+
+    def _acquire(self) -> tuple[str, float | None]:
+        """Take the lease unless another replica holds it; return the holder and when the other's lease expires."""
+        with self._locked() as file:
+            current = _read(file)
+            now = time.time()
+            if current is not None and current.holder != self._holder and current.expires > now:
+                return current.holder, current.expires
+            _write(file, _LeaseRecord(holder=self._holder, expires=now + self._duration))
+        return self._holder, None
+
+    def _release(self) -> None:
+        with self._locked() as file:
+            current = _read(file)
+            if current is not None and current.holder == self._holder:
+                _write(file, _LeaseRecord(holder=self._holder, expires=0))
+
+    @contextmanager
+    def _locked(self) -> Iterator[IO[str]]:
+        self._path.touch(exist_ok=True)
+        with self._path.open("r+") as file:
+            # Released when the file is closed.
+            fcntl.lockf(file, fcntl.LOCK_EX)
+            yield file
+
+
+def _read(file: IO[str]) -> _LeaseRecord | None:
+    file.seek(0)
+    try:
+        return _LeaseRecord.model_validate_json(file.read())
+    except ValidationError:
+        # Empty or damaged: nobody holds the lease.
+        return None
+
+
+def _write(file: IO[str], record: _LeaseRecord) -> None:
+    file.seek(0)
+    file.truncate()
+    file.write(record.model_dump_json())
+    file.flush()
+    os.fsync(file.fileno())
@@ -0,0 +1,214 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+from collections.abc import Callable, Collection
+from typing import Any, BinaryIO, Literal, TextIO, cast
+
+import structlog
+from structlog.typing import BindableLogger, EventDict, FilteringBoundLogger, WrappedLogger
+
+LogFormat = Literal["console", "json"]
+
+# Lines logged for every record or cycle in which nothing happened.
+SAMPLED_EVENTS = frozenset({"IP unchanged, skipping update", "Record already up to date"})
+
+_LEVEL_METHODS = ("debug", "info", "warning", "warn", "error", "exception", "critical", "fatal", "msg")
+
+# Built once: json.dumps with any non-default argument constructs a new encoder on every call.
+_encode_json = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False, default=str).encode
+
+_writer: "QueueWriter | None" = None
+
+
+class LogSampler:
+    """Processor that keeps one in every ``rate`` of the :data:`SAMPLED_EVENTS` lines.
+
+    Lines are counted per event, zone and record, so every record still shows up regularly. A kept line
+    carries ``sampled=rate`` to tell readers that the lines in between were dropped.
+    """
+
+    def __init__(self, rate: int, events: Collection[str] = SAMPLED_EVENTS) -> None:
+        self._rate = rate
+        self._events = events
+        self._counts: dict[tuple[Any, ...], int] = {}
+
+    def __call__(self, _logger: WrappedLogger, _method_name: str, event_dict: EventDict) -> EventDict:
+        event = event_dict.get("event")
+        if event not in self._events:
+            return event_dict
+        key = (event, event_dict.get("zone_id"), event_dict.get("record_name"), event_dict.get("record_type"))
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self._rate:
+            raise structlog.DropEvent
+        event_dict["sampled"] = self._rate
+        return event_dict
+
+
+class QueueWriter:
+    """Bounded queue of rendered lines drained by a single writer thread.
+
+    Logging never waits for the stream: when the queue is full the line is dropped and counted, and the
+    writer reports the number of dropped lines once it catches up.
+    """
+
+    def __init__(self, stream: BinaryIO, maxsize: int) -> None:
+        self._stream = stream
+        self._queue: queue.Queue[bytes | None] = queue.Queue(maxsize)
+        self._dropped = 0
+        self._reported = 0
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def write(self, line: bytes) -> None:
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            self._dropped += 1
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out the queued lines and stop the writer thread."""
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is queued so a burst costs one write and one flush.
+            while len(batch) < self._queue.maxsize:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = [line for line in batch if line is not None]
+            if self._dropped != self._reported:
+                lines.append(self._dropped_line())
+            if lines:
+                self._stream.write(b"".join(lines))
+                self._stream.flush()
+            if None in batch:
+                return
+
+    def _dropped_line(self) -> bytes:
+        dropped, self._reported = self._dropped - self._reported, self._dropped
+        event = {
+            "event": "Log lines dropped",
+            "dropped": dropped,
+            "level": "warning",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        return _encode_json(event).encode() + b"\n"
+
+
+class QueueLogger:
+    """structlog logger that hands rendered lines to a :class:`QueueWriter`."""
+
+    def __init__(self, writer: QueueWriter) -> None:
+        self._writer = writer
+
+    def msg(self, message: str) -> None:
+        self._writer.write(message.encode() + b"\n")
+
+    log = debug = info = warn = warning = msg
+    fatal = failure = err = error = critical = exception = msg
+
+
+class QueueLoggerFactory:
+    def __init__(self, writer: QueueWriter) -> None:
+        self._logger = QueueLogger(writer)
+
+    def __call__(self, *_args: object) -> QueueLogger:
+        return self._logger
+
+
+def _render_json(_logger: WrappedLogger, _method_name: str, event_dict: EventDict) -> str:
+    return _encode_json(event_dict)
+
+
+def _inline_async_methods(wrapper_class: type[BindableLogger]) -> type[BindableLogger]:
+    """Make ``await logger.ainfo(...)`` log in place instead of in the default thread pool.
+
+    structlog runs the async methods in an executor so a slow stream cannot block the event loop. With
+    the queue writer nothing blocks, and the hop to the executor would be most of the cost of a call.
+    """
+
+    def inline(name: str) -> Callable[..., Any]:
+        async def method(self: FilteringBoundLogger, event: str, *args: object, **kw: object) -> object:
+            return getattr(self, name)(event, *args, **kw)
+
+        method.__name__ = f"a{name}"
+        return method
+
+    async def alog(self: FilteringBoundLogger, level: int, event: str, *args: object, **kw: object) -> object:
+        return self.log(level, event, *args, **kw)
+
+    methods: dict[str, Any] = {f"a{name}": inline(name) for name in _LEVEL_METHODS}
+    methods["alog"] = alog
+    return cast("type[BindableLogger]", type(f"Inline{wrapper_class.__name__}", (wrapper_class,), methods))
+
+
+def configure_logging(
+    log_format: LogFormat = "console",
+    *,
+    level: int = logging.INFO,
+    sample_rate: int = 1,
+    queue_size: int = 10000,
+    stream: TextIO | None = None,
+) -> "QueueWriter | None":
+    """Configure structlog and return the queue writer of the ``json`` format.
+
+    ``console`` renders coloured lines and prints them as they are logged, for interactive use. ``json``
+    is meant for production: compact JSON lines are queued for a single writer thread, bound loggers are
+    cached on first use and the async log methods skip the thread pool. The writer is closed at exit,
+    flushing the queued lines.
+    """
+    global _writer  # noqa: PLW0603
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+    stream = sys.stdout if stream is None else stream
+
+    processors: list[Callable[[WrappedLogger, str, EventDict], EventDict | str]] = [
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.add_log_level,
+    ]
+    if sample_rate > 1:
+        processors.append(LogSampler(sample_rate))
+    processors.append(structlog.processors.TimeStamper(fmt="iso", utc=log_format == "json"))
+
+    wrapper_class = structlog.make_filtering_bound_logger(level)
+    if log_format == "console":
+        processors.append(structlog.dev.ConsoleRenderer())
+        structlog.configure(
+            processors=processors,
+            wrapper_class=wrapper_class,
+            context_class=dict,
+            logger_factory=structlog.PrintLoggerFactory(stream),
+            cache_logger_on_first_use=False,
+        )
+        return None
+
+    processors.extend([structlog.processors.dict_tracebacks, _render_json])
+    _writer = QueueWriter(stream.buffer, queue_size)
+    atexit.register(_writer.close)
+    structlog.configure(
+        processors=processors,
+        wrapper_class=_inline_async_methods(wrapper_class),
+        context_class=dict,
+        logger_factory=QueueLoggerFactory(_writer),
+        cache_logger_on_first_use=True,
+    )
+    return _writer
@@ -0,0 +1,220 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Metrics live in module-level objects so the hot paths record a sample with a dict lookup and an
+addition; nothing is formatted until :meth:`MetricsRegistry.render` is called by a scrape.
+"""
+
+import bisect
+import math
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from types import TracebackType
+from typing import Any, Generic, Protocol, TypeVar
+
+_DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class _Series(Protocol):
+    def samples(self, name: str, labels: dict[str, str]) -> list[str]: ...
+
+
+_Child = TypeVar("_Child", bound=_Series)
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: list[_Metric[Any]] = []
+
+    def register(self, metric: "_Metric[Any]") -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for label_values, child in metric.children():
+                labels = dict(zip(metric.labelnames, label_values, strict=True))
+                lines.extend(child.samples(metric.name, labels))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric(ABC, Generic[_Child]):  # noqa: UP046
+    kind = ""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: MetricsRegistry = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], _Child] = {}
+        registry.register(self)
+
+    def labels(self, **labels: str) -> _Child:
+        """Return the time series for ``labels``, creating it on first use."""
+        key = tuple(labels[name] for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def children(self) -> list[tuple[tuple[str, ...], _Child]]:
+        return list(self._children.items())
+
+    @abstractmethod
+    def _new_child(self) -> _Child: ...
+
+
+class _CounterChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def samples(self, name: str, labels: dict[str, str]) -> list[str]:
+        return [f"{name}{_format_labels(labels)} {_format_value(self.value)}"]
+
+
+class _GaugeChild:
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self, name: str, labels: dict[str, str]) -> list[str]:
+        return [f"{name}{_format_labels(labels)} {_format_value(self.value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self._buckets = buckets
+        # One slot per bucket plus +Inf; stored per bucket and accumulated only when rendered.
+        self._counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds its block takes, including when it raises."""
+        return _Timer(self)
+
+    def samples(self, name: str, labels: dict[str, str]) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self._buckets, math.inf), self._counts, strict=True):
+            cumulative += count
+            bucket_labels = {**labels, "le": "+Inf" if bound == math.inf else _format_value(bound)}
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: _HistogramChild) -> None:
+        self._histogram = histogram
+        self._started = 0.0
+
+    def __enter__(self) -> None:
+        self._started = time.perf_counter()
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self._histogram.observe(time.perf_counter() - self._started)
+
+
+class Counter(_Metric[_CounterChild]):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+
+class Gauge(_Metric[_GaugeChild]):
+    kind = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+
+class Histogram(_Metric[_HistogramChild]):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: MetricsRegistry = REGISTRY,
+        *,
+        buckets: Sequence[float] = _DEFAULT_BUCKETS,
+    ) -> None:
+        self._buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self._buckets)
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+IP_DETECTION_SECONDS = Histogram(
+    "cloudflare_ddns_ip_detection_duration_seconds",
+    "Time taken by an IP provider to answer, by provider and result.",
+    ["provider", "result"],
+)
+CLOUDFLARE_API_SECONDS = Histogram(
+    "cloudflare_ddns_cloudflare_api_duration_seconds",
+    "Latency of Cloudflare API requests by operation; every retry is observed on its own.",
+    ["operation"],
+)
+CYCLE_SECONDS = Histogram(
+    "cloudflare_ddns_update_cycle_duration_seconds",
+    "Duration of one update cycle of a zone.",
+    ["zone_id"],
+)
+RECORDS = Counter(
+    "cloudflare_ddns_records_total",
+    "DNS records handled by update cycles, by result: created, updated, skipped or failed.",
+    ["result"],
+)
+LAST_SUCCESS = Gauge(
+    "cloudflare_ddns_last_success_timestamp_seconds",
+    "Unix time of the last update cycle of a zone that completed without errors.",
+    ["zone_id"],
+)
+LEADER = Gauge(
+    "cloudflare_ddns_leader",
+    "1 while this replica holds the lease and runs update cycles, 0 while it stands by.",
+)
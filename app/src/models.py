@@ -1,7 +1,90 @@
-from pydantic import BaseModel
+from typing import Literal, NamedTuple
 
+from pydantic import BaseModel, Field
+
+RecordType = Literal["A", "AAAA"]
+SyncState = Literal["synced", "pending", "failed"]
+
+
+class DNSRecord(NamedTuple):
+    """A record as reported by Cloudflare; ``None`` attributes were not reported.
+
+    A tuple rather than a model: zones are listed in bulk, so records are built straight from the API's
+    JSON without validation, and the ones kept for a cycle stay small.
+    """
 
-class DNSRecord(BaseModel):
     id: str
     name: str
     content: str | None = None
+    ttl: int | None = None
+    proxied: bool | None = None
+    comment: str | None = None
+
+
+class RecordChange(BaseModel):
+    """A pending create (``record_id`` is ``None``) or update of one DNS record.
+
+    An update only sends the attributes named in ``fields``; a create sends all of them.
+    """
+
+    name: str
+    content: str
+    ttl: int
+    proxied: bool
+    comment: str | None = None
+    type: RecordType = "A"
+    record_id: str | None = None
+    old_content: str | None = None
+    fields: list[str] = Field(default_factory=list)
+
+
+def record_key(name: str, record_type: RecordType) -> str:
+    """Identity of a managed record: DNS names are case-insensitive and A/AAAA records are distinct."""
+    return f"{record_type} {name.lower()}"
+
+
+class ZonePlan(BaseModel):
+    """What applying the configuration to one zone would do and how many API requests it would take."""
+
+    zone_id: str
+    changes: list[RecordChange]
+    read_calls: int
+    write_calls: int
+
+    @property
+    def api_calls(self) -> int:
+        return self.read_calls + self.write_calls
+
+
+class RecordStatus(BaseModel):
+    """Sync state of one managed record as last seen by the updater.
+
+    ``synced`` records match the last applied address, ``failed`` ones errored in their last attempt
+    and ``pending`` ones have not been confirmed yet.
+    """
+
+    name: str
+    type: RecordType
+    state: SyncState
+    content: str | None = None
+    error: str | None = None
+
+
+class ZoneStatus(BaseModel):
+    zone_id: str
+    last_ips: dict[RecordType, str]
+    records: list[RecordStatus]
+
+
+class ErrorStatus(BaseModel):
+    message: str
+    time: float
+
+
+class UpdaterStatus(BaseModel):
+    """Snapshot of the daemon served on ``/status``; times are Unix timestamps."""
+
+    ips: dict[RecordType, str]
+    last_success: float | None
+    last_error: ErrorStatus | None
+    zones: list[ZoneStatus]
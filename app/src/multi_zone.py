@@ -0,0 +1,270 @@
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Mapping
+
+import httpx
+import structlog
+
+from app.config import Config, ZoneConfig
+
+from .cloudflare_client import CloudflareClient, resolve_zone_id
+from .dns_updater import DNSUpdater
+from .ip_detector import IPDetector, detect_ips
+from .models import ErrorStatus, RecordType, UpdaterStatus, ZonePlan
+from .rate_limit import RequestScheduler
+from .state import StateStore
+
+logger = structlog.get_logger()
+
+UpdaterBuilder = Callable[[list[ZoneConfig]], Awaitable[list[DNSUpdater]]]
+
+# Resolved zone IDs by API token and zone name: zones of the same name may belong to different accounts.
+ZoneIDCache = dict[tuple[str, str], str]
+
+
+class MultiZoneUpdater:
+    """Detects the IPs once per cycle and fans them out to one :class:`DNSUpdater` per zone.
+
+    Only the address families some zone manages records for are detected.
+
+    With the ``zones`` the updaters were built from and a ``build_updaters`` callback, :meth:`reload`
+    can switch to a new zone configuration in place.
+    """
+
+    def __init__(
+        self,
+        ip_detectors: Mapping[RecordType, IPDetector],
+        updaters: list[DNSUpdater],
+        *,
+        zones: list[ZoneConfig] | None = None,
+        build_updaters: UpdaterBuilder | None = None,
+    ) -> None:
+        self._ip_detectors = _needed_detectors(ip_detectors, updaters)
+        self._updaters = updaters
+        self._zone_keys = (
+            [_zone_key(zone) for zone in zones] if zones is not None else [(u.zone_id, None) for u in updaters]
+        )
+        self._build_updaters = build_updaters
+        self._had_errors = False
+        self._current_ips: dict[RecordType, str] = {}
+        self._last_success: float | None = None
+        self._last_error: ErrorStatus | None = None
+
+    @property
+    def had_errors(self) -> bool:
+        """Whether the last :meth:`update` failed for any address family or zone."""
+        return self._had_errors
+
+    @property
+    def current_ips(self) -> dict[RecordType, str]:
+        """The addresses of the last cycle, per record type."""
+        return dict(self._current_ips)
+
+    @property
+    def record_types(self) -> set[RecordType]:
+        return {record_type for updater in self._updaters for record_type in updater.record_types}
+
+    @property
+    def record_names(self) -> set[str]:
+        """Lowercased names of every managed record."""
+        return {name for updater in self._updaters for name in updater.record_names}
+
+    @property
+    def next_verification(self) -> float | None:
+        """When the next record with its own ``verify_interval`` is due in any zone, as a timestamp.
+
+        ``None`` until a cycle has succeeded: the first cycles read every record anyway.
+        """
+        if self._last_success is None:
+            return None
+        due = [due for updater in self._updaters if (due := updater.next_verification) is not None]
+        return min(due, default=None)
+
+    @property
+    def last_success(self) -> float | None:
+        """Unix time the last :meth:`update` without errors finished."""
+        return self._last_success
+
+    def status(self) -> UpdaterStatus:
+        """Current IPs, per-record sync state and last error, from memory only."""
+        return UpdaterStatus(
+            ips=dict(self._current_ips),
+            last_success=self._last_success,
+            last_error=self._last_error,
+            zones=[updater.status() for updater in self._updaters],
+        )
+
+    def invalidate(self) -> None:
+        """Read every record of every zone back from Cloudflare next cycle."""
+        for updater in self._updaters:
+            updater.invalidate()
+
+    async def reload(self, zones: list[ZoneConfig], ip_detectors: Mapping[RecordType, IPDetector]) -> None:
+        """Switch to a new, already validated zone configuration between cycles.
+
+        Zones are matched by ID or name and API token. A kept zone keeps its state and only reconciles
+        its added and changed records; a new zone is built and reconciled in full. When a new zone cannot
+        be built, or a needed address family has no detector, the error is raised and nothing changes.
+        """
+        if self._build_updaters is None:
+            msg = "This updater was not given a way to build zone updaters"
+            raise RuntimeError(msg)
+        record_types = {t for zone in zones for record in zone.records for t in record.record_types}
+        missing = sorted(record_types - ip_detectors.keys())
+        if missing:
+            msg = f"No IP detector for {', '.join(missing)} records"
+            raise ValueError(msg)
+
+        current = dict(zip(self._zone_keys, self._updaters, strict=True))
+        added = [zone for zone in zones if _zone_key(zone) not in current]
+        built = iter(await self._build_updaters(added))
+        updaters = []
+        for zone in zones:
+            updater = current.get(_zone_key(zone))
+            if updater is None:
+                updater = next(built)
+            else:
+                updater.set_records(zone.records, ip_detectors)
+            updaters.append(updater)
+
+        removed = len(current.keys() - {_zone_key(zone) for zone in zones})
+        self._updaters = updaters
+        self._zone_keys = [_zone_key(zone) for zone in zones]
+        self._ip_detectors = _needed_detectors(ip_detectors, updaters)
+        await logger.ainfo(
+            "Records configuration reloaded",
+            zones=len(zones),
+            added_zones=len(added),
+            removed_zones=removed,
+        )
+
+    async def update(self, current_ips: Mapping[RecordType, str] | None = None) -> bool:
+        """Run one cycle for every zone, detecting the IPs first when they are not given."""
+        self._had_errors = False
+        if current_ips is None:
+            try:
+                current_ips = await detect_ips(self._ip_detectors)
+            except Exception as e:
+                self._record_error(f"IP detection failed: {e}")
+                raise
+        self._current_ips.update(current_ips)
+        missing = sorted(self._ip_detectors.keys() - current_ips.keys())
+        if missing:
+            self._record_error(f"IP detection failed for {', '.join(missing)}")
+
+        results = await asyncio.gather(*(self._update_zone(updater, current_ips) for updater in self._updaters))
+        for updater in self._updaters:
+            if updater.had_errors and not missing:
+                self._record_error(f"Records failed to update in zone {updater.zone_id}")
+        self._had_errors |= any(updater.had_errors for updater in self._updaters)
+        if not self._had_errors:
+            self._last_success = time.time()
+        return any(results)
+
+    async def update_pushed(self, pushed_ips: Mapping[RecordType, str]) -> bool:
+        """Run a cycle with addresses pushed by a router; families that were not pushed are detected as usual."""
+        current_ips = dict(pushed_ips)
+        undetected = {t: detector for t, detector in self._ip_detectors.items() if t not in current_ips}
+        if undetected:
+            try:
+                current_ips.update(await detect_ips(undetected))
+            except Exception as e:  # noqa: BLE001
+                await logger.aerror("IP detection failed", record_types=sorted(undetected), error=str(e))
+        return await self.update(current_ips)
+
+    async def plan(self) -> list[ZonePlan]:
+        """Plan every zone against one IP detection; unlike :meth:`update`, a failing zone fails the plan."""
+        current_ips = await detect_ips(self._ip_detectors)
+        return list(await asyncio.gather(*(updater.plan(current_ips) for updater in self._updaters)))
+
+    async def _update_zone(self, updater: DNSUpdater, current_ips: Mapping[RecordType, str]) -> bool:
+        with structlog.contextvars.bound_contextvars(zone_id=updater.zone_id):
+            try:
+                return await updater.update(current_ips)
+            except Exception as e:  # noqa: BLE001
+                await logger.aexception("Zone update failed")
+                self._record_error(f"Zone {updater.zone_id} update failed: {e}")
+                self._had_errors = True
+                return False
+
+    def _record_error(self, message: str) -> None:
+        self._had_errors = True
+        self._last_error = ErrorStatus(message=message, time=time.time())
+
+
+def _zone_key(zone: ZoneConfig) -> tuple[str, str | None]:
+    return zone.key, zone.api_token
+
+
+def _needed_detectors(
+    ip_detectors: Mapping[RecordType, IPDetector],
+    updaters: list[DNSUpdater],
+) -> dict[RecordType, IPDetector]:
+    record_types = {record_type for updater in updaters for record_type in updater.record_types}
+    return {t: detector for t, detector in ip_detectors.items() if t in record_types}
+
+
+async def build_zone_updaters(  # noqa: PLR0913
+    config: Config,
+    zones: list[ZoneConfig],
+    ip_detectors: Mapping[RecordType, IPDetector],
+    http_client: httpx.AsyncClient,
+    state_store: StateStore | None,
+    *,
+    scheduler: RequestScheduler | None = None,
+    zone_ids: ZoneIDCache | None = None,
+) -> list[DNSUpdater]:
+    """Create a Cloudflare client and updater per zone.
+
+    All clients share ``http_client`` (and so its connection pool); the caller owns and closes it. They
+    also share ``scheduler``: Cloudflare's rate limit applies per user, across every token. Zone names
+    are resolved through ``zone_ids``, which a caller building updaters repeatedly can keep across calls,
+    and through the state file.
+    """
+    if zone_ids is None:
+        zone_ids = {}
+    updaters = []
+    for zone in zones:
+        api_token = zone.api_token or ""
+        zone_id = await _zone_id(zone, api_token, http_client, state_store, scheduler, zone_ids=zone_ids)
+        client = CloudflareClient(
+            api_token,
+            zone_id,
+            page_size=config.records_page_size,
+            http_client=http_client,
+            scheduler=scheduler,
+        )
+        updater = DNSUpdater(
+            config,
+            ip_detectors.get("A"),
+            client,
+            zone.records,
+            state_store,
+            ipv6_detector=ip_detectors.get("AAAA"),
+        )
+        updaters.append(updater)
+    return updaters
+
+
+async def _zone_id(  # noqa: PLR0913
+    zone: ZoneConfig,
+    api_token: str,
+    http_client: httpx.AsyncClient,
+    state_store: StateStore | None,
+    scheduler: RequestScheduler | None,
+    *,
+    zone_ids: ZoneIDCache,
+) -> str:
+    if zone.zone_id:
+        return zone.zone_id
+    zone_name = zone.zone_name or ""
+    key = (api_token, zone_name)
+    cached = zone_ids.get(key) or (state_store.get_zone_id(zone_name, api_token) if state_store else None)
+    if cached:
+        zone_ids[key] = cached
+        return cached
+    zone_id = await resolve_zone_id(api_token, zone_name, http_client=http_client, scheduler=scheduler)
+    zone_ids[key] = zone_id
+    if state_store is not None:
+        await state_store.save_zone_id(zone_name, api_token, zone_id)
+    return zone_id
@@ -0,0 +1,68 @@
+import json
+
+from .models import RecordChange, ZonePlan
+
+
+def render_json(plans: list[ZonePlan]) -> str:
+    payload = {
+        "zones": [
+            {
+                "zone_id": plan.zone_id,
+                "changes": [_change_entry(change) for change in plan.changes],
+                "api_calls": {"read": plan.read_calls, "write": plan.write_calls, "total": plan.api_calls},
+            }
+            for plan in plans
+        ],
+        "api_calls": sum(plan.api_calls for plan in plans),
+    }
+    return json.dumps(payload, indent=2)
+
+
+def render_table(plans: list[ZonePlan]) -> str:
+    header = ("ZONE", "ACTION", "TYPE", "NAME", "FIELDS", "CURRENT", "DESIRED")
+    rows = [
+        (
+            plan.zone_id,
+            _action(change),
+            change.type,
+            change.name,
+            ",".join(change.fields) or "-",
+            change.old_content or "-",
+            change.content,
+        )
+        for plan in plans
+        for change in plan.changes
+    ]
+    if rows:
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+        lines = [
+            "  ".join(cell.ljust(width) for cell, width in zip(row, widths, strict=True)).rstrip()
+            for row in [header, *rows]
+        ]
+    else:
+        lines = ["No changes."]
+    creates = sum(1 for plan in plans for change in plan.changes if change.record_id is None)
+    updates = sum(len(plan.changes) for plan in plans) - creates
+    reads = sum(plan.read_calls for plan in plans)
+    writes = sum(plan.write_calls for plan in plans)
+    lines.append("")
+    lines.append(
+        f"Plan: {creates} to create, {updates} to update. API calls: {reads + writes} ({reads} read, {writes} write).",
+    )
+    return "\n".join(lines)
+
+
+def _action(change: RecordChange) -> str:
+    return "create" if change.record_id is None else "update"
+
+
+def _change_entry(change: RecordChange) -> dict[str, object]:
+    return {
+        "action": _action(change),
+        "type": change.type,
+        "name": change.name,
+        "record_id": change.record_id,
+        "fields": change.fields,
+        "current": change.old_content,
+        "desired": {"content": change.content, "ttl": change.ttl, "proxied": change.proxied, "comment": change.comment},
+    }
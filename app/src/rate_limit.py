@@ -0,0 +1,164 @@
+import asyncio
+import random
+import re
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from typing import TypeVar
+
+import cloudflare
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+_T = TypeVar("_T")
+
+# Cloudflare's global API limit: 1200 requests per five minutes per user, shared by all of its tokens.
+CLOUDFLARE_RATE_LIMIT = 1200
+CLOUDFLARE_RATE_LIMIT_PERIOD = 300.0
+
+# Reset values above this are Unix timestamps rather than seconds from now, as some proxies send them.
+_EPOCH_THRESHOLD = 1_000_000_000.0
+
+# ``Ratelimit: "default";r=50;t=30`` -- remaining requests and seconds until the window resets.
+_STRUCTURED_FIELD = re.compile(r";\s*([rt])=(\d+)")
+
+
+class RequestScheduler:
+    """Paces Cloudflare API requests through a token bucket and retries the ones that fail transiently.
+
+    The bucket holds ``requests`` tokens and refills at ``requests / period`` per second, so a burst can
+    use the whole window but the sustained rate stays under the limit. Rate-limit headers fed to
+    :meth:`observe` (or the :meth:`on_response` httpx hook) shrink the bucket to what the server reports
+    as remaining and pause every caller while a ``Retry-After`` runs.
+
+    429 responses are retried for every call, since Cloudflare rejected them before acting on them;
+    5xx responses and connection errors only for ``idempotent`` calls. Retries back off exponentially
+    from ``backoff`` seconds, with full jitter, up to ``max_backoff``.
+    """
+
+    def __init__(
+        self,
+        requests: int = CLOUDFLARE_RATE_LIMIT,
+        period: float = CLOUDFLARE_RATE_LIMIT_PERIOD,
+        *,
+        max_retries: int = 4,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+    ) -> None:
+        self._capacity = float(requests)
+        self._period = period
+        self._refill_rate = requests / period
+        self._tokens = self._capacity
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._max_retries = max_retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+        # Waiters queue on the lock, so tokens are handed out in request order.
+        self._lock = asyncio.Lock()
+
+    @property
+    def available(self) -> float:
+        """Tokens currently in the bucket."""
+        self._refill(time.monotonic())
+        return self._tokens
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent and take its token."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep(max(wait, (1 - self._tokens) / self._refill_rate))
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Align the bucket with the rate-limit headers of a Cloudflare response."""
+        now = time.monotonic()
+        self._refill(now)
+        remaining, reset = _parse_rate_limit(headers)
+        if remaining is not None:
+            self._tokens = min(self._tokens, float(remaining))
+        retry_after = _parse_seconds(headers.get("retry-after"))
+        if retry_after is None and remaining == 0 and reset is not None:
+            # The window never lasts longer than the period, whatever a misreported reset claims.
+            retry_after = min(reset, self._period)
+        if retry_after is not None:
+            self._paused_until = max(self._paused_until, now + retry_after)
+
+    async def on_response(self, response: httpx.Response) -> None:
+        """Response event hook for the shared httpx client, feeding :meth:`observe`."""
+        self.observe(response.headers)
+
+    async def call(self, operation: Callable[[], Awaitable[_T]], *, idempotent: bool) -> _T:
+        """Run ``operation`` once a token is available, retrying it on transient failures."""
+        attempt = 0
+        while True:
+            await self.acquire()
+            try:
+                return await operation()
+            except cloudflare.APIError as e:
+                if attempt >= self._max_retries or not _is_retryable(e, idempotent=idempotent):
+                    raise
+                delay = random.uniform(0, min(self._max_backoff, self._backoff * 2**attempt))  # noqa: S311
+                attempt += 1
+                await logger.awarning(
+                    "Retrying Cloudflare request",
+                    attempt=attempt,
+                    delay=round(delay, 3),
+                    error=str(e),
+                )
+                await asyncio.sleep(delay)
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._capacity, self._tokens + (now - self._refilled_at) * self._refill_rate)
+        self._refilled_at = now
+
+
+def _is_retryable(error: cloudflare.APIError, *, idempotent: bool) -> bool:
+    if isinstance(error, cloudflare.RateLimitError):
+        return True
+    return idempotent and isinstance(error, cloudflare.InternalServerError | cloudflare.APIConnectionError)
+
+
+def _parse_rate_limit(headers: Mapping[str, str]) -> tuple[int | None, float | None]:
+    """Return the remaining requests and the seconds until the window resets, when reported."""
+    structured = headers.get("ratelimit")
+    if structured is not None:
+        fields = dict(_STRUCTURED_FIELD.findall(structured))
+        remaining = fields.get("r")
+        reset = fields.get("t")
+        return (
+            None if remaining is None else int(remaining),
+            None if reset is None else _reset_seconds(float(reset)),
+        )
+    remaining_header = headers.get("ratelimit-remaining") or headers.get("x-ratelimit-remaining")
+    reset_header = headers.get("ratelimit-reset") or headers.get("x-ratelimit-reset")
+    remaining = _parse_seconds(remaining_header)
+    reset = _parse_seconds(reset_header)
+    return (
+        None if remaining is None else int(remaining),
+        None if reset is None else _reset_seconds(reset),
+    )
+
+
+def _reset_seconds(reset: float) -> float:
+    """Seconds until the window resets, from a reset given either relative to now or as a Unix time."""
+    if reset > _EPOCH_THRESHOLD:
+        return max(reset - time.time(), 0.0)
+    return reset
+
+
+def _parse_seconds(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        # An HTTP-date Retry-After; the exponential backoff covers it instead.
+        return None
+    return max(seconds, 0.0)
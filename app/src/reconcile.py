@@ -0,0 +1,39 @@
+from typing import Protocol
+
+from app.config import DNSRecordConfig
+
+
+class RecordAttributes(Protocol):
+    """Observed attributes of a record; ``None`` means the value was not reported."""
+
+    @property
+    def content(self) -> str | None: ...
+
+    @property
+    def ttl(self) -> int | None: ...
+
+    @property
+    def proxied(self) -> bool | None: ...
+
+    @property
+    def comment(self) -> str | None: ...
+
+
+def diff_record(desired: DNSRecordConfig, content: str, actual: RecordAttributes) -> list[str]:
+    """Names of the attributes of ``actual`` that differ from ``desired`` with ``content``.
+
+    Unreported attributes are assumed to match. The TTL of a proxied record is managed by
+    Cloudflare (reported as ``1``, automatic), so it is only compared for DNS-only records, and a
+    record leaving the proxy always gets its TTL set again. The comment is only managed when the
+    configuration sets one; an empty comment and no comment are the same.
+    """
+    fields = []
+    if actual.content != content:
+        fields.append("content")
+    if actual.proxied is not None and actual.proxied != desired.proxied:
+        fields.append("proxied")
+    if not desired.proxied and ("proxied" in fields or (actual.ttl is not None and actual.ttl != desired.ttl)):
+        fields.append("ttl")
+    if desired.comment is not None and (actual.comment or "") != desired.comment:
+        fields.append("comment")
+    return fields
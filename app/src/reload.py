@@ -0,0 +1,75 @@
+import asyncio
+import contextlib
+import signal
+from pathlib import Path
+
+import structlog
+
+logger = structlog.get_logger()
+
+_FileStamp = tuple[int, int, int] | None
+
+
+class ReloadTrigger:
+    """Signals that the records file should be reloaded, on SIGHUP or when the file changes.
+
+    Changes are found by polling the file's inode, size and mtime every ``poll_interval`` seconds, which
+    also catches editors and config-management tools that replace the file by renaming; ``0`` leaves
+    only SIGHUP.
+    """
+
+    def __init__(self, path: Path, poll_interval: float) -> None:
+        self._path = path
+        self._poll_interval = poll_interval
+        self._stamp = self._file_stamp()
+        self._requested = asyncio.Event()
+        self._watcher: asyncio.Task[None] | None = None
+
+    @property
+    def event(self) -> asyncio.Event:
+        """Set while a reload is pending."""
+        return self._requested
+
+    def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        with contextlib.suppress(NotImplementedError, AttributeError):
+            # Not available on Windows; the file watch still works there.
+            loop.add_signal_handler(signal.SIGHUP, self.request)
+        if self._poll_interval > 0:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        with contextlib.suppress(NotImplementedError, AttributeError):
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    def request(self) -> None:
+        self._requested.set()
+
+    def consume(self) -> bool:
+        """Return whether a reload was requested, clearing the request."""
+        if not self._requested.is_set():
+            return False
+        self._requested.clear()
+        # A write that triggered a SIGHUP must not trigger a second reload through the watch.
+        self._stamp = self._file_stamp()
+        return True
+
+    async def _watch(self) -> None:
+        while True:
+            await asyncio.sleep(self._poll_interval)
+            stamp = self._file_stamp()
+            if stamp != self._stamp:
+                self._stamp = stamp
+                await logger.ainfo("Records file changed", path=str(self._path))
+                self.request()
+
+    def _file_stamp(self) -> _FileStamp:
+        try:
+            stat = self._path.stat()
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Mapping
+from pathlib import Path
+
+import structlog
+from pydantic import BaseModel, Field, ValidationError
+
+from app.config import DNSRecordConfig
+
+from .models import RecordType
+
+logger = structlog.get_logger()
+
+_STATE_VERSION = 2
+
+
+class RecordState(BaseModel):
+    """Last confirmed Cloudflare state of one record; ``None`` fields were not observed."""
+
+    id: str
+    content: str | None = None
+    ttl: int | None = None
+    proxied: bool | None = None
+    comment: str | None = None
+
+
+class ZoneState(BaseModel):
+    """Cached state of one zone; ``records`` is keyed by :func:`~app.src.models.record_key`."""
+
+    config_hash: str
+    last_ips: dict[RecordType, str] = Field(default_factory=dict)
+    verified_at: float = 0.0
+    records: dict[str, RecordState] = Field(default_factory=dict)
+
+
+class _StateFile(BaseModel):
+    version: int = _STATE_VERSION
+    zones: dict[str, ZoneState] = Field(default_factory=dict)
+    zone_ids: dict[str, str] = Field(default_factory=dict)
+
+
+# They decide when a record is touched, not what it should contain, so changing them keeps the cache.
+_SCHEDULING_FIELDS = {"priority", "verify_interval"}
+
+
+def records_config_hash(records: list[DNSRecordConfig]) -> str:
+    """Stable hash of a records configuration, independent of record order and of scheduling settings."""
+    dumped = (r.model_dump(exclude=_SCHEDULING_FIELDS) for r in records)
+    payload = json.dumps(sorted(dumped, key=lambda r: r["name"]), sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _zone_id_key(zone_name: str, api_token: str) -> str:
+    # Accounts may each have a zone of the same name; a token fingerprint tells them apart without storing it.
+    return f"{zone_name}@{hashlib.sha256(api_token.encode()).hexdigest()[:16]}"
+
+
+class StateStore:
+    """On-disk cache of the last applied IP and per-record state, keyed by zone.
+
+    The whole file is rewritten atomically (temp file + rename) on every save, so a crash never
+    leaves a partially written state behind.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._state = self._read()
+        self._write_lock = asyncio.Lock()
+
+    def load(self, zone_id: str, config_hash: str, max_age: float) -> ZoneState | None:
+        """Return the zone's state if it matches ``config_hash`` and is younger than ``max_age`` seconds."""
+        zone_state = self._state.zones.get(zone_id)
+        if zone_state is None or zone_state.config_hash != config_hash:
+            return None
+        if time.time() - zone_state.verified_at > max_age:
+            return None
+        return zone_state.model_copy(deep=True)
+
+    def is_current(
+        self,
+        zone_id: str,
+        records: list[DNSRecordConfig],
+        current_ips: Mapping[RecordType, str],
+        max_age: float,
+    ) -> bool:
+        """Whether ``records`` were last applied for ``current_ips`` within ``max_age`` seconds.
+
+        Lets a one-shot run skip Cloudflare, and the Cloudflare client import, when nothing changed.
+        """
+        zone_state = self.load(zone_id, records_config_hash(records), max_age)
+        if zone_state is None:
+            return False
+        record_types = {record_type for record in records for record_type in record.record_types}
+        return all(
+            record_type in current_ips and zone_state.last_ips.get(record_type) == current_ips[record_type]
+            for record_type in record_types
+        )
+
+    def get_zone_id(self, zone_name: str, api_token: str) -> str | None:
+        return self._state.zone_ids.get(_zone_id_key(zone_name, api_token))
+
+    async def save_zone_id(self, zone_name: str, api_token: str, zone_id: str) -> None:
+        self._state.zone_ids[_zone_id_key(zone_name, api_token)] = zone_id
+        await self._flush()
+
+    async def save(self, zone_id: str, zone_state: ZoneState) -> None:
+        self._state.zones[zone_id] = zone_state.model_copy(deep=True)
+        await self._flush()
+
+    async def _flush(self) -> None:
+        async with self._write_lock:
+            payload = self._state.model_dump_json()
+            try:
+                await asyncio.to_thread(self._write, payload)
+            except OSError as e:
+                await logger.awarning("Failed to persist state", path=str(self._path), error=str(e))
+
+    def _read(self) -> _StateFile:
+        if not self._path.exists():
+            return _StateFile()
+        try:
+            state = _StateFile.model_validate_json(self._path.read_bytes())
+        except (OSError, ValidationError) as e:
+            logger.warning("Ignoring unreadable state file", path=str(self._path), error=str(e))
+            return _StateFile()
+        return state if state.version == _STATE_VERSION else _StateFile()
+
+    def _write(self, payload: str) -> None:
+        tmp_path = self._path.with_name(f"{self._path.name}.tmp")
+        tmp_path.write_text(payload)
+        tmp_path.replace(self._path)
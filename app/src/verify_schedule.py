@@ -0,0 +1,64 @@
+import heapq
+import zlib
+from collections.abc import Mapping
+
+
+class VerifySchedule:
+    """When each record with its own ``verify_interval`` is next read back from Cloudflare.
+
+    Due times are kept in a heap, so finding the due records costs nothing while none are. A record's
+    first due time is spread over its interval by a hash of its key, so records sharing an interval are
+    verified a few at a time instead of in one burst. A due record is rescheduled one interval after it is
+    confirmed, and stays due until then; confirming a record that is not due, e.g. after an IP change,
+    keeps its place.
+    """
+
+    def __init__(self) -> None:
+        self._intervals: dict[str, float] = {}
+        # Current due time per key; heap entries that no longer match it are stale and skipped.
+        self._due: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+
+    def set_intervals(self, intervals: Mapping[str, float], now: float) -> None:
+        """Schedule the records in ``intervals`` and forget the others; unchanged intervals keep their due time."""
+        for key in self._intervals.keys() - intervals.keys():
+            del self._intervals[key]
+            self._due.pop(key, None)
+        for key, interval in intervals.items():
+            if self._intervals.get(key) == interval:
+                continue
+            self._intervals[key] = interval
+            phase = zlib.crc32(key.encode()) / 2**32
+            self._push(key, now + interval * phase)
+
+    def __contains__(self, key: object) -> bool:
+        """Whether ``key`` has its own verify interval."""
+        return key in self._intervals
+
+    def next_due(self) -> float | None:
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list[str]:
+        """Keys whose verification is due; they stay unscheduled until :meth:`verified`."""
+        keys = []
+        while self._heap and self._heap[0][0] <= now:
+            due, key = heapq.heappop(self._heap)
+            if self._due.get(key) == due:
+                del self._due[key]
+                keys.append(key)
+        return keys
+
+    def verified(self, key: str, now: float) -> None:
+        """Schedule the next verification of a due record; records that are not due keep their due time."""
+        interval = self._intervals.get(key)
+        if interval is not None and key not in self._due:
+            self._push(key, now + interval)
+
+    def _push(self, key: str, due: float) -> None:
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, key))
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
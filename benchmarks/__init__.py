@@ -0,0 +1 @@
+"""Benchmarks for the DNS updater (not part of the test suite)."""
@@ -0,0 +1,76 @@
+"""Wall-clock cost of one update cycle as a function of record count and concurrency.
+
+Run with ``python -m benchmarks.bench_concurrency``. Every Cloudflare call sleeps for ``--latency``
+seconds, so the expected cycle time is roughly ``ceil(N / concurrency) * latency``.
+"""
+
+import argparse
+import asyncio
+import math
+import time
+
+import structlog
+
+from app.config import Config, DNSRecordConfig
+from app.src.dns_updater import DNSUpdater
+from app.src.models import DNSRecord, RecordChange
+
+
+class _StaticIPDetector:
+    async def get_current_ip(self) -> str:
+        return "1.2.3.4"
+
+
+class _LatencyCloudflareClient:
+    def __init__(self, latency: float) -> None:
+        self._latency = latency
+        self._request_count = 0
+
+    @property
+    def zone_id(self) -> str:
+        return "zone"
+
+    @property
+    def request_count(self) -> int:
+        return self._request_count
+
+    async def list_dns_records(self, record_names: list[str], record_type: str = "A") -> dict[str, DNSRecord]:  # noqa: ARG002
+        self._request_count += 1
+        await asyncio.sleep(self._latency)
+        return {name.lower(): DNSRecord(id=name, name=name, content="9.9.9.9") for name in record_names}
+
+    async def edit_dns_record(self, change: RecordChange) -> DNSRecord:
+        self._request_count += 1
+        await asyncio.sleep(self._latency)
+        return DNSRecord(id=change.record_id or change.name, name=change.name, content=change.content)
+
+
+async def _run_cycle(records: int, concurrency: int, latency: float) -> float:
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone", max_concurrency=concurrency)  # noqa: S106
+    record_configs = [DNSRecordConfig(name=f"host{i}.example.com") for i in range(records)]
+    updater = DNSUpdater(config, _StaticIPDetector(), _LatencyCloudflareClient(latency), record_configs)  # type: ignore[arg-type]
+
+    started = time.perf_counter()
+    await updater.update()
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per Cloudflare call")
+    parser.add_argument("--records", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 25])
+    args = parser.parse_args()
+
+    structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(40))
+
+    print(f"{'records':>8} {'concurrency':>12} {'elapsed_s':>10} {'expected_s':>11}")  # noqa: T201
+    for records in args.records:
+        for concurrency in args.concurrency:
+            elapsed = asyncio.run(_run_cycle(records, concurrency, args.latency))
+            expected = (1 + math.ceil(records / concurrency)) * args.latency
+            print(f"{records:>8} {concurrency:>12} {elapsed:>10.3f} {expected:>11.3f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
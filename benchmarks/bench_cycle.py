@@ -0,0 +1,156 @@
+"""End-to-end cost of one update cycle against local HTTP fakes of Cloudflare and the IP providers.
+
+Run with ``python -m benchmarks.bench_cycle``. Each sample is a fresh interpreter that builds the
+updater the way the daemon does (``build_updater``: shared connection pool, request scheduler, real
+``CloudflareClient`` and ``PublicIPDetector``) and runs one cycle, logging JSON to ``/dev/null``.
+Scenarios:
+
+- ``create``: none of the records exist yet.
+- ``update``: every record points at the previous address.
+- ``verify``: every record is current, but there is no state, so all of them are read back.
+
+Reported per sample: cycle wall time, Cloudflare calls by operation (as seen by the fake), the
+client's CPU time for the cycle and its peak RSS. Use ``--json`` to compare runs in a script.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import TYPE_CHECKING, Any
+
+from app.config import Config, DNSRecordConfig, ZoneConfig
+from app.main import build_updater, close_ip_detectors
+from app.src.ip_detector import PublicIPDetector
+from app.src.logs import configure_logging
+from benchmarks.fakes import FakeCloudflareAPI, FakeIPProvider
+
+if TYPE_CHECKING:
+    from app.src.models import RecordType
+
+_SCENARIOS = ("create", "update", "verify")
+_CURRENT_IP = "203.0.113.7"
+_PREVIOUS_IP = "198.51.100.1"
+
+
+def _record_name(index: int) -> str:
+    return f"host{index}.bench.example"
+
+
+def _seed(api: FakeCloudflareAPI, scenario: str, records: int) -> None:
+    api.reset()
+    if scenario == "create":
+        return
+    content = _PREVIOUS_IP if scenario == "update" else _CURRENT_IP
+    for index in range(records):
+        api.add_record(_record_name(index), content)
+
+
+async def _cycle(spec: dict[str, Any]) -> dict[str, Any]:
+    config = Config(
+        cloudflare_api_token="token",  # noqa: S106
+        cloudflare_zone_id="zone",
+        max_concurrency=spec["concurrency"],
+        batch_updates=spec["batch"],
+        api_rate_limit=1_000_000,
+    )
+    zones = [
+        ZoneConfig(
+            zone_id="zone",
+            api_token="token",  # noqa: S106
+            records=[DNSRecordConfig(name=_record_name(index)) for index in range(spec["records"])],
+        ),
+    ]
+    async with AsyncExitStack() as exit_stack:
+        detector = PublicIPDetector(hedge_delay=spec["hedge_delay"], providers=spec["providers"])
+        ip_detectors: dict[RecordType, PublicIPDetector] = {"A": detector}
+        exit_stack.push_async_callback(close_ip_detectors, ip_detectors)
+        updater = await build_updater(config, zones, ip_detectors, None, exit_stack)
+
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        changed = await updater.update()
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu_started
+
+    return {
+        "cycle_s": elapsed,
+        "cpu_s": cpu,
+        # ru_maxrss is in KiB on Linux.
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "changed": changed,
+        "errors": updater.had_errors,
+    }
+
+
+def _run_child(spec: dict[str, Any]) -> None:
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        writer = configure_logging("json", stream=devnull)
+        result = asyncio.run(_cycle(spec))
+        if writer is not None:
+            writer.close()
+    sys.stdout.write(json.dumps(result) + "\n")
+
+
+def _sample(api: FakeCloudflareAPI, spec: dict[str, Any]) -> dict[str, Any]:
+    env = {**os.environ, "CLOUDFLARE_BASE_URL": api.url}
+    command = [sys.executable, "-m", "benchmarks.bench_cycle", "--child", json.dumps(spec)]
+    output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout  # noqa: S603
+    return {**json.loads(output), "calls": dict(sorted(api.calls.items()))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, nargs="+", default=[1, 100, 1000, 10000])
+    parser.add_argument("--scenarios", choices=_SCENARIOS, nargs="+", default=list(_SCENARIOS))
+    parser.add_argument("--latency", type=float, default=0.005, help="simulated seconds per Cloudflare call")
+    parser.add_argument("--throttle-every", type=int, default=0, help="answer every Nth Cloudflare call with 429")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of Cloudflare calls answered with 502")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--batch", action="store_true", help="submit changes through the batch endpoint")
+    parser.add_argument("--provider-latency", type=float, default=0.01, help="seconds the fast IP provider takes")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per sample")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        _run_child(json.loads(args.child))
+        return
+
+    api = FakeCloudflareAPI(latency=args.latency, throttle_every=args.throttle_every, failure_rate=args.failure_rate)
+    # A stalled provider ranked first, so IP detection goes through the hedging path.
+    slow_provider = FakeIPProvider(_CURRENT_IP, latency=5.0)
+    fast_provider = FakeIPProvider(_CURRENT_IP, latency=args.provider_latency)
+    with api, slow_provider, fast_provider:
+        if not args.json:
+            print(  # noqa: T201
+                f"{'records':>8} {'scenario':>8} {'cycle_s':>8} {'cpu_s':>7} {'rss_mb':>7} {'errors':>6}  calls",
+            )
+        for records in args.records:
+            for scenario in args.scenarios:
+                _seed(api, scenario, records)
+                spec = {
+                    "records": records,
+                    "concurrency": args.concurrency,
+                    "batch": args.batch,
+                    "hedge_delay": 0.05,
+                    "providers": [slow_provider.base_url, fast_provider.base_url],
+                }
+                result = _sample(api, spec)
+                if args.json:
+                    print(json.dumps({"records": records, "scenario": scenario, **result}))  # noqa: T201
+                    continue
+                calls = " ".join(f"{operation}={count}" for operation, count in result["calls"].items())
+                print(  # noqa: T201
+                    f"{records:>8} {scenario:>8} {result['cycle_s']:>8.3f} {result['cpu_s']:>7.3f} "
+                    f"{result['peak_rss_mb']:>7.1f} {result['errors']!s:>6}  {calls}",
+                )
+
+
+if __name__ == "__main__":
+    main()
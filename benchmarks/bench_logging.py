@@ -0,0 +1,47 @@
+"""Per-call cost of ``await logger.ainfo(...)`` with the console and the JSON logging pipelines.
+
+Run with ``python -m benchmarks.bench_logging``. Output goes to ``/dev/null``, so the numbers are the
+cost paid by the event loop, not by the terminal. ``sampled`` logs the repetitive "Record already up
+to date" line with ``LOG_SAMPLE_RATE=10``.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+import structlog
+
+from app.src.logs import LogFormat, configure_logging
+
+
+async def _log_calls(calls: int, event: str) -> float:
+    logger = structlog.get_logger()
+    started = time.perf_counter()
+    for i in range(calls):
+        await logger.ainfo(event, record_name=f"host{i % 100}.example.com", record_type="A", ip="1.2.3.4")
+    return time.perf_counter() - started
+
+
+def _measure(log_format: LogFormat, calls: int, sample_rate: int = 1) -> float:
+    with open(os.devnull, "w") as devnull:  # noqa: PTH123
+        writer = configure_logging(log_format, sample_rate=sample_rate, stream=devnull)
+        elapsed = asyncio.run(_log_calls(calls, "Record already up to date"))
+        if writer is not None:
+            writer.close()
+    return elapsed / calls
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'pipeline':>10} {'us_per_call':>12}")  # noqa: T201
+    for name, log_format, sample_rate in [("console", "console", 1), ("json", "json", 1), ("sampled", "json", 10)]:
+        per_call = _measure(log_format, args.calls, sample_rate)
+        print(f"{name:>10} {per_call * 1e6:>12.1f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Memory and CPU cost of indexing a large zone with ``CloudflareClient.list_dns_records``.
+
+Run with ``python -m benchmarks.bench_memory``. The zone's pages are pre-rendered and served from an
+in-process transport, so only the client's work is measured. ``sdk models`` parses the same pages
+into the SDK's ``RecordResponse`` objects, the way records were read before the lean path; ``lean``
+is the client as it is. Peak and retained sizes come from ``tracemalloc``.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import tracemalloc
+from collections.abc import Callable, Coroutine
+from typing import Any
+from urllib.parse import parse_qs
+
+import httpx
+from cloudflare import AsyncCloudflare
+
+from app.src.cloudflare_client import CloudflareClient
+from app.src.logs import configure_logging
+
+
+def _transport(records: int, page_size: int) -> httpx.MockTransport:
+    raw_records: list[dict[str, Any]] = [
+        {
+            "id": f"{index:032x}",
+            "name": f"host{index}.bench.example",
+            "type": "A",
+            "content": "203.0.113.7",
+            "ttl": 300,
+            "proxied": False,
+            "comment": None,
+            "tags": [],
+            "meta": {},
+            "settings": {},
+            "created_on": "2024-01-01T00:00:00Z",
+            "modified_on": "2024-01-01T00:00:00Z",
+        }
+        for index in range(records)
+    ]
+    total_pages = -(-records // page_size)
+    # One empty page past the end, for clients that stop on a short page.
+    pages = [
+        json.dumps(
+            {
+                "success": True,
+                "errors": [],
+                "messages": [],
+                "result": raw_records[page * page_size : (page + 1) * page_size],
+                "result_info": {"page": page + 1, "per_page": page_size},
+            },
+        ).encode()
+        for page in range(total_pages + 1)
+    ]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = int(parse_qs(request.url.query.decode()).get("page", ["1"])[0])
+        return httpx.Response(200, content=pages[page - 1], headers={"Content-Type": "application/json"})
+
+    return httpx.MockTransport(handler)
+
+
+async def _lean(transport: httpx.MockTransport, names: list[str], page_size: int) -> object:
+    async with httpx.AsyncClient(transport=transport) as http_client:
+        client = CloudflareClient("token", "zone", page_size=page_size, http_client=http_client)
+        return await client.list_dns_records(names)
+
+
+async def _sdk_models(transport: httpx.MockTransport, names: list[str], page_size: int) -> object:
+    async with httpx.AsyncClient(transport=transport) as http_client:
+        client = AsyncCloudflare(api_token="token", http_client=http_client)  # noqa: S106
+        wanted = set(names)
+        index = {}
+        page = 1
+        while True:
+            records = await client.dns.records.list(zone_id="zone", type="A", page=page, per_page=page_size)
+            index.update({record.name: record for record in records.result if record.name in wanted})
+            if len(records.result) < page_size:
+                return index
+            page += 1
+
+
+def _measure(
+    run: Callable[[httpx.MockTransport, list[str], int], Coroutine[Any, Any, object]],
+    records: int,
+    page_size: int,
+) -> tuple[float, float, float]:
+    transport = _transport(records, page_size)
+    names = [f"host{index}.bench.example" for index in range(records)]
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.process_time()
+    index = asyncio.run(run(transport, names, page_size))
+    cpu = time.process_time() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del index
+    return (peak - baseline) / 2**20, (retained - baseline) / 2**20, cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    configure_logging(level=logging.WARNING)
+
+    print(f"{'path':>12} {'peak_mb':>8} {'retained_mb':>12} {'cpu_s':>7}")  # noqa: T201
+    for name, run in [("sdk models", _sdk_models), ("lean", _lean)]:
+        peak, retained, cpu = _measure(run, args.records, args.page_size)
+        print(f"{name:>12} {peak:>8.1f} {retained:>12.1f} {cpu:>7.2f}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Cold-start cost of a ``--once`` run whose IP has not changed.
+
+Run with ``python -m benchmarks.bench_startup``. Each sample is a fresh interpreter running
+``python -m app.main --once`` against a pre-populated state file, with the address read from the
+loopback interface (Linux), so no network is involved. A bare ``import app.main`` is measured as a
+baseline, and ``-X importtime`` shows whether the Cloudflare SDK was loaded at all.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import DNSRecordConfig
+from app.src.state import StateStore, ZoneState, records_config_hash
+
+
+def _prepare(directory: Path) -> dict[str, str]:
+    records = [DNSRecordConfig(name="home.example.com")]
+    records_path = directory / "records.json"
+    records_path.write_text(json.dumps({"records": [record.model_dump() for record in records]}))
+    state_path = directory / "state.json"
+    zone_state = ZoneState(
+        config_hash=records_config_hash(records),
+        last_ips={"A": "127.0.0.1"},
+        verified_at=time.time(),
+    )
+    asyncio.run(StateStore(state_path).save("zone", zone_state))
+    return {
+        **os.environ,
+        "CLOUDFLARE_API_TOKEN": "token",
+        "CLOUDFLARE_ZONE_ID": "zone",
+        "RECORDS_CONFIG_PATH": str(records_path),
+        "STATE_PATH": str(state_path),
+        "IP_DETECTOR": "interface",
+        "IP_INTERFACE": "lo",
+    }
+
+
+def _sample(command: list[str], env: dict[str, str], runs: int) -> tuple[float, int]:
+    timings = []
+    returncode = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = subprocess.run(command, env=env, capture_output=True, check=False)  # noqa: S603
+        timings.append(time.perf_counter() - started)
+        returncode = result.returncode
+    return statistics.median(timings), returncode
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10, help="interpreter launches per scenario")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = _prepare(Path(directory))
+        scenarios = {
+            "python -c pass": [sys.executable, "-c", "pass"],
+            "import app.main": [sys.executable, "-c", "import app.main"],
+            "--once (unchanged)": [sys.executable, "-m", "app.main", "--once"],
+        }
+        print(f"{'scenario':<20} {'median_ms':>10} {'exit':>5}")  # noqa: T201
+        for name, command in scenarios.items():
+            elapsed, returncode = _sample(command, env, args.runs)
+            print(f"{name:<20} {elapsed * 1000:>10.1f} {returncode:>5}")  # noqa: T201
+
+        trace = subprocess.run(  # noqa: S603
+            [sys.executable, "-X", "importtime", "-m", "app.main", "--once"],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        loaded = any(line.rstrip().endswith("| cloudflare") for line in trace.stderr.splitlines())
+        print(f"cloudflare SDK imported by --once (unchanged): {loaded}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""Local HTTP stand-ins for the Cloudflare v4 DNS API and the public IP providers.
+
+Both servers run in a background thread of the benchmark or test process, so the client under test
+talks real HTTP over loopback while their CPU time is not charged to it.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+from typing import Any, Self
+from urllib.parse import parse_qs, urlsplit
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __enter__(self) -> Self:
+        threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True).start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def handle_error(self, request: Any, client_address: Any) -> None:  # noqa: ANN401
+        # Hedged IP lookups cancel the losing request, so clients may hang up before the response.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real endpoints; otherwise every request would pay for a new connection.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401, ARG002
+        return None
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeCloudflareAPI(_Server):
+    """Zone lookup and DNS records endpoints of the Cloudflare v4 API, for the benchmarks and the tests.
+
+    Records can be listed (paginated, filtered by type and name), created, edited and batched.
+
+    Every request sleeps ``latency`` seconds. Record requests can be rejected before they are applied,
+    like a rejected request at the edge: with the statuses queued in ``failures``, in order, then every
+    ``throttle_every``-th one with a 429 and ``Retry-After: 0``, and a ``failure_rate`` share with a 502.
+    ``fail_batch`` makes batches fail as a whole. ``requests`` and ``bodies`` record what was received;
+    ``response_headers`` are added to every response.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        throttle_every: int = 0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _CloudflareHandler)
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.failure_rate = failure_rate
+        self.records: dict[str, dict[str, Any]] = {}
+        # Zone name -> ID, for lookups by name.
+        self.zones: dict[str, str] = {}
+        self.calls: Counter[str] = Counter()
+        self.requests: list[tuple[str, str]] = []
+        self.bodies: list[dict[str, Any]] = []
+        self.failures: list[int] = []
+        self.fail_batch = False
+        self.response_headers: dict[str, str] = {}
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)  # noqa: S311
+        self._requests = 0
+        self._next_id = 0
+
+    @property
+    def url(self) -> str:
+        return f"{self.base_url}/client/v4"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.records.clear()
+            self.calls.clear()
+            self.requests.clear()
+            self.bodies.clear()
+            self._requests = 0
+
+    def add_record(self, name: str, content: str, record_type: str = "A", **fields: Any) -> dict[str, Any]:  # noqa: ANN401
+        self._next_id += 1
+        record = {
+            "id": f"rec-{self._next_id}",
+            "name": name,
+            "type": record_type,
+            "content": content,
+            "ttl": 300,
+            "proxied": False,
+            "comment": None,
+            **fields,
+        }
+        self.records[record["id"]] = record
+        return record
+
+    def find(self, name: str) -> dict[str, Any] | None:
+        return next((record for record in self.records.values() if record["name"] == name), None)
+
+    def rejection(self) -> int | None:
+        """Status with which to reject the current record request, if any."""
+        self._requests += 1
+        if self.failures:
+            return self.failures.pop(0)
+        if self.throttle_every and self._requests % self.throttle_every == 0:
+            return 429
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return 502
+        return None
+
+
+class _CloudflareHandler(_Handler):
+    server: FakeCloudflareAPI
+
+    _RECORDS_PATH = re.compile(r"^/client/v4/zones/[^/]+/dns_records(?:/(?P<record_id>[^/]+))?$")
+    _ZONES_PATH = "/client/v4/zones"
+
+    def do_GET(self) -> None:
+        self._handle("GET")
+
+    def do_POST(self) -> None:
+        self._handle("POST")
+
+    def do_PATCH(self) -> None:
+        self._handle("PATCH")
+
+    def do_PUT(self) -> None:
+        self._handle("PUT")
+
+    def _handle(self, method: str) -> None:
+        url = urlsplit(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else {}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if url.path == self._ZONES_PATH:
+            with self.server.lock:
+                self.server.requests.append((method, url.path))
+            name = parse_qs(url.query).get("name", [""])[0]
+            zones = [{"id": zone_id, "name": zone_name} for zone_name, zone_id in self.server.zones.items()]
+            self._respond(200, [zone for zone in zones if zone["name"] == name])
+            return
+        match = self._RECORDS_PATH.match(url.path)
+        if match is None:
+            self._respond(404, None, errors=[{"code": 7003, "message": "No route"}])
+            return
+        record_id = match.group("record_id")
+        operation = {"GET": "list", "PATCH": "edit", "PUT": "edit"}.get(
+            method,
+            "batch" if record_id == "batch" else "create",
+        )
+        with self.server.lock:
+            self.server.calls[operation] += 1
+            self.server.requests.append((method, url.path))
+            self.server.bodies.append(body)
+            status = self.server.rejection()
+            if status is not None:
+                self.server.calls[f"{operation}_{status}"] += 1
+                headers = {"Retry-After": "0"} if status == 429 else {}  # noqa: PLR2004
+                self._respond(status, None, errors=[{"code": 10000, "message": "Injected failure"}], headers=headers)
+            elif operation == "list":
+                self._list(parse_qs(url.query))
+            elif operation == "batch":
+                self._batch(body)
+            elif operation == "create":
+                self._respond(200, self.server.add_record(**self._fields(body), record_type=body["type"]))
+            elif record_id in self.server.records:
+                self.server.records[record_id].update(self._fields(body))
+                self._respond(200, self.server.records[record_id])
+            else:
+                self._respond(404, None, errors=[{"code": 81044, "message": "Record does not exist."}])
+
+    def _list(self, query: dict[str, list[str]]) -> None:
+        record_type = query.get("type", ["A"])[0]
+        name = query.get("name.exact", query.get("name", [None]))[0]
+        records = [
+            record
+            for record in self.server.records.values()
+            if record["type"] == record_type and (name is None or record["name"] == name)
+        ]
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("per_page", ["100"])[0])
+        total_pages = max(1, -(-len(records) // per_page))
+        result = records[(page - 1) * per_page : page * per_page]
+        info = {
+            "page": page,
+            "per_page": per_page,
+            "count": len(result),
+            "total_count": len(records),
+            "total_pages": total_pages,
+        }
+        self._respond(200, result, result_info=info)
+
+    def _batch(self, body: dict[str, Any]) -> None:
+        if self.server.fail_batch:
+            self._respond(400, None, errors=[{"code": 81058, "message": "Batch failed"}])
+            return
+        posts = [
+            self.server.add_record(**self._fields(post), record_type=post["type"]) for post in body.get("posts", [])
+        ]
+        patches = []
+        for patch in body.get("patches", []):
+            self.server.records[patch["id"]].update(self._fields(patch))
+            patches.append(self.server.records[patch["id"]])
+        self._respond(200, {"deletes": [], "patches": patches, "posts": posts, "puts": []})
+
+    @staticmethod
+    def _fields(body: dict[str, Any]) -> dict[str, Any]:
+        return {key: value for key, value in body.items() if key not in {"id", "type"}}
+
+    def _respond(
+        self,
+        status: int,
+        result: Any,  # noqa: ANN401
+        *,
+        errors: list[dict[str, Any]] | None = None,
+        result_info: dict[str, int] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        payload: dict[str, Any] = {"success": status < 400, "errors": errors or [], "messages": [], "result": result}  # noqa: PLR2004
+        if result_info is not None:
+            payload["result_info"] = result_info
+        all_headers = {**self.server.response_headers, **(headers or {})}
+        self._send(status, json.dumps(payload).encode(), "application/json", all_headers)
+
+
+class FakeIPProvider(_Server):
+    """Plain-text "what is my IP" endpoint answering ``ip`` after ``latency`` seconds."""
+
+    def __init__(self, ip: str, *, latency: float = 0.0) -> None:
+        super().__init__(("127.0.0.1", 0), _IPProviderHandler)
+        self.ip = ip
+        self.latency = latency
+        self.calls = 0
+
+
+class _IPProviderHandler(_Handler):
+    server: FakeIPProvider
+
+    def do_GET(self) -> None:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.server.calls += 1
+        self._send(200, f"{self.server.ip}\n".encode(), "text/plain")
@@ -1,37 +1,86 @@
 from __future__ import annotations
 
+import asyncio
+import json
+from collections.abc import Iterator
 from types import SimpleNamespace
 from typing import Any, Callable
 
 import pytest
 
-from app.config import DNSRecordConfig
+from app.config import Config, DNSRecordConfig
 from app.src.cloudflare_client import CloudflareClient
 from app.src.dns_updater import DNSUpdater
-from app.src.models import DNSRecord
+from app.src.models import DNSRecord, RecordChange
+from app.src.state import StateStore
+from benchmarks.fakes import FakeCloudflareAPI
 
 
 class _FakeIPDetector:
     def __init__(self, ip: str) -> None:
         self._ip = ip
+        self.calls = 0
 
     def set_ip(self, ip: str) -> None:
         self._ip = ip
 
     async def get_current_ip(self) -> str:
+        self.calls += 1
         return self._ip
 
+    async def close(self) -> None:
+        return None
+
 
 class _FakeCloudflareClient:
-    def __init__(self, records: dict[str, DNSRecord] | None = None) -> None:
+    def __init__(
+        self,
+        records: dict[str, DNSRecord] | None = None,
+        zone_id: str = "zone",
+        aaaa_records: dict[str, DNSRecord] | None = None,
+    ) -> None:
+        self.zone_id = zone_id
         self.records: dict[str, DNSRecord] = records or {}
+        self.aaaa_records: dict[str, DNSRecord] = aaaa_records or {}
         self.created_calls: list[dict[str, str]] = []
         self.updated_calls: list[dict[str, str]] = []
+        self.get_calls = 0
+        self.list_calls = 0
+        self.listed_names: list[list[str]] = []
+        self.request_count = 0
+        self.batch_calls: list[list[RecordChange]] = []
         self.raise_on_create = False
         self.raise_on_update = False
-
-    async def get_dns_record(self, name: str) -> DNSRecord | None:
-        return self.records.get(name)
+        self.raise_on_batch = False
+        self.latency = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def _simulate_latency(self) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+
+    def _store(self, record_type: str) -> dict[str, DNSRecord]:
+        return self.aaaa_records if record_type == "AAAA" else self.records
+
+    async def get_dns_record(self, name: str, record_type: str = "A") -> DNSRecord | None:
+        self.get_calls += 1
+        self.request_count += 1
+        await self._simulate_latency()
+        return self._store(record_type).get(name)
+
+    async def list_dns_records(self, record_names: list[str], record_type: str = "A") -> dict[str, DNSRecord]:
+        self.list_calls += 1
+        self.listed_names.append(sorted(record_names))
+        self.request_count += 1
+        wanted = {name.lower() for name in record_names}
+        return {
+            name.lower(): record for name, record in self._store(record_type).items() if name.lower() in wanted
+        }
 
     async def create_dns_record(
         self,
@@ -40,7 +89,10 @@ class _FakeCloudflareClient:
         content: str,
         ttl: int,
         proxied: bool,
+        record_type: str = "A",
+        comment: str | None = None,
     ) -> DNSRecord:
+        await self._simulate_latency()
         if self.raise_on_create:
             msg = "create failed"
             raise RuntimeError(msg)
@@ -50,59 +102,113 @@ class _FakeCloudflareClient:
             "ttl": str(ttl),
             "proxied": str(proxied),
         }
+        if record_type != "A":
+            payload["type"] = record_type
+        if comment is not None:
+            payload["comment"] = comment
         self.created_calls.append(payload)
-        record = DNSRecord(id=f"{record_name}-id", name=record_name, content=content)
-        self.records[record_name] = record
+        record = DNSRecord(
+            id=f"{record_name}-id",
+            name=record_name,
+            content=content,
+            ttl=ttl,
+            proxied=proxied,
+            comment=comment,
+        )
+        self._store(record_type)[record_name] = record
         return record
 
-    async def update_dns_record(
-        self,
-        *,
-        record_id: str,
-        record_name: str,
-        content: str,
-        ttl: int,
-        proxied: bool,
-    ) -> DNSRecord:
+    async def edit_dns_record(self, change: RecordChange) -> DNSRecord:
+        await self._simulate_latency()
         if self.raise_on_update:
             msg = "update failed"
             raise RuntimeError(msg)
-        payload = {
-            "id": record_id,
-            "name": record_name,
-            "content": content,
-            "ttl": str(ttl),
-            "proxied": str(proxied),
-        }
+        payload = {"id": change.record_id or "", "name": change.name}
+        payload.update({field: str(getattr(change, field)) for field in change.fields})
+        if change.type != "A":
+            payload["type"] = change.type
         self.updated_calls.append(payload)
-        record = DNSRecord(id=record_id, name=record_name, content=content)
-        self.records[record_name] = record
+        store = self._store(change.type)
+        current = store.get(change.name) or DNSRecord(id=change.record_id or "", name=change.name)
+        record = current._replace(**{field: getattr(change, field) for field in change.fields})
+        store[change.name] = record
         return record
 
+    async def batch_dns_records(self, changes: list[RecordChange]) -> list[DNSRecord]:
+        await self._simulate_latency()
+        if self.raise_on_batch:
+            msg = "batch failed"
+            raise RuntimeError(msg)
+        self.batch_calls.append(changes)
+        results = []
+        for change in changes:
+            store = self._store(change.type)
+            if change.record_id is None:
+                fields = {"content": change.content, "ttl": change.ttl, "proxied": change.proxied}
+                record = DNSRecord(id=f"{change.name}-id", name=change.name, comment=change.comment, **fields)
+            else:
+                current = store.get(change.name) or DNSRecord(id=change.record_id, name=change.name)
+                record = current._replace(**{field: getattr(change, field) for field in change.fields})
+            store[change.name] = record
+            results.append(record)
+        return results
+
 
 class _FakeRecordsResource:
     def __init__(self) -> None:
         self.list_result: list[Any] = []
         self.create_result: Any = None
-        self.update_result: Any = None
+        self.edit_result: Any = None
         self.last_kwargs: dict[str, Any] | None = None
+        self.latency = 0.0
+        self.list_calls = 0
 
-    def list(self, **kwargs: Any) -> SimpleNamespace:
+    async def list(self, **kwargs: Any) -> SimpleNamespace:
         self.last_kwargs = kwargs
-        return SimpleNamespace(result=self.list_result)
+        self.list_calls += 1
+        await asyncio.sleep(self.latency)
+        if "page" not in kwargs:
+            return SimpleNamespace(result=self.list_result, result_info=None)
+        start = (kwargs["page"] - 1) * kwargs["per_page"]
+        return SimpleNamespace(result=self.list_result[start : start + kwargs["per_page"]], result_info=None)
+
+    @property
+    def with_raw_response(self) -> SimpleNamespace:
+        return SimpleNamespace(list=self._raw_list)
+
+    async def _raw_list(self, **kwargs: Any) -> SimpleNamespace:
+        page = await self.list(**kwargs)
+        body = json.dumps({"success": True, "result": [vars(record) for record in page.result]}).encode()
 
-    def create(self, **kwargs: Any) -> Any:
+        async def read() -> bytes:
+            return body
+
+        return SimpleNamespace(read=read)
+
+    async def create(self, **kwargs: Any) -> Any:
         self.last_kwargs = kwargs
+        await asyncio.sleep(self.latency)
         return self.create_result
 
-    def update(self, **kwargs: Any) -> Any:
+    async def edit(self, **kwargs: Any) -> Any:
         self.last_kwargs = kwargs
-        return self.update_result
+        await asyncio.sleep(self.latency)
+        return self.edit_result
 
 
 class _FakeCloudflareSDK:
     def __init__(self, records: _FakeRecordsResource) -> None:
         self.dns = SimpleNamespace(records=records)
+        self.closed = False
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+@pytest.fixture
+def fake_cloudflare_api() -> Iterator[FakeCloudflareAPI]:
+    with FakeCloudflareAPI() as server:
+        yield server
 
 
 @pytest.fixture
@@ -114,24 +220,37 @@ def ip_detector_factory() -> Callable[[str], _FakeIPDetector]:
 
 
 @pytest.fixture
-def cloudflare_client_factory() -> Callable[[dict[str, DNSRecord] | None], _FakeCloudflareClient]:
-    def factory(records: dict[str, DNSRecord] | None = None) -> _FakeCloudflareClient:
-        return _FakeCloudflareClient(records=records)
+def cloudflare_client_factory() -> Callable[..., _FakeCloudflareClient]:
+    def factory(records: dict[str, DNSRecord] | None = None, zone_id: str = "zone") -> _FakeCloudflareClient:
+        return _FakeCloudflareClient(records=records, zone_id=zone_id)
 
     return factory
 
 
 @pytest.fixture
-def updater_factory() -> Callable[
-    [_FakeIPDetector, _FakeCloudflareClient, list[DNSRecordConfig]], DNSUpdater
-]:
+def updater_factory() -> Callable[..., DNSUpdater]:
     def factory(
         ip_detector: _FakeIPDetector,
         cloudflare_client: _FakeCloudflareClient,
         record_configs: list[DNSRecordConfig],
+        state_store: StateStore | None = None,
+        ipv6_detector: _FakeIPDetector | None = None,
+        **config_overrides: Any,
     ) -> DNSUpdater:
-        config = SimpleNamespace(update_interval=60)
-        return DNSUpdater(config, ip_detector, cloudflare_client, record_configs)
+        config = Config(
+            cloudflare_api_token="token",
+            cloudflare_zone_id="zone",
+            update_interval=60,
+            **config_overrides,
+        )
+        return DNSUpdater(
+            config,
+            ip_detector,
+            cloudflare_client,
+            record_configs,
+            state_store,
+            ipv6_detector=ipv6_detector,
+        )
 
     return factory
 
@@ -140,11 +259,11 @@ def updater_factory() -> Callable[
 def cloudflare_client_stub(monkeypatch: pytest.MonkeyPatch) -> tuple[CloudflareClient, _FakeRecordsResource]:
     records = _FakeRecordsResource()
 
-    def factory(api_token: str) -> _FakeCloudflareSDK:
+    def factory(api_token: str, **kwargs: Any) -> _FakeCloudflareSDK:
         return _FakeCloudflareSDK(records)
 
-    monkeypatch.setattr("app.src.cloudflare_client.Cloudflare", factory)
-    client = CloudflareClient(api_token="token", zone_id="zone")
+    monkeypatch.setattr("app.src.cloudflare_client.AsyncCloudflare", factory)
+    client = CloudflareClient(api_token="token", zone_id="zone", page_size=2)
     return client, records
 
 
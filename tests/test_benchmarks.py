@@ -0,0 +1,18 @@
+import pytest
+
+from benchmarks import bench_concurrency, bench_memory
+
+
+@pytest.mark.asyncio
+async def test_concurrency_benchmark_runs_a_cycle() -> None:
+    # The benchmark's client fake must keep up with what DNSUpdater needs from a client.
+    elapsed = await bench_concurrency._run_cycle(records=3, concurrency=2, latency=0)
+
+    assert elapsed >= 0
+
+
+def test_memory_benchmark_indexes_a_zone() -> None:
+    peak, _, cpu = bench_memory._measure(bench_memory._lean, records=25, page_size=10)
+
+    assert peak > 0
+    assert cpu >= 0
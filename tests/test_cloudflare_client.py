@@ -1,8 +1,13 @@
+import asyncio
+import time
 from types import SimpleNamespace
 
+import cloudflare
 import pytest
+from cloudflare import NOT_GIVEN
 
-from app.src.models import DNSRecord
+from app.src.cloudflare_client import CloudflareClient
+from app.src.models import DNSRecord, RecordChange
 
 
 @pytest.mark.asyncio
@@ -38,19 +43,109 @@ async def test_create_dns_record_raises_when_response_empty(cloudflare_client_st
 
 
 @pytest.mark.asyncio
-async def test_update_dns_record_returns_converted(cloudflare_client_stub) -> None:
+async def test_edit_dns_record_sends_only_changed_fields(cloudflare_client_stub) -> None:
     client, records = cloudflare_client_stub
-    raw = SimpleNamespace(id="rec-1", name="home.example.com", type="A", content="5.6.7.8")
-    records.update_result = raw
-
-    result = await client.update_dns_record(
-        record_id="rec-1",
-        record_name="home.example.com",
-        content="5.6.7.8",
-        ttl=300,
+    raw = SimpleNamespace(id="rec-1", name="home.example.com", type="A", content="1.2.3.4", ttl=60, proxied=False)
+    records.edit_result = raw
+    change = RecordChange(
+        name="home.example.com",
+        content="1.2.3.4",
+        ttl=60,
         proxied=False,
+        record_id="rec-1",
+        fields=["ttl"],
     )
 
-    assert result.id == "rec-1"
-    assert result.content == "5.6.7.8"
+    result = await client.edit_dns_record(change)
+
+    assert result == DNSRecord(id="rec-1", name="home.example.com", content="1.2.3.4", ttl=60, proxied=False)
+    sent = {key: value for key, value in (records.last_kwargs or {}).items() if value is not NOT_GIVEN}
+    assert sent == {"dns_record_id": "rec-1", "zone_id": "zone", "name": "home.example.com", "type": "A", "ttl": 60}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_overlap(cloudflare_client_stub) -> None:
+    client, records = cloudflare_client_stub
+    records.latency = 0.1
+    records.list_result = [SimpleNamespace(id="rec-1", name="home.example.com", type="A", content="1.2.3.4")]
+    names = [f"host{i}.example.com" for i in range(5)]
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client.get_dns_record(name) for name in names))
+    elapsed = time.perf_counter() - started
+
+    assert all(result is not None for result in results)
+    assert elapsed < records.latency * len(names) / 2
+
+
+@pytest.mark.asyncio
+async def test_list_dns_records_pages_through_zone(cloudflare_client_stub) -> None:
+    client, records = cloudflare_client_stub
+    records.list_result = [
+        SimpleNamespace(id=f"rec-{i}", name=f"Host{i}.example.com", type="A", content="1.2.3.4") for i in range(5)
+    ]
+
+    index = await client.list_dns_records(["host1.example.com", "HOST4.example.com", "missing.example.com"])
+
+    assert set(index) == {"host1.example.com", "host4.example.com"}
+    assert index["host4.example.com"].id == "rec-4"
+    assert records.list_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_list_dns_records_reads_records_from_json(fake_cloudflare_api) -> None:
+    fake_cloudflare_api.add_record("home.example.com", "1.2.3.4", ttl=60, proxied=True, comment="home")
+    fake_cloudflare_api.add_record("other.example.com", "5.6.7.8")
+    client = CloudflareClient(api_token="token", zone_id="zone", base_url=fake_cloudflare_api.url)
+
+    index = await client.list_dns_records(["home.example.com"])
 
+    assert index == {
+        "home.example.com": DNSRecord(
+            id="rec-1",
+            name="home.example.com",
+            content="1.2.3.4",
+            ttl=60,
+            proxied=True,
+            comment="home",
+        ),
+    }
+
+
+@pytest.mark.asyncio
+async def test_batch_dns_records_maps_results_to_changes(fake_cloudflare_api) -> None:
+    existing = fake_cloudflare_api.add_record("home.example.com", "9.9.9.9")
+    client = CloudflareClient(api_token="token", zone_id="zone", base_url=fake_cloudflare_api.url)
+    changes = [
+        RecordChange(name="new.example.com", content="1.2.3.4", ttl=300, proxied=False),
+        RecordChange(
+            name="home.example.com",
+            content="1.2.3.4",
+            ttl=120,
+            proxied=True,
+            record_id=existing["id"],
+            fields=["content"],
+        ),
+    ]
+
+    results = await client.batch_dns_records(changes)
+    await client.close()
+
+    assert [r.name for r in results] == ["new.example.com", "home.example.com"]
+    assert results[1].id == existing["id"]
+    assert all(r.content == "1.2.3.4" for r in results)
+    assert fake_cloudflare_api.requests == [("POST", "/client/v4/zones/zone/dns_records/batch")]
+    assert fake_cloudflare_api.bodies[0]["patches"] == [
+        {"id": existing["id"], "name": "home.example.com", "type": "A", "content": "1.2.3.4"},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_dns_records_raises_when_batch_rejected(fake_cloudflare_api) -> None:
+    fake_cloudflare_api.fail_batch = True
+    client = CloudflareClient(api_token="token", zone_id="zone", base_url=fake_cloudflare_api.url)
+    changes = [RecordChange(name="new.example.com", content="1.2.3.4", ttl=300, proxied=False)]
+
+    with pytest.raises(cloudflare.APIStatusError):
+        await client.batch_dns_records(changes)
+    await client.close()
@@ -2,6 +2,7 @@ import json
 from pathlib import Path
 
 import pytest
+from pydantic import ValidationError
 
 from app.config import Config
 
@@ -58,3 +59,61 @@ def test_load_dns_records_invalid_json(tmp_path: Path) -> None:
     with pytest.raises(json.JSONDecodeError):
         config.load_dns_records()
 
+
+
+def test_load_zones_groups_records_with_credentials(tmp_path: Path) -> None:
+    config = make_config(
+        tmp_path,
+        records={
+            "records": [{"name": "home.example.com"}],
+            "zones": [
+                {"zone_id": "zone-b", "api_token": "token-b", "records": [{"name": "b.example.org"}]},
+                {"zone_name": "example.net", "records": [{"name": "c.example.net"}]},
+            ],
+        },
+    )
+
+    zones = config.load_zones()
+
+    assert [(z.zone_id, z.zone_name, z.api_token) for z in zones] == [
+        ("zone", None, "token"),
+        ("zone-b", None, "token-b"),
+        (None, "example.net", "token"),
+    ]
+    assert [r.name for r in config.load_dns_records()] == ["home.example.com", "b.example.org", "c.example.net"]
+
+
+def test_load_zones_requires_zone_id_for_top_level_records(tmp_path: Path) -> None:
+    config_path = tmp_path / "records.json"
+    config_path.write_text(json.dumps({"records": [{"name": "home.example.com"}]}))
+    config = Config(cloudflare_api_token="token", records_config_path=str(config_path))
+
+    with pytest.raises(ValueError, match="CLOUDFLARE_ZONE_ID"):
+        config.load_zones()
+
+
+def test_load_zones_requires_a_token(tmp_path: Path) -> None:
+    config_path = tmp_path / "records.json"
+    config_path.write_text(json.dumps({"zones": [{"zone_id": "zone", "records": [{"name": "a.example.com"}]}]}))
+    config = Config(records_config_path=str(config_path))
+
+    with pytest.raises(ValueError, match="api_token"):
+        config.load_zones()
+
+
+def test_zone_needs_id_or_name(tmp_path: Path) -> None:
+    with pytest.raises(ValidationError):
+        make_config(tmp_path, records={"zones": [{"records": [{"name": "a.example.com"}]}]}).load_zones()
+
+
+def test_record_types_expand_both(tmp_path: Path) -> None:
+    config = make_config(tmp_path, records={"records": [{"name": "home.example.com", "type": "both"}]})
+
+    assert config.load_dns_records()[0].record_types == ["A", "AAAA"]
+
+
+def test_ipv6_suffix_must_be_an_address(tmp_path: Path) -> None:
+    config = make_config(tmp_path, records={"records": [{"name": "a.example.com", "ipv6_suffix": "nope"}]})
+
+    with pytest.raises(ValidationError):
+        config.load_dns_records()
@@ -0,0 +1,154 @@
+import asyncio
+import struct
+from collections.abc import AsyncIterator
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+import pytest_asyncio
+
+from app.src.dns_ip_detector import (
+    DNSIPDetector,
+    DNSProvider,
+    QueryClass,
+    QueryType,
+    _ResponseProtocol,
+    build_query,
+    parse_response,
+)
+
+
+class StubDNSServer(asyncio.DatagramProtocol):
+    """Answers every query with ``answer`` (TXT text or A address); ``None`` drops the query."""
+
+    def __init__(self, answer: str | None, rcode: int = 0, stray: bool = False) -> None:
+        self.answer = answer
+        self.rcode = rcode
+        self.stray = stray
+        self.queries: list[bytes] = []
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport: Any) -> None:
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr: tuple[str, int]) -> None:
+        self.queries.append(data)
+        if self.transport is not None and self.stray:
+            # A failed reply to some other query, sent ahead of the answer.
+            stray_id = int.from_bytes(data[:2]) ^ 0xFFFF
+            self.transport.sendto(struct.pack("!HHHHHH", stray_id, 0x8185, 0, 0, 0, 0), addr)
+        if self.answer is None or self.transport is None:
+            return
+        question = data[12:]
+        qtype, qclass = struct.unpack_from("!HH", question, len(question) - 4)
+        if qtype == QueryType.TXT:
+            text = self.answer.encode()
+            rdata = bytes([len(text)]) + text
+        else:
+            rdata = bytes(int(part) for part in self.answer.split("."))
+        # Answer name is a compression pointer back to the question name at offset 12.
+        answer = b"\xc0\x0c" + struct.pack("!HHIH", qtype, qclass, 0, len(rdata)) + rdata
+        header = struct.pack("!HHHHHH", int.from_bytes(data[:2]), 0x8180 | self.rcode, 1, 1, 0, 0)
+        self.transport.sendto(header + question + answer, addr)
+
+
+@pytest_asyncio.fixture
+async def dns_server_factory() -> AsyncIterator[Any]:
+    transports: list[asyncio.DatagramTransport] = []
+
+    async def factory(answer: str | None, rcode: int = 0, stray: bool = False) -> tuple[StubDNSServer, int]:
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: StubDNSServer(answer, rcode, stray),
+            local_addr=("127.0.0.1", 0),
+        )
+        transports.append(transport)
+        return protocol, transport.get_extra_info("sockname")[1]
+
+    yield factory
+    for transport in transports:
+        transport.close()
+
+
+@pytest.mark.asyncio
+async def test_dns_detector_reads_txt_chaos_answer(dns_server_factory) -> None:
+    server, port = await dns_server_factory("203.0.113.7")
+    provider = DNSProvider(
+        resolver="127.0.0.1",
+        port=port,
+        qname="whoami.cloudflare",
+        qtype=QueryType.TXT,
+        qclass=QueryClass.CH,
+    )
+    detector = DNSIPDetector(providers=(provider,))
+
+    ip = await detector.get_current_ip()
+
+    assert ip == "203.0.113.7"
+    assert len(server.queries) == 1
+    assert struct.unpack_from("!HH", server.queries[0], len(server.queries[0]) - 4) == (16, 3)
+
+
+@pytest.mark.asyncio
+async def test_dns_detector_reads_a_answer(dns_server_factory) -> None:
+    _, port = await dns_server_factory("198.51.100.4")
+    provider = DNSProvider(resolver="127.0.0.1", port=port, qname="myip.opendns.com", qtype=QueryType.A)
+    detector = DNSIPDetector(providers=(provider,))
+
+    assert await detector.get_current_ip() == "198.51.100.4"
+
+
+@pytest.mark.asyncio
+async def test_dns_detector_falls_back_after_timeout_and_error(dns_server_factory) -> None:
+    _, silent_port = await dns_server_factory(None)
+    _, refusing_port = await dns_server_factory("1.1.1.1", rcode=5)
+    _, ok_port = await dns_server_factory("192.0.2.1")
+    providers = tuple(
+        DNSProvider(resolver="127.0.0.1", port=port, qname="myip.opendns.com", qtype=QueryType.A)
+        for port in (silent_port, refusing_port, ok_port)
+    )
+    detector = DNSIPDetector(providers=providers, timeout=0.1)
+
+    assert await detector.get_current_ip() == "192.0.2.1"
+
+
+@pytest.mark.asyncio
+async def test_dns_detector_raises_when_all_providers_fail(dns_server_factory) -> None:
+    _, port = await dns_server_factory(None)
+    provider = DNSProvider(resolver="127.0.0.1", port=port, qname="myip.opendns.com", qtype=QueryType.A)
+    detector = DNSIPDetector(providers=(provider,), timeout=0.05)
+
+    with pytest.raises(RuntimeError):
+        await detector.get_current_ip()
+
+
+@pytest.mark.asyncio
+async def test_dns_detector_ignores_replies_to_other_queries(dns_server_factory) -> None:
+    _, port = await dns_server_factory("198.51.100.4", stray=True)
+    provider = DNSProvider(resolver="127.0.0.1", port=port, qname="myip.opendns.com", qtype=QueryType.A)
+    detector = DNSIPDetector(providers=(provider,), timeout=1)
+
+    assert await detector.get_current_ip() == "198.51.100.4"
+
+
+@pytest.mark.asyncio
+async def test_response_protocol_ignores_other_senders() -> None:
+    protocol = _ResponseProtocol(asyncio.get_running_loop(), 7)
+    transport = SimpleNamespace(get_extra_info=lambda name: ("192.0.2.53", 53))
+    protocol.connection_made(transport)  # type: ignore[arg-type]
+    reply = struct.pack("!HHHHHH", 7, 0x8180, 0, 0, 0, 0)
+
+    protocol.datagram_received(reply, ("203.0.113.9", 53))
+    protocol.datagram_received(struct.pack("!HHHHHH", 8, 0x8180, 0, 0, 0, 0), ("192.0.2.53", 53))
+    assert not protocol.response.done()
+
+    protocol.datagram_received(reply, ("192.0.2.53", 53))
+    assert protocol.response.result() == reply
+
+
+def test_parse_response_rejects_mismatched_id() -> None:
+    query = build_query(1, "myip.opendns.com", QueryType.A, QueryClass.IN)
+    response = struct.pack("!HHHHHH", 2, 0x8180, 1, 0, 0, 0) + query[12:]
+
+    with pytest.raises(ValueError, match="does not match"):
+        parse_response(response, 1, QueryType.A)
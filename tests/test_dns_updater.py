@@ -1,7 +1,13 @@
+import time
+from pathlib import Path
+
 import pytest
 
-from app.config import DNSRecordConfig
+from app.config import Config, DNSRecordConfig
+from app.src.cloudflare_client import CloudflareClient
+from app.src.dns_updater import DNSUpdater
 from app.src.models import DNSRecord
+from app.src.state import StateStore
 
 
 @pytest.mark.asyncio
@@ -143,3 +149,348 @@ async def test_update_retries_after_failure(
 
     assert changed is True
     assert cf_client.created_calls[-1]["content"] == "1.2.3.4"
+
+
+@pytest.mark.asyncio
+async def test_update_uses_single_bulk_lookup(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    existing = DNSRecord(id="rec-1", name="home.example.com", content="9.9.9.9")
+    configs = [DNSRecordConfig(name=f"host{i}.example.com") for i in range(10)]
+    configs.append(DNSRecordConfig(name="Home.example.com"))
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory(records={"home.example.com": existing})
+    updater = updater_factory(ip_detector, cf_client, configs)
+
+    await updater.update()
+
+    assert cf_client.list_calls == 1
+    assert cf_client.get_calls == 0
+    assert len(cf_client.created_calls) == 10
+    assert cf_client.updated_calls[-1]["id"] == "rec-1"
+
+
+@pytest.mark.asyncio
+async def test_update_looks_up_each_record_when_bulk_fetch_disabled(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    configs = [DNSRecordConfig(name=f"host{i}.example.com") for i in range(3)]
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory()
+    updater = updater_factory(ip_detector, cf_client, configs, bulk_fetch=False)
+
+    await updater.update()
+
+    assert cf_client.list_calls == 0
+    assert cf_client.get_calls == 3
+
+
+@pytest.mark.asyncio
+async def test_update_reconciles_records_concurrently_within_limit(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    configs = [DNSRecordConfig(name=f"host{i}.example.com") for i in range(20)]
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory()
+    cf_client.latency = 0.05
+    updater = updater_factory(ip_detector, cf_client, configs, max_concurrency=5)
+
+    started = time.perf_counter()
+    changed = await updater.update()
+    elapsed = time.perf_counter() - started
+
+    assert changed is True
+    assert len(cf_client.created_calls) == 20
+    assert cf_client.max_in_flight == 5
+    assert elapsed < cf_client.latency * len(configs) / 2
+
+
+@pytest.mark.asyncio
+async def test_update_isolates_failures_between_concurrent_records(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    existing = DNSRecord(id="rec-1", name="home.example.com", content="9.9.9.9")
+    configs = [
+        DNSRecordConfig(name="home.example.com"),
+        DNSRecordConfig(name="vpn.example.com"),
+    ]
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory(records={"home.example.com": existing})
+    cf_client.raise_on_create = True
+    updater = updater_factory(ip_detector, cf_client, configs)
+
+    first_changed = await updater.update()
+    cf_client.raise_on_create = False
+    second_changed = await updater.update()
+
+    assert first_changed is True
+    assert second_changed is True
+    assert len(cf_client.updated_calls) == 1
+    assert cf_client.created_calls[-1]["name"] == "vpn.example.com"
+
+
+@pytest.mark.asyncio
+async def test_update_submits_changes_in_batches(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    existing = DNSRecord(id="rec-1", name="host0.example.com", content="9.9.9.9")
+    up_to_date = DNSRecord(id="rec-2", name="host1.example.com", content="1.2.3.4")
+    configs = [DNSRecordConfig(name=f"host{i}.example.com") for i in range(6)]
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory(records={"host0.example.com": existing, "host1.example.com": up_to_date})
+    updater = updater_factory(ip_detector, cf_client, configs, batch_updates=True, batch_size=2)
+
+    changed = await updater.update()
+
+    assert changed is True
+    assert [len(batch) for batch in cf_client.batch_calls] == [2, 2, 1]
+    assert cf_client.batch_calls[0][0].record_id == "rec-1"
+    assert not cf_client.created_calls
+    assert not cf_client.updated_calls
+
+
+@pytest.mark.asyncio
+async def test_update_retries_after_failed_batch(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    configs = [DNSRecordConfig(name="home.example.com"), DNSRecordConfig(name="vpn.example.com")]
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory()
+    cf_client.raise_on_batch = True
+    updater = updater_factory(ip_detector, cf_client, configs, batch_updates=True)
+
+    first_changed = await updater.update()
+    cf_client.raise_on_batch = False
+    second_changed = await updater.update()
+
+    assert first_changed is False
+    assert second_changed is True
+    assert [c.name for c in cf_client.batch_calls[0]] == ["home.example.com", "vpn.example.com"]
+
+
+@pytest.mark.asyncio
+async def test_batch_update_against_local_cloudflare_api(ip_detector_factory, fake_cloudflare_api) -> None:
+    fake_cloudflare_api.add_record("home.example.com", "9.9.9.9")
+    configs = [DNSRecordConfig(name="home.example.com"), DNSRecordConfig(name="vpn.example.com", proxied=True)]
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone", batch_updates=True)
+    cf_client = CloudflareClient(api_token="token", zone_id="zone", base_url=fake_cloudflare_api.url)
+    updater = DNSUpdater(config, ip_detector_factory("1.2.3.4"), cf_client, configs)
+
+    changed = await updater.update()
+    await cf_client.close()
+
+    assert changed is True
+    assert [method for method, _ in fake_cloudflare_api.requests] == ["GET", "POST"]
+    assert fake_cloudflare_api.find("home.example.com")["content"] == "1.2.3.4"
+    assert fake_cloudflare_api.find("vpn.example.com")["proxied"] is True
+
+
+@pytest.mark.asyncio
+async def test_restart_with_persisted_state_skips_cloudflare(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+    tmp_path: Path,
+) -> None:
+    configs = [DNSRecordConfig(name="home.example.com"), DNSRecordConfig(name="vpn.example.com")]
+    state_path = tmp_path / "state.json"
+    cf_client = cloudflare_client_factory()
+    await updater_factory(ip_detector_factory("1.2.3.4"), cf_client, configs, StateStore(state_path)).update()
+
+    restarted_client = cloudflare_client_factory()
+    restarted = updater_factory(ip_detector_factory("1.2.3.4"), restarted_client, configs, StateStore(state_path))
+    changed = await restarted.update()
+
+    assert changed is False
+    assert restarted_client.list_calls == 0
+    assert restarted_client.get_calls == 0
+
+
+@pytest.mark.asyncio
+async def test_ip_change_updates_cached_records_without_lookup(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    configs = [DNSRecordConfig(name="home.example.com"), DNSRecordConfig(name="vpn.example.com")]
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory()
+    updater = updater_factory(ip_detector, cf_client, configs, bulk_fetch=False)
+    await updater.update()
+
+    ip_detector.set_ip("5.6.7.8")
+    changed = await updater.update()
+
+    assert changed is True
+    assert cf_client.get_calls == 2
+    assert [call["id"] for call in cf_client.updated_calls] == ["home.example.com-id", "vpn.example.com-id"]
+
+
+@pytest.mark.asyncio
+async def test_retry_after_partial_failure_only_touches_failed_record(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    existing = DNSRecord(id="rec-1", name="home.example.com", content="1.2.3.4")
+    configs = [DNSRecordConfig(name="home.example.com"), DNSRecordConfig(name="vpn.example.com")]
+    cf_client = cloudflare_client_factory(records={"home.example.com": existing})
+    cf_client.raise_on_create = True
+    updater = updater_factory(ip_detector_factory("1.2.3.4"), cf_client, configs, bulk_fetch=False)
+    await updater.update()
+
+    cf_client.raise_on_create = False
+    await updater.update()
+
+    assert cf_client.get_calls == 3
+    assert cf_client.created_calls[-1]["name"] == "vpn.example.com"
+
+
+@pytest.mark.asyncio
+async def test_state_max_age_forces_full_reverify(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    configs = [DNSRecordConfig(name="home.example.com")]
+    cf_client = cloudflare_client_factory()
+    updater = updater_factory(ip_detector_factory("1.2.3.4"), cf_client, configs, state_max_age=0)
+
+    await updater.update()
+    time.sleep(0.01)
+    await updater.update()
+
+    assert cf_client.list_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_update_manages_a_and_aaaa_records_for_both(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    existing = DNSRecord(id="rec-6", name="home.example.com", content="2001:db8::1")
+    cf_client = cloudflare_client_factory()
+    cf_client.aaaa_records["home.example.com"] = existing
+    updater = updater_factory(
+        ip_detector_factory("1.2.3.4"),
+        cf_client,
+        [DNSRecordConfig(name="home.example.com", type="both")],
+        ipv6_detector=ip_detector_factory("2001:db8::2"),
+    )
+
+    changed = await updater.update()
+
+    assert changed is True
+    assert cf_client.created_calls[-1]["content"] == "1.2.3.4"
+    assert cf_client.updated_calls[-1] == {
+        "id": "rec-6",
+        "name": "home.example.com",
+        "content": "2001:db8::2",
+        "type": "AAAA",
+    }
+    assert cf_client.list_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_update_keeps_families_independent(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    cf_client = cloudflare_client_factory()
+    ipv6_detector = ip_detector_factory("2001:db8::1")
+    updater = updater_factory(
+        ip_detector_factory("1.2.3.4"),
+        cf_client,
+        [DNSRecordConfig(name="home.example.com", type="both")],
+        ipv6_detector=ipv6_detector,
+    )
+    await updater.update()
+    cf_client.created_calls.clear()
+
+    ipv6_detector.set_ip("2001:db8::9")
+    cf_client.raise_on_update = True
+    assert await updater.update() is False
+
+    cf_client.raise_on_update = False
+    assert await updater.update() is True
+    assert [call["content"] for call in cf_client.updated_calls] == ["2001:db8::9"]
+    assert not cf_client.created_calls
+
+
+@pytest.mark.asyncio
+async def test_update_combines_ipv6_prefix_with_suffix(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    cf_client = cloudflare_client_factory()
+    updater = updater_factory(
+        ip_detector_factory(),
+        cf_client,
+        [DNSRecordConfig(name="nas.example.com", type="AAAA", ipv6_suffix="::a:b:c:d")],
+        ipv6_detector=ip_detector_factory("2001:db8:1:2:1111:2222:3333:4444"),
+        ipv6_prefix_length=56,
+    )
+
+    await updater.update()
+
+    assert cf_client.created_calls[-1]["content"] == "2001:db8:1:0:a:b:c:d"
+
+
+def test_aaaa_records_require_ipv6_detector(ip_detector_factory, cloudflare_client_factory, updater_factory) -> None:
+    with pytest.raises(ValueError, match="IPv6 detector"):
+        updater_factory(ip_detector_factory(), cloudflare_client_factory(), [DNSRecordConfig(name="a", type="AAAA")])
+
+
+@pytest.mark.asyncio
+async def test_drift_sweep_patches_only_changed_attributes(ip_detector_factory, fake_cloudflare_api) -> None:
+    record = fake_cloudflare_api.add_record("home.example.com", "1.2.3.4", ttl=300)
+    fake_cloudflare_api.add_record("cdn.example.com", "1.2.3.4", ttl=1, proxied=True)
+    configs = [
+        DNSRecordConfig(name="home.example.com", ttl=300, comment="managed"),
+        DNSRecordConfig(name="cdn.example.com", ttl=300, proxied=True),
+    ]
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone", drift_check_interval=1)
+    cf_client = CloudflareClient(api_token="token", zone_id="zone", base_url=fake_cloudflare_api.url)
+    updater = DNSUpdater(config, ip_detector_factory("1.2.3.4"), cf_client, configs)
+
+    await updater.update()
+    record["ttl"] = 3600
+    record["proxied"] = True
+    await updater.update()
+    updater._verified_at -= 2
+    fake_cloudflare_api.bodies.clear()
+    await updater.update()
+    await cf_client.close()
+
+    patches = [body for body in fake_cloudflare_api.bodies if body]
+    assert patches == [{"name": "home.example.com", "type": "A", "proxied": False, "ttl": 300}]
+    assert fake_cloudflare_api.find("home.example.com")["comment"] == "managed"
+
+
+@pytest.mark.asyncio
+async def test_unchanged_record_is_not_patched_for_unreported_attributes(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    existing = DNSRecord(id="rec-1", name="home.example.com", content="1.2.3.4", ttl=None, proxied=None)
+    cf_client = cloudflare_client_factory(records={"home.example.com": existing})
+    updater = updater_factory(ip_detector_factory("1.2.3.4"), cf_client, [DNSRecordConfig(name="home.example.com")])
+
+    assert await updater.update() is False
+    assert not cf_client.updated_calls
@@ -0,0 +1,153 @@
+import base64
+from http import HTTPStatus
+
+import pydantic
+import pytest
+
+from app.config import Config, DNSRecordConfig
+from app.src.dyndns import DynDNSReceiver, PushedIPDetector, PushedIPs
+from app.src.http_server import Request
+from app.src.multi_zone import MultiZoneUpdater
+
+_AUTH = {"authorization": "Basic " + base64.b64encode(b"router:secret").decode()}
+
+
+@pytest.fixture
+def receiver(ip_detector_factory, cloudflare_client_factory, updater_factory):
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory()
+    updater = MultiZoneUpdater(
+        {"A": ip_detector},
+        [updater_factory(ip_detector, cf_client, [DNSRecordConfig(name="home.example.com")])],
+    )
+    pushed = PushedIPs()
+    return DynDNSReceiver(updater, pushed, "router", "secret"), updater, pushed, ip_detector, cf_client
+
+
+def _request(query: str, headers: dict[str, str] = _AUTH, client: str | None = "127.0.0.1") -> Request:
+    return Request("GET", f"/nic/update?{query}", headers, client=client)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "headers",
+    [{}, {"authorization": "Basic " + base64.b64encode(b"router:wrong").decode()}, {"authorization": "Basic !!"}],
+)
+async def test_rejects_bad_credentials(receiver, headers) -> None:
+    endpoint, _, pushed, _, _ = receiver
+
+    response = await endpoint.update(_request("hostname=home.example.com&myip=5.6.7.8", headers))
+
+    assert response.status == HTTPStatus.UNAUTHORIZED
+    assert response.body == b"badauth\n"
+    assert "WWW-Authenticate" in response.headers
+    assert pushed.event.is_set() is False
+
+
+@pytest.mark.asyncio
+async def test_push_queues_address(receiver) -> None:
+    endpoint, _, pushed, _, _ = receiver
+
+    response = await endpoint.update(_request("hostname=home.example.com,other.example.com&myip=5.6.7.8"))
+
+    assert response.status == HTTPStatus.OK
+    assert response.body == b"good 5.6.7.8\nnohost\n"
+    assert pushed.event.is_set()
+    assert pushed.take() == {"A": "5.6.7.8"}
+    assert pushed.event.is_set() is False
+
+
+@pytest.mark.asyncio
+async def test_bursts_are_merged(receiver) -> None:
+    endpoint, _, pushed, _, _ = receiver
+
+    await endpoint.update(_request("hostname=home.example.com&myip=5.6.7.8"))
+    await endpoint.update(_request("hostname=home.example.com&myip=5.6.7.9"))
+
+    assert pushed.take() == {"A": "5.6.7.9"}
+
+
+@pytest.mark.asyncio
+async def test_unchanged_address_reports_nochg(receiver) -> None:
+    endpoint, updater, _, _, _ = receiver
+    await updater.update()
+
+    response = await endpoint.update(_request("hostname=home.example.com&myip=1.2.3.4"))
+
+    assert response.body == b"nochg 1.2.3.4\n"
+
+
+@pytest.mark.asyncio
+async def test_unknown_hostname_is_not_pushed(receiver) -> None:
+    endpoint, _, pushed, _, _ = receiver
+
+    response = await endpoint.update(_request("hostname=other.example.com&myip=5.6.7.8"))
+
+    assert response.body == b"nohost\n"
+    assert pushed.event.is_set() is False
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    ("query", "client", "status", "body"),
+    [
+        ("hostname=home.example.com&myip=not-an-ip", "127.0.0.1", HTTPStatus.BAD_REQUEST, b"911\n"),
+        ("hostname=home.example.com", "192.168.1.1", HTTPStatus.BAD_REQUEST, b"911\n"),
+        ("myip=5.6.7.8", "127.0.0.1", HTTPStatus.OK, b"notfqdn\n"),
+    ],
+)
+async def test_invalid_requests(receiver, query, client, status, body) -> None:
+    endpoint, _, pushed, _, _ = receiver
+
+    response = await endpoint.update(_request(query, client=client))
+
+    assert response.status == status
+    assert response.body == body
+    assert pushed.event.is_set() is False
+
+
+@pytest.mark.asyncio
+async def test_missing_myip_uses_public_client_address(receiver) -> None:
+    endpoint, _, pushed, _, _ = receiver
+
+    response = await endpoint.update(_request("hostname=home.example.com", client="8.8.4.4"))
+
+    assert response.body == b"good 8.8.4.4\n"
+    assert pushed.take() == {"A": "8.8.4.4"}
+
+
+@pytest.mark.asyncio
+async def test_update_pushed_skips_detection(receiver) -> None:
+    _, updater, _, ip_detector, cf_client = receiver
+
+    assert await updater.update_pushed({"A": "5.6.7.8"}) is True
+
+    assert ip_detector.calls == 0
+    assert cf_client.created_calls[-1]["content"] == "5.6.7.8"
+    assert updater.current_ips == {"A": "5.6.7.8"}
+
+
+@pytest.mark.asyncio
+async def test_pushed_detector_waits_for_first_push() -> None:
+    pushed = PushedIPs()
+    detector = PushedIPDetector(pushed, "A")
+
+    with pytest.raises(RuntimeError, match="No A address"):
+        await detector.get_current_ip()
+    pushed.push({"A": "5.6.7.8"})
+
+    assert await detector.get_current_ip() == "5.6.7.8"
+    assert pushed.received
+
+
+@pytest.mark.parametrize(
+    "settings",
+    [
+        {"ip_detector": "push", "http_port": 8080},
+        {"ip_detector": "push", "dyndns_username": "router", "dyndns_password": "secret"},
+        {"dyndns_username": "router"},
+    ],
+)
+def test_config_requires_complete_dyndns_settings(settings) -> None:
+    with pytest.raises(pydantic.ValidationError):
+        Config(cloudflare_api_token="token", cloudflare_zone_id="zone", **settings)
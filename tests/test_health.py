@@ -0,0 +1,118 @@
+import json
+import time
+from http import HTTPStatus
+
+import httpx
+import pytest
+
+from app.config import DNSRecordConfig
+from app.src.health import HealthEndpoints
+from app.src.http_server import HTTPServer, Request
+from app.src.lease import FileLease
+from app.src.models import DNSRecord
+from app.src.multi_zone import MultiZoneUpdater
+
+_REQUEST = Request("GET", "/", {})
+
+
+@pytest.fixture
+def multi_zone(ip_detector_factory, cloudflare_client_factory, updater_factory):
+    def factory(**client_flags: bool):
+        cf_client = cloudflare_client_factory(
+            records={"home.example.com": DNSRecord(id="rec-1", name="home.example.com", content="9.9.9.9")},
+        )
+        for flag, value in client_flags.items():
+            setattr(cf_client, flag, value)
+        ip_detector = ip_detector_factory("1.2.3.4")
+        records = [DNSRecordConfig(name="home.example.com"), DNSRecordConfig(name="new.example.com")]
+        updater = updater_factory(ip_detector, cf_client, records)
+        return MultiZoneUpdater({"A": ip_detector}, [updater])
+
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_not_ready_before_first_cycle(multi_zone) -> None:
+    endpoints = HealthEndpoints(multi_zone(), ready_window=60)
+
+    assert (await endpoints.healthz(_REQUEST)).status == HTTPStatus.OK
+    assert (await endpoints.readyz(_REQUEST)).status == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+@pytest.mark.asyncio
+async def test_follower_is_ready_while_standing_by(multi_zone, tmp_path) -> None:
+    leader = FileLease(tmp_path / "lease", 60, holder="leader")
+    follower = FileLease(tmp_path / "lease", 60, holder="follower")
+    await leader.attempt()
+    await follower.attempt()
+    endpoints = HealthEndpoints(multi_zone(), ready_window=60, lease=follower)
+
+    response = await endpoints.readyz(_REQUEST)
+
+    assert response.status == HTTPStatus.OK
+    assert response.body == b"standing by\n"
+
+
+@pytest.mark.asyncio
+async def test_ready_and_synced_after_successful_cycle(multi_zone) -> None:
+    updater = multi_zone()
+    endpoints = HealthEndpoints(updater, ready_window=60)
+
+    await updater.update()
+    status = json.loads((await endpoints.status(_REQUEST)).body)
+
+    assert (await endpoints.readyz(_REQUEST)).status == HTTPStatus.OK
+    assert status["ips"] == {"A": "1.2.3.4"}
+    assert status["last_error"] is None
+    assert [(r["name"], r["state"], r["content"]) for r in status["zones"][0]["records"]] == [
+        ("home.example.com", "synced", "1.2.3.4"),
+        ("new.example.com", "synced", "1.2.3.4"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_record_reported_and_not_ready(multi_zone) -> None:
+    updater = multi_zone(raise_on_create=True)
+    endpoints = HealthEndpoints(updater, ready_window=60)
+
+    await updater.update()
+    status = updater.status()
+
+    assert (await endpoints.readyz(_REQUEST)).status == HTTPStatus.SERVICE_UNAVAILABLE
+    assert status.last_error is not None
+    assert "zone" in status.last_error.message
+    records = {r.name: r for r in status.zones[0].records}
+    assert records["home.example.com"].state == "synced"
+    assert records["new.example.com"].state == "failed"
+    assert records["new.example.com"].error == "create failed"
+
+
+@pytest.mark.asyncio
+async def test_ready_window_expires(multi_zone, monkeypatch) -> None:
+    updater = multi_zone()
+    endpoints = HealthEndpoints(updater, ready_window=60)
+    await updater.update()
+
+    later = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert (await endpoints.readyz(_REQUEST)).status == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+@pytest.mark.asyncio
+async def test_endpoints_served_over_http(multi_zone) -> None:
+    updater = multi_zone()
+    await updater.update()
+    server = HTTPServer("127.0.0.1", 0)
+    HealthEndpoints(updater, ready_window=60).register(server)
+    await server.start()
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as client:
+            ready = await client.get("/readyz")
+            status = await client.get("/status")
+    finally:
+        await server.close()
+
+    assert ready.status_code == HTTPStatus.OK
+    assert status.headers["content-type"] == "application/json"
+    assert status.json()["zones"][0]["zone_id"] == "zone"
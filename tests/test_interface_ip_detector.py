@@ -0,0 +1,88 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from app.src.interface_ip_detector import InterfaceIPDetector, parse_address
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_NETLINK"), reason="rtnetlink is Linux-only")
+
+
+def make_address_message(
+    msg_type: int,
+    index: int,
+    address: str,
+    scope: int = 0,
+    family: int = socket.AF_INET,
+) -> bytes:
+    raw = socket.inet_pton(family, address)
+    attribute = struct.pack("=HH", 4 + len(raw), 2) + raw
+    payload = struct.pack("=BBBBI", family, 24, 0, scope, index) + attribute
+    return struct.pack("=IHHII", 16 + len(payload), msg_type, 0, 0, 0) + payload
+
+
+def test_parse_address_reads_local_attribute() -> None:
+    message = make_address_message(20, 7, "203.0.113.9")
+
+    assert parse_address(message[16:], 7) == ("203.0.113.9", 0)
+    assert parse_address(message[16:], 8) is None
+
+
+def test_parse_address_filters_by_family() -> None:
+    message = make_address_message(20, 7, "2001:db8::5", family=socket.AF_INET6)
+
+    assert parse_address(message[16:], 7) is None
+    assert parse_address(message[16:], 7, socket.AF_INET6) == ("2001:db8::5", 0)
+
+
+@pytest.mark.asyncio
+async def test_interface_detector_reads_loopback_address() -> None:
+    detector = InterfaceIPDetector("lo")
+
+    ip = await detector.get_current_ip()
+    await detector.close()
+
+    assert ip == "127.0.0.1"
+
+
+@pytest.mark.asyncio
+async def test_interface_detector_dumps_addresses_off_the_event_loop(monkeypatch: pytest.MonkeyPatch) -> None:
+    threads = []
+
+    def dump_addresses(interface: str, family: int) -> list[tuple[str, int]]:
+        threads.append(threading.current_thread())
+        return [("203.0.113.9", 0)]
+
+    monkeypatch.setattr("app.src.interface_ip_detector._dump_addresses", dump_addresses)
+    detector = InterfaceIPDetector("lo")
+
+    ip = await detector.get_current_ip()
+    await detector.close()
+
+    assert ip == "203.0.113.9"
+    assert threads != [threading.current_thread()]
+
+
+@pytest.mark.asyncio
+async def test_interface_detector_raises_for_unknown_interface() -> None:
+    detector = InterfaceIPDetector("does-not-exist0")
+
+    with pytest.raises(OSError):
+        await detector.get_current_ip()
+    await detector.close()
+
+
+@pytest.mark.asyncio
+async def test_wait_for_change_wakes_on_address_event() -> None:
+    detector = InterfaceIPDetector("lo")
+    index = socket.if_nametoindex("lo")
+
+    detector.handle_events(make_address_message(20, index + 100, "203.0.113.9"))
+    unrelated = await detector.wait_for_change(0.01)
+    detector.handle_events(make_address_message(21, index, "127.0.0.1"))
+    changed = await detector.wait_for_change(5)
+    await detector.close()
+
+    assert unrelated is False
+    assert changed is True
@@ -1,10 +1,13 @@
+import asyncio
+import time
 from collections.abc import AsyncIterator
+from pathlib import Path
 from typing import Any, Iterator
 
 import httpx
 import pytest
 
-from app.src.ip_detector import PublicIPDetector
+from app.src.ip_detector import PublicIPDetector, detect_ips
 
 
 class DummyResponse:
@@ -24,12 +27,10 @@ class DummyResponse:
 class DummyAsyncClient:
     def __init__(self, results: Iterator[Any]) -> None:
         self._results = results
+        self.closed = False
 
-    async def __aenter__(self) -> "DummyAsyncClient":
-        return self
-
-    async def __aexit__(self, exc_type, exc, tb) -> None:
-        return None
+    async def aclose(self) -> None:
+        self.closed = True
 
     async def get(self, url: str) -> DummyResponse:
         result = next(self._results)
@@ -38,13 +39,16 @@ class DummyAsyncClient:
         return result
 
 
-def patch_httpx(monkeypatch: pytest.MonkeyPatch, responses: list[Any]) -> None:
+def patch_httpx(monkeypatch: pytest.MonkeyPatch, responses: list[Any]) -> list[DummyAsyncClient]:
     iterator = iter(responses)
+    clients: list[DummyAsyncClient] = []
 
     def factory(*args: Any, **kwargs: Any) -> DummyAsyncClient:
-        return DummyAsyncClient(iterator)
+        clients.append(DummyAsyncClient(iterator))
+        return clients[-1]
 
     monkeypatch.setattr("app.src.ip_detector.httpx.AsyncClient", factory)
+    return clients
 
 
 @pytest.mark.asyncio
@@ -112,3 +116,185 @@ async def test_ip_detector_raises_when_trace_missing_ip(monkeypatch: pytest.Monk
     with pytest.raises(RuntimeError):
         await detector.get_current_ip()
 
+
+
+@pytest.mark.asyncio
+async def test_ip_detector_reuses_client_until_closed(monkeypatch: pytest.MonkeyPatch) -> None:
+    clients = patch_httpx(monkeypatch, [DummyResponse("1.2.3.4"), DummyResponse("1.2.3.4")])
+
+    detector = PublicIPDetector()
+    await detector.get_current_ip()
+    await detector.get_current_ip()
+    await detector.close()
+
+    assert len(clients) == 1
+    assert clients[0].closed is True
+
+
+class DelayedAsyncClient:
+    def __init__(self, responses: dict[str, tuple[float, Any]]) -> None:
+        self._responses = responses
+        self.started: list[str] = []
+        self.cancelled: list[str] = []
+
+    async def aclose(self) -> None:
+        return None
+
+    async def get(self, url: str) -> DummyResponse:
+        self.started.append(url)
+        delay, result = self._responses[url]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(url)
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def patch_delayed_httpx(monkeypatch: pytest.MonkeyPatch, responses: dict[str, tuple[float, Any]]) -> DelayedAsyncClient:
+    client = DelayedAsyncClient(responses)
+    monkeypatch.setattr("app.src.ip_detector.httpx.AsyncClient", lambda *args, **kwargs: client)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_hedged_detection_skips_slow_provider(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = patch_delayed_httpx(
+        monkeypatch,
+        {
+            "https://slow.example": (5.0, DummyResponse("1.1.1.1")),
+            "https://fast.example": (0.01, DummyResponse("2.2.2.2")),
+            "https://unused.example": (0.01, DummyResponse("3.3.3.3")),
+        },
+    )
+    detector = PublicIPDetector(hedge_delay=0.05)
+    detector._providers = ["https://slow.example", "https://fast.example", "https://unused.example"]
+
+    started = time.perf_counter()
+    ip = await detector.get_current_ip()
+    elapsed = time.perf_counter() - started
+
+    assert ip == "2.2.2.2"
+    assert elapsed < 1.0
+    assert client.cancelled == ["https://slow.example"]
+    assert "https://unused.example" not in client.started
+
+
+@pytest.mark.asyncio
+async def test_hedged_detection_starts_next_provider_on_failure(monkeypatch: pytest.MonkeyPatch) -> None:
+    patch_delayed_httpx(
+        monkeypatch,
+        {
+            "https://broken.example": (0.0, httpx.HTTPError("boom")),
+            "https://ok.example": (0.0, DummyResponse("2.2.2.2")),
+        },
+    )
+    detector = PublicIPDetector(hedge_delay=5.0)
+    detector._providers = ["https://broken.example", "https://ok.example"]
+
+    started = time.perf_counter()
+    ip = await detector.get_current_ip()
+
+    assert ip == "2.2.2.2"
+    assert time.perf_counter() - started < 1.0
+
+
+@pytest.mark.asyncio
+async def test_hedged_detection_raises_when_all_providers_fail(monkeypatch: pytest.MonkeyPatch) -> None:
+    patch_delayed_httpx(
+        monkeypatch,
+        {
+            "https://a.example": (0.01, httpx.HTTPError("boom")),
+            "https://b.example": (0.01, DummyResponse("bad", status_code=500)),
+        },
+    )
+    detector = PublicIPDetector(hedge_delay=0)
+    detector._providers = ["https://a.example", "https://b.example"]
+
+    with pytest.raises(RuntimeError):
+        await detector.get_current_ip()
+
+
+@pytest.mark.asyncio
+async def test_detector_prefers_faster_provider(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = patch_delayed_httpx(
+        monkeypatch,
+        {
+            "https://slow.example": (0.05, DummyResponse("1.1.1.1")),
+            "https://fast.example": (0.0, DummyResponse("1.1.1.1")),
+        },
+    )
+    detector = PublicIPDetector()
+    detector._providers = ["https://slow.example", "https://fast.example"]
+
+    await detector.get_current_ip()
+    await detector.get_current_ip()
+    await detector.get_current_ip()
+
+    assert client.started == ["https://slow.example", "https://fast.example", "https://fast.example"]
+    stats = detector.provider_stats
+    assert stats["https://slow.example"].successes == 1
+    assert stats["https://fast.example"].ewma_latency < stats["https://slow.example"].ewma_latency
+
+
+@pytest.mark.asyncio
+async def test_detector_skips_provider_in_cooldown(monkeypatch: pytest.MonkeyPatch) -> None:
+    client = patch_delayed_httpx(
+        monkeypatch,
+        {
+            "https://broken.example": (0.0, httpx.HTTPError("boom")),
+            "https://ok.example": (0.01, DummyResponse("2.2.2.2")),
+        },
+    )
+    detector = PublicIPDetector(failure_threshold=2, cooldown=60)
+    detector._providers = ["https://broken.example", "https://ok.example"]
+
+    for _ in range(4):
+        await detector.get_current_ip()
+
+    assert client.started.count("https://broken.example") == 2
+    assert detector.provider_stats["https://broken.example"].consecutive_failures == 2
+
+
+@pytest.mark.asyncio
+async def test_detector_persists_provider_stats(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    stats_path = tmp_path / "providers.json"
+    patch_delayed_httpx(
+        monkeypatch,
+        {
+            "https://broken.example": (0.0, httpx.HTTPError("boom")),
+            "https://ok.example": (0.0, DummyResponse("2.2.2.2")),
+        },
+    )
+    detector = PublicIPDetector(stats_path=stats_path)
+    detector._providers = ["https://broken.example", "https://ok.example"]
+    await detector.get_current_ip()
+
+    restored = PublicIPDetector(stats_path=stats_path)
+
+    assert restored.provider_stats == detector.provider_stats
+    assert restored.provider_stats["https://broken.example"].failures == 1
+
+
+@pytest.mark.asyncio
+async def test_ipv6_detector_rejects_ipv4_answer(monkeypatch: pytest.MonkeyPatch) -> None:
+    patch_httpx(monkeypatch, [DummyResponse("1.2.3.4"), DummyResponse("2001:db8::1\n")])
+    detector = PublicIPDetector(family=6)
+
+    assert await detector.get_current_ip() == "2001:db8::1"
+
+
+@pytest.mark.asyncio
+async def test_detect_ips_tolerates_one_failing_family(ip_detector_factory) -> None:
+    class FailingDetector:
+        async def get_current_ip(self) -> str:
+            msg = "no IPv6 connectivity"
+            raise RuntimeError(msg)
+
+    ips = await detect_ips({"A": ip_detector_factory("1.2.3.4"), "AAAA": FailingDetector()})
+
+    assert ips == {"A": "1.2.3.4"}
+    with pytest.raises(RuntimeError, match="no IPv6"):
+        await detect_ips({"AAAA": FailingDetector()})
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import multiprocessing
+import queue
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import Config, DNSRecordConfig
+from app.main import run_cycle
+from app.src.dns_updater import DNSUpdater
+from app.src.lease import FileLease
+from app.src.multi_zone import MultiZoneUpdater
+
+_DURATION = 0.6
+
+
+def _contend(path: str, holder: str, duration: float, seconds: float, leading: "multiprocessing.Queue[object]") -> None:
+    """Take part in the election for ``seconds``, reporting every moment this process leads."""
+
+    async def run() -> None:
+        lease = FileLease(Path(path), duration, holder=holder)
+        await lease.start()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if lease.is_leader:
+                leading.put((holder, time.time()))
+            await asyncio.sleep(0.02)
+        await lease.stop()
+
+    asyncio.run(run())
+
+
+def _next_leader(leading: "multiprocessing.Queue[object]", holder: str, timeout: float) -> tuple[float, float]:
+    """Wait for ``holder`` to lead; return when it did, and when any other holder last led before that."""
+    others_last = 0.0
+    deadline = time.monotonic() + timeout
+    while True:
+        sample_holder, at = leading.get(timeout=max(deadline - time.monotonic(), 0.01))
+        if sample_holder == holder:
+            return at, others_last
+        others_last = max(others_last, at)
+
+
+def _collect(
+    leading: "multiprocessing.Queue[object]",
+    processes: list[multiprocessing.process.BaseProcess],
+) -> list[tuple[str, float]]:
+    samples = []
+    while any(process.is_alive() for process in processes):
+        try:
+            samples.append(leading.get(timeout=0.1))
+        except queue.Empty:
+            pass
+    while not leading.empty():
+        samples.append(leading.get())
+    return samples
+
+
+@pytest.fixture
+def spawn() -> multiprocessing.context.SpawnContext:
+    return multiprocessing.get_context("spawn")
+
+
+def test_only_one_process_leads(tmp_path, spawn) -> None:
+    lease_path = str(tmp_path / "lease")
+    leading = spawn.Queue()
+    processes = [
+        spawn.Process(target=_contend, args=(lease_path, f"replica-{i}", _DURATION, 2.0, leading)) for i in range(3)
+    ]
+    for process in processes:
+        process.start()
+    samples = _collect(leading, processes)
+
+    assert samples
+    assert len({holder for holder, _ in samples}) == 1
+
+
+def test_follower_takes_over_within_one_lease_after_the_leader_dies(tmp_path, spawn) -> None:
+    lease_path = str(tmp_path / "lease")
+    leading = spawn.Queue()
+    leader = spawn.Process(target=_contend, args=(lease_path, "leader", _DURATION, 30.0, leading))
+    leader.start()
+    _next_leader(leading, "leader", timeout=10)
+    follower = spawn.Process(target=_contend, args=(lease_path, "follower", _DURATION, 30.0, leading))
+    follower.start()
+    time.sleep(2.0)
+
+    leader.kill()
+    leader.join(10)
+    killed_at = time.time()
+    took_over_at, leader_last = _next_leader(leading, "follower", timeout=10)
+    follower.kill()
+    follower.join(10)
+
+    assert took_over_at > leader_last
+    # Within one lease of the leader's last renewal, not a renewal period after the expiry.
+    assert took_over_at - killed_at <= _DURATION + 0.1
+
+
+def test_follower_takes_over_soon_after_the_leader_releases(tmp_path, spawn) -> None:
+    lease_path = str(tmp_path / "lease")
+    leading = spawn.Queue()
+    duration = 3.0
+    leader = spawn.Process(target=_contend, args=(lease_path, "leader", duration, 1.0, leading))
+    leader.start()
+    _next_leader(leading, "leader", timeout=10)
+    follower = spawn.Process(target=_contend, args=(lease_path, "follower", duration, 30.0, leading))
+    follower.start()
+
+    leader.join(10)
+    released_at = time.time()
+    took_over_at, _ = _next_leader(leading, "follower", timeout=10)
+    follower.kill()
+    follower.join(10)
+
+    # Within one renewal period of the follower, well before the released lease would have expired.
+    assert took_over_at - released_at <= duration / 3 + 0.2
+
+
+@pytest.mark.asyncio
+async def test_follower_attempts_when_the_lease_it_saw_expires(tmp_path: Path) -> None:
+    # A leader that renewed just before dying: its lease runs out well before the follower's next renewal period.
+    (tmp_path / "lease").write_text(json.dumps({"holder": "leader", "expires": time.time() + 0.3}))
+    follower = FileLease(tmp_path / "lease", 3.0, holder="follower")
+    started = time.monotonic()
+
+    await follower.start()
+    await asyncio.wait_for(follower.event.wait(), timeout=5)
+    await follower.stop()
+
+    assert time.monotonic() - started < 0.6
+
+
+@pytest.mark.asyncio
+async def test_lease_is_held_until_released(tmp_path: Path) -> None:
+    first = FileLease(tmp_path / "lease", 60, holder="first")
+    second = FileLease(tmp_path / "lease", 60, holder="second")
+
+    assert await first.attempt() is True
+    assert await first.attempt() is True
+    assert await second.attempt() is False
+    assert second.current_holder == "first"
+
+    await first.stop()
+
+    assert first.is_leader is False
+    assert await second.attempt() is True
+    assert await first.attempt() is False
+
+
+@pytest.mark.asyncio
+async def test_damaged_lease_file_is_taken_over(tmp_path: Path) -> None:
+    (tmp_path / "lease").write_text("{not json")
+    lease = FileLease(tmp_path / "lease", 60, holder="replica")
+
+    assert await lease.attempt() is True
+    assert lease.consume() is True
+    assert lease.consume() is False
+
+
+@pytest.mark.asyncio
+async def test_followers_stand_by_and_a_new_leader_rereads_its_records(
+    tmp_path: Path,
+    ip_detector_factory,
+    cloudflare_client_factory,
+) -> None:
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone")
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory()
+    zone = DNSUpdater(config, ip_detector, cf_client, [DNSRecordConfig(name="home.example.com")])
+    updater = MultiZoneUpdater({"A": ip_detector}, [zone])
+    replica = FileLease(tmp_path / "lease", 60, holder="replica")
+    other = FileLease(tmp_path / "lease", 60, holder="other")
+
+    await replica.attempt()
+    assert await run_cycle(config, updater, None, replica) is False
+    assert cf_client.records["home.example.com"].content == "1.2.3.4"
+
+    # The other replica takes over and the record is changed while this one follows.
+    await replica.stop()
+    await other.attempt()
+    await replica.attempt()
+    calls = ip_detector.calls
+    assert await run_cycle(config, updater, None, replica) is False
+    assert ip_detector.calls == calls
+    cf_client.records["home.example.com"] = cf_client.records["home.example.com"]._replace(content="5.6.7.8")
+
+    await other.stop()
+    await replica.attempt()
+    assert await run_cycle(config, updater, None, replica) is False
+
+    assert cf_client.records["home.example.com"].content == "1.2.3.4"
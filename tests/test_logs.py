@@ -0,0 +1,88 @@
+import io
+import json
+import threading
+
+import pytest
+import structlog
+
+from app.src.logs import LogSampler, QueueWriter, configure_logging
+
+
+class _BlockingStream(io.BytesIO):
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, data) -> int:
+        self.release.wait()
+        return super().write(data)
+
+
+@pytest.fixture
+def restore_logging():
+    logging_config = structlog.get_config()
+    yield
+    configure_logging()
+    structlog.configure(**logging_config)
+
+
+def test_sampler_keeps_one_in_rate_per_record() -> None:
+    sampler = LogSampler(3)
+    kept = []
+    for _ in range(6):
+        for name in ("a.example.com", "b.example.com"):
+            try:
+                kept.append(sampler(None, "info", {"event": "Record already up to date", "record_name": name}))
+            except structlog.DropEvent:
+                pass
+
+    assert [event["record_name"] for event in kept] == ["a.example.com", "b.example.com"] * 2
+    assert all(event["sampled"] == 3 for event in kept)
+    assert sampler(None, "info", {"event": "Record updated"}) == {"event": "Record updated"}
+
+
+def test_queue_writer_drops_and_reports_when_full() -> None:
+    stream = _BlockingStream()
+    writer = QueueWriter(stream, maxsize=2)
+    for i in range(10):
+        writer.write(f"{i}\n".encode())
+    stream.release.set()
+    writer.close()
+
+    lines = stream.getvalue().decode().splitlines()
+    reports = [json.loads(line) for line in lines if line.startswith("{")]
+    assert writer.dropped > 0
+    assert sum(report["dropped"] for report in reports) == writer.dropped
+    assert len(lines) - len(reports) == 10 - writer.dropped
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("restore_logging")
+async def test_json_logging_writes_lines_from_queue() -> None:
+    stream = io.TextIOWrapper(io.BytesIO())
+    writer = configure_logging("json", sample_rate=2, stream=stream)
+    assert writer is not None
+    logger = structlog.get_logger()
+
+    with structlog.contextvars.bound_contextvars(zone_id="zone"):
+        await logger.ainfo("Record created", record_name="a.example.com", ip="1.2.3.4")
+        for _ in range(3):
+            await logger.ainfo("IP unchanged, skipping update")
+    try:
+        raise RuntimeError("boom")  # noqa: TRY301
+    except RuntimeError:
+        await logger.aexception("Update failed")
+    await logger.adebug("Not logged at INFO")
+    writer.close()
+
+    lines = [json.loads(line) for line in stream.buffer.getvalue().splitlines()]
+    assert [line["event"] for line in lines] == [
+        "Record created",
+        "IP unchanged, skipping update",
+        "IP unchanged, skipping update",
+        "Update failed",
+    ]
+    assert lines[0]["zone_id"] == "zone"
+    assert lines[0]["level"] == "info"
+    assert lines[0]["timestamp"].endswith("Z")
+    assert lines[3]["exception"][0]["exc_value"] == "boom"
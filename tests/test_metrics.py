@@ -0,0 +1,124 @@
+import asyncio
+from http import HTTPStatus
+
+import httpx
+import pytest
+
+from app.config import DNSRecordConfig
+from app.src import metrics
+from app.src.http_server import HTTPServer, Request, Response, metrics_endpoint
+from app.src.models import DNSRecord
+
+
+def _records(result: str) -> float:
+    return metrics.RECORDS.labels(result=result).value
+
+
+def test_registry_renders_prometheus_text() -> None:
+    registry = metrics.MetricsRegistry()
+    counter = metrics.Counter("jobs_total", "Jobs run.", ["result"], registry)
+    gauge = metrics.Gauge("last_run_seconds", "Last run.", registry=registry)
+    counter.labels(result='ok "quoted"').inc(2)
+    gauge.labels().set(5)
+
+    assert registry.render() == (
+        "# HELP jobs_total Jobs run.\n"
+        "# TYPE jobs_total counter\n"
+        'jobs_total{result="ok \\"quoted\\""} 2.0\n'
+        "# HELP last_run_seconds Last run.\n"
+        "# TYPE last_run_seconds gauge\n"
+        "last_run_seconds 5.0\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative() -> None:
+    registry = metrics.MetricsRegistry()
+    histogram = metrics.Histogram("latency_seconds", "Latency.", registry=registry, buckets=[0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.labels().observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert 'latency_seconds_bucket{le="0.1"} 2' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 3.65" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+@pytest.mark.asyncio
+async def test_update_counts_records_and_times_cycle(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    existing = DNSRecord(id="rec-1", name="same.example.com", content="1.2.3.4")
+    stale = DNSRecord(id="rec-2", name="stale.example.com", content="9.9.9.9")
+    cf_client = cloudflare_client_factory(
+        records={"same.example.com": existing, "stale.example.com": stale},
+        zone_id="metrics-zone",
+    )
+    record_configs = [
+        DNSRecordConfig(name="same.example.com"),
+        DNSRecordConfig(name="stale.example.com"),
+        DNSRecordConfig(name="new.example.com"),
+    ]
+    updater = updater_factory(ip_detector_factory("1.2.3.4"), cf_client, record_configs)
+    before = {result: _records(result) for result in ("created", "updated", "skipped", "failed")}
+
+    await updater.update()
+    await updater.update()
+
+    assert _records("created") - before["created"] == 1
+    assert _records("updated") - before["updated"] == 1
+    # One up to date in the first cycle, all three unchanged in the second.
+    assert _records("skipped") - before["skipped"] == 4
+    assert _records("failed") == before["failed"]
+    assert metrics.CYCLE_SECONDS.labels(zone_id="metrics-zone").count == 2
+    assert metrics.LAST_SUCCESS.labels(zone_id="metrics-zone").value > 0
+
+
+@pytest.mark.asyncio
+async def test_http_server_serves_metrics() -> None:
+    async def echo(request: Request) -> Response:
+        return Response(HTTPStatus.OK, request.query["name"][0])
+
+    server = HTTPServer("127.0.0.1", 0)
+    server.route("/metrics", metrics_endpoint)
+    server.route("/echo", echo)
+    await server.start()
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{server.port}") as client:
+            scrape = await client.get("/metrics")
+            echoed = await client.get("/echo", params={"name": "home"})
+            missing = await client.get("/missing")
+    finally:
+        await server.close()
+
+    assert scrape.status_code == HTTPStatus.OK
+    assert scrape.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE cloudflare_ddns_records_total counter" in scrape.text
+    assert echoed.text == "home"
+    assert missing.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("length", ["-1", str(64 * 1024 + 1), "10000000000"])
+async def test_http_server_rejects_bad_content_length(length) -> None:
+    async def echo(request: Request) -> Response:
+        return Response(HTTPStatus.OK, request.body)
+
+    server = HTTPServer("127.0.0.1", 0)
+    server.route("/echo", echo)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        # The body is never sent: the server must answer from the headers alone.
+        writer.write(f"POST /echo HTTP/1.1\r\nHost: localhost\r\nContent-Length: {length}\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        writer.close()
+    finally:
+        await server.close()
+
+    assert status_line.startswith(b"HTTP/1.1 413 ")
@@ -0,0 +1,105 @@
+import httpx
+import pytest
+
+from app.config import Config, DNSRecordConfig, ZoneConfig
+from app.src.dns_updater import DNSUpdater
+from app.src.multi_zone import MultiZoneUpdater, build_zone_updaters
+from app.src.state import StateStore
+
+
+@pytest.mark.asyncio
+async def test_multi_zone_detects_ip_once_and_fans_out(ip_detector_factory, cloudflare_client_factory) -> None:
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone")
+    ip_detector = ip_detector_factory("1.2.3.4")
+    clients = [cloudflare_client_factory(zone_id=f"zone-{i}") for i in range(3)]
+    updaters = [
+        DNSUpdater(config, ip_detector, client, [DNSRecordConfig(name=f"host.zone{i}.example")])
+        for i, client in enumerate(clients)
+    ]
+
+    changed = await MultiZoneUpdater({"A": ip_detector}, updaters).update()
+
+    assert changed is True
+    assert ip_detector.calls == 1
+    assert [client.created_calls[-1]["content"] for client in clients] == ["1.2.3.4"] * 3
+
+
+@pytest.mark.asyncio
+async def test_multi_zone_isolates_failing_zone(ip_detector_factory, cloudflare_client_factory) -> None:
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone")
+    ip_detector = ip_detector_factory("1.2.3.4")
+    broken = cloudflare_client_factory(zone_id="broken")
+
+    async def fail(*_: object) -> None:
+        msg = "zone unavailable"
+        raise RuntimeError(msg)
+
+    broken.list_dns_records = fail
+    healthy = cloudflare_client_factory(zone_id="healthy")
+    updaters = [
+        DNSUpdater(config, ip_detector, broken, [DNSRecordConfig(name="a.example.com")]),
+        DNSUpdater(config, ip_detector, healthy, [DNSRecordConfig(name="b.example.org")]),
+    ]
+
+    changed = await MultiZoneUpdater({"A": ip_detector}, updaters).update()
+
+    assert changed is True
+    assert healthy.created_calls[-1]["name"] == "b.example.org"
+
+
+@pytest.mark.asyncio
+async def test_build_zone_updaters_resolves_and_caches_zone_names(
+    ip_detector_factory,
+    fake_cloudflare_api,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    monkeypatch.setenv("CLOUDFLARE_BASE_URL", fake_cloudflare_api.url)
+    fake_cloudflare_api.zones["example.net"] = "zone-net"
+    config = Config(cloudflare_api_token="token")
+    zones = [ZoneConfig(zone_name="example.net", api_token="token", records=[DNSRecordConfig(name="a.example.net")])]
+    state_path = tmp_path / "state.json"
+
+    async with httpx.AsyncClient() as http_client:
+        updaters = await build_zone_updaters(
+            config, zones, {"A": ip_detector_factory()}, http_client, StateStore(state_path)
+        )
+
+    assert [updater.zone_id for updater in updaters] == ["zone-net"]
+    assert fake_cloudflare_api.requests == [("GET", "/client/v4/zones")]
+    assert StateStore(state_path).get_zone_id("example.net", "token") == "zone-net"
+
+
+@pytest.mark.asyncio
+async def test_zones_of_the_same_name_resolve_per_api_token(
+    ip_detector_factory,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path,
+) -> None:
+    resolved: list[tuple[str, str]] = []
+
+    async def resolve_zone_id(api_token: str, zone_name: str, **_: object) -> str:
+        resolved.append((api_token, zone_name))
+        return f"{zone_name}-{api_token}"
+
+    monkeypatch.setattr("app.src.multi_zone.resolve_zone_id", resolve_zone_id)
+    config = Config(cloudflare_api_token="token")
+    zones = [
+        ZoneConfig(zone_name="example.net", api_token=token, records=[DNSRecordConfig(name="a.example.net")])
+        for token in ("account-1", "account-2")
+    ]
+    state_store = StateStore(tmp_path / "state.json")
+    zone_ids: dict[tuple[str, str], str] = {}
+
+    async with httpx.AsyncClient() as http_client:
+        first = await build_zone_updaters(
+            config, zones, {"A": ip_detector_factory()}, http_client, state_store, zone_ids=zone_ids
+        )
+        again = await build_zone_updaters(
+            config, zones, {"A": ip_detector_factory()}, http_client, None, zone_ids=zone_ids
+        )
+
+    assert [updater.zone_id for updater in first] == ["example.net-account-1", "example.net-account-2"]
+    assert [updater.zone_id for updater in again] == ["example.net-account-1", "example.net-account-2"]
+    assert resolved == [("account-1", "example.net"), ("account-2", "example.net")]
+    assert state_store.get_zone_id("example.net", "account-2") == "example.net-account-2"
@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app import main as app_main
+from app.config import Config
+
+
+@pytest.fixture
+def once_config(fake_cloudflare_api, ip_detector_factory, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    def factory(**overrides: object) -> Config:
+        records_path = tmp_path / "records.json"
+        records_path.write_text(json.dumps({"records": [{"name": "home.example.com"}]}))
+        monkeypatch.setenv("CLOUDFLARE_BASE_URL", fake_cloudflare_api.url)
+        monkeypatch.setattr(app_main, "build_ip_detector", lambda *_args, **_kwargs: ip_detector_factory("1.2.3.4"))
+        settings: dict[str, object] = {
+            "cloudflare_api_token": "token",
+            "cloudflare_zone_id": "zone",
+            "records_config_path": str(records_path),
+            "state_path": str(tmp_path / "state.json"),
+        }
+        return Config.model_validate({**settings, **overrides})
+
+    return factory
+
+
+@pytest.mark.asyncio
+async def test_once_reports_change_then_skips_cloudflare(once_config, fake_cloudflare_api) -> None:
+    config = once_config()
+
+    assert await app_main.run_once(config) == app_main.EXIT_CHANGED
+    requests = list(fake_cloudflare_api.requests)
+    assert await app_main.run_once(config) == app_main.EXIT_UNCHANGED
+
+    assert fake_cloudflare_api.find("home.example.com")["content"] == "1.2.3.4"
+    assert fake_cloudflare_api.requests == requests
+
+
+@pytest.mark.asyncio
+async def test_once_reports_unchanged_record_without_state(once_config, fake_cloudflare_api) -> None:
+    fake_cloudflare_api.add_record("home.example.com", "1.2.3.4")
+
+    assert await app_main.run_once(once_config(state_path=None)) == app_main.EXIT_UNCHANGED
+
+
+@pytest.mark.asyncio
+async def test_once_reports_errors(once_config, fake_cloudflare_api) -> None:
+    fake_cloudflare_api.fail_batch = True
+
+    assert await app_main.run_once(once_config(batch_updates=True)) == app_main.EXIT_ERROR
@@ -0,0 +1,135 @@
+import json
+from pathlib import Path
+
+import pytest
+import structlog
+
+from app import main as app_main
+from app.config import Config, DNSRecordConfig
+from app.src.cloudflare_client import CloudflareClient
+from app.src.dns_updater import DNSUpdater
+from app.src.models import RecordChange, ZonePlan
+from app.src.plan import render_json, render_table
+
+
+@pytest.mark.asyncio
+async def test_plan_reports_changes_without_writing(ip_detector_factory, fake_cloudflare_api) -> None:
+    fake_cloudflare_api.add_record("home.example.com", "9.9.9.9")
+    fake_cloudflare_api.add_record("ok.example.com", "1.2.3.4")
+    configs = [
+        DNSRecordConfig(name="home.example.com"),
+        DNSRecordConfig(name="ok.example.com"),
+        DNSRecordConfig(name="new.example.com"),
+    ]
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone")
+    cf_client = CloudflareClient(api_token="token", zone_id="zone", base_url=fake_cloudflare_api.url)
+    updater = DNSUpdater(config, ip_detector_factory("1.2.3.4"), cf_client, configs)
+
+    plan = await updater.plan()
+    await cf_client.close()
+
+    assert [(c.name, c.fields) for c in plan.changes] == [("home.example.com", ["content"]), ("new.example.com", [])]
+    assert (plan.read_calls, plan.write_calls) == (1, 2)
+    assert [method for method, _ in fake_cloudflare_api.requests] == ["GET"]
+
+
+@pytest.mark.asyncio
+async def test_plan_counts_batched_writes(ip_detector_factory, cloudflare_client_factory, updater_factory) -> None:
+    configs = [DNSRecordConfig(name=f"host{i}.example.com") for i in range(5)]
+    updater = updater_factory(ip_detector_factory(), cloudflare_client_factory(), configs, batch_updates=True, batch_size=2)
+
+    plan = await updater.plan()
+
+    assert plan.write_calls == 3
+    assert plan.api_calls == 4
+
+
+@pytest.mark.asyncio
+async def test_plan_counts_record_lookups_without_bulk_fetch(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    configs = [DNSRecordConfig(name=f"host{i}.example.com") for i in range(5)]
+    cf_client = cloudflare_client_factory()
+    updater = updater_factory(ip_detector_factory(), cf_client, configs, bulk_fetch=False)
+
+    plan = await updater.plan()
+
+    assert (plan.read_calls, plan.write_calls) == (5, 5)
+    assert (cf_client.get_calls, cf_client.list_calls) == (5, 0)
+
+
+@pytest.mark.asyncio
+async def test_plan_leaves_confirmed_state_alone(ip_detector_factory, cloudflare_client_factory, updater_factory) -> None:
+    ip_detector = ip_detector_factory("1.2.3.4")
+    cf_client = cloudflare_client_factory()
+    updater = updater_factory(ip_detector, cf_client, [DNSRecordConfig(name="home.example.com")])
+    await updater.update()
+    ip_detector.set_ip("5.6.7.8")
+
+    plan = await updater.plan()
+    cf_client.list_calls = 0
+    await updater.update()
+
+    assert [change.fields for change in plan.changes] == [["content"]]
+    # The update reused the record ID confirmed before the plan instead of listing the zone again.
+    assert cf_client.list_calls == 0
+    assert cf_client.records["home.example.com"].content == "5.6.7.8"
+
+
+def test_render_plan_as_json_and_table() -> None:
+    plans = [
+        ZonePlan(
+            zone_id="zone",
+            changes=[
+                RecordChange(name="new.example.com", content="1.2.3.4", ttl=300, proxied=False),
+                RecordChange(
+                    name="home.example.com",
+                    content="1.2.3.4",
+                    ttl=300,
+                    proxied=False,
+                    record_id="rec-1",
+                    old_content="9.9.9.9",
+                    fields=["content"],
+                ),
+            ],
+            read_calls=1,
+            write_calls=2,
+        ),
+    ]
+
+    data = json.loads(render_json(plans))
+    table = render_table(plans)
+
+    assert data["api_calls"] == 3
+    assert [change["action"] for change in data["zones"][0]["changes"]] == ["create", "update"]
+    assert "home.example.com" in table
+    assert table.endswith("Plan: 1 to create, 1 to update. API calls: 3 (1 read, 2 write).")
+    assert render_table([]).startswith("No changes.")
+
+
+def test_main_plan_prints_json(
+    fake_cloudflare_api,
+    ip_detector_factory,
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    records_path = tmp_path / "records.json"
+    records_path.write_text(json.dumps({"records": [{"name": "home.example.com"}]}))
+    monkeypatch.setenv("CLOUDFLARE_BASE_URL", fake_cloudflare_api.url)
+    monkeypatch.setenv("CLOUDFLARE_API_TOKEN", "token")
+    monkeypatch.setenv("CLOUDFLARE_ZONE_ID", "zone")
+    monkeypatch.setenv("RECORDS_CONFIG_PATH", str(records_path))
+    monkeypatch.setattr(app_main, "build_ip_detector", lambda *_args, **_kwargs: ip_detector_factory("1.2.3.4"))
+    logging_config = structlog.get_config()
+
+    try:
+        app_main.main(["--plan", "--format", "json"])
+    finally:
+        structlog.configure(**logging_config)
+
+    data = json.loads(capsys.readouterr().out)
+    assert data["zones"][0]["changes"][0]["name"] == "home.example.com"
+    assert [method for method, _ in fake_cloudflare_api.requests] == ["GET"]
@@ -0,0 +1,202 @@
+import time
+
+import cloudflare
+import httpx
+import pytest
+
+from app.src.cloudflare_client import CloudflareClient
+from app.src.models import RecordChange
+from app.src.rate_limit import RequestScheduler
+
+
+def _status_error(status: int) -> cloudflare.APIStatusError:
+    response = httpx.Response(status, request=httpx.Request("GET", "https://api.cloudflare.com/client/v4"))
+    error_class = cloudflare.RateLimitError if status == 429 else cloudflare.InternalServerError  # noqa: PLR2004
+    return error_class("Injected failure", response=response, body=None)
+
+
+class _FlakyOperation:
+    def __init__(self, *errors: Exception) -> None:
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_tokens_to_refill() -> None:
+    scheduler = RequestScheduler(requests=2, period=0.2)
+
+    started = time.monotonic()
+    for _ in range(3):
+        await scheduler.acquire()
+
+    assert time.monotonic() - started >= 0.08
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_requests() -> None:
+    scheduler = RequestScheduler()
+    scheduler.observe({"retry-after": "0.1"})
+
+    started = time.monotonic()
+    await scheduler.acquire()
+
+    assert time.monotonic() - started >= 0.08
+
+
+def test_rate_limit_headers_shrink_bucket_to_remaining() -> None:
+    scheduler = RequestScheduler()
+
+    scheduler.observe({"ratelimit": '"default";r=5;t=30'})
+    assert scheduler.available < 6
+
+    scheduler = RequestScheduler()
+    scheduler.observe({"x-ratelimit-remaining": "7", "x-ratelimit-reset": "60"})
+    assert scheduler.available < 8
+
+
+@pytest.mark.asyncio
+async def test_exhausted_window_pauses_until_the_reset() -> None:
+    # Some servers send the reset as a Unix time rather than seconds from now.
+    scheduler = RequestScheduler()
+    scheduler.observe({"x-ratelimit-remaining": "0", "x-ratelimit-reset": str(time.time() + 0.1)})
+
+    started = time.monotonic()
+    await scheduler.acquire()
+
+    assert 0.05 <= time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_exhausted_window_pauses_at_most_one_period() -> None:
+    scheduler = RequestScheduler(requests=10, period=0.1)
+    scheduler.observe({"ratelimit-remaining": "0", "ratelimit-reset": "86400"})
+
+    started = time.monotonic()
+    await scheduler.acquire()
+
+    assert time.monotonic() - started < 1
+
+
+@pytest.mark.asyncio
+async def test_call_retries_idempotent_server_errors() -> None:
+    scheduler = RequestScheduler(backoff=0)
+    operation = _FlakyOperation(_status_error(503), _status_error(500))
+
+    assert await scheduler.call(operation, idempotent=True) == "ok"
+    assert operation.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_call_does_not_repeat_non_idempotent_server_errors() -> None:
+    scheduler = RequestScheduler(backoff=0)
+    operation = _FlakyOperation(_status_error(503))
+
+    with pytest.raises(cloudflare.InternalServerError):
+        await scheduler.call(operation, idempotent=False)
+    assert operation.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_call_retries_rate_limited_non_idempotent_calls() -> None:
+    scheduler = RequestScheduler(backoff=0)
+    operation = _FlakyOperation(_status_error(429))
+
+    assert await scheduler.call(operation, idempotent=False) == "ok"
+    assert operation.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_call_gives_up_after_max_retries() -> None:
+    scheduler = RequestScheduler(max_retries=2, backoff=0)
+    operation = _FlakyOperation(*(_status_error(503) for _ in range(3)))
+
+    with pytest.raises(cloudflare.InternalServerError):
+        await scheduler.call(operation, idempotent=True)
+    assert operation.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_client_retries_reads_through_scheduler(fake_cloudflare_api) -> None:
+    fake_cloudflare_api.add_record("home.example.com", "1.1.1.1")
+    fake_cloudflare_api.failures = [429, 503]
+    client = CloudflareClient(
+        api_token="token",
+        zone_id="zone",
+        base_url=fake_cloudflare_api.url,
+        scheduler=RequestScheduler(backoff=0),
+    )
+
+    records = await client.list_dns_records(["home.example.com"])
+    await client.close()
+
+    assert records["home.example.com"].content == "1.1.1.1"
+    assert len(fake_cloudflare_api.requests) == 3
+    assert client.request_count == 1
+
+
+@pytest.mark.asyncio
+async def test_client_does_not_repeat_failed_creates(fake_cloudflare_api) -> None:
+    fake_cloudflare_api.failures = [503]
+    client = CloudflareClient(
+        api_token="token",
+        zone_id="zone",
+        base_url=fake_cloudflare_api.url,
+        scheduler=RequestScheduler(backoff=0),
+    )
+
+    with pytest.raises(cloudflare.InternalServerError):
+        await client.create_dns_record("new.example.com", "1.2.3.4")
+    await client.close()
+
+    assert fake_cloudflare_api.requests == [("POST", "/client/v4/zones/zone/dns_records")]
+
+
+@pytest.mark.asyncio
+async def test_client_edits_are_retried(fake_cloudflare_api) -> None:
+    existing = fake_cloudflare_api.add_record("home.example.com", "9.9.9.9")
+    fake_cloudflare_api.failures = [502]
+    client = CloudflareClient(
+        api_token="token",
+        zone_id="zone",
+        base_url=fake_cloudflare_api.url,
+        scheduler=RequestScheduler(backoff=0),
+    )
+    change = RecordChange(
+        name="home.example.com",
+        content="1.2.3.4",
+        ttl=300,
+        proxied=False,
+        record_id=existing["id"],
+        fields=["content"],
+    )
+
+    record = await client.edit_dns_record(change)
+    await client.close()
+
+    assert record.content == "1.2.3.4"
+    assert len(fake_cloudflare_api.requests) == 2
+
+
+@pytest.mark.asyncio
+async def test_response_hook_feeds_rate_limit_headers(fake_cloudflare_api) -> None:
+    fake_cloudflare_api.response_headers = {"Ratelimit": '"default";r=3;t=300'}
+    scheduler = RequestScheduler()
+    http_client = cloudflare.DefaultAsyncHttpxClient(event_hooks={"response": [scheduler.on_response]})
+    client = CloudflareClient(
+        api_token="token",
+        zone_id="zone",
+        base_url=fake_cloudflare_api.url,
+        http_client=http_client,
+        scheduler=scheduler,
+    )
+
+    await client.get_dns_record("home.example.com")
+    await http_client.aclose()
+
+    assert scheduler.available < 4
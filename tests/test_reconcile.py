@@ -0,0 +1,36 @@
+from app.config import DNSRecordConfig
+from app.src.models import DNSRecord
+from app.src.reconcile import diff_record
+
+
+def make_record(**fields: object) -> DNSRecord:
+    return DNSRecord(**{"id": "rec-1", "name": "home.example.com", "content": "1.2.3.4", **fields})
+
+
+def test_diff_reports_each_changed_attribute() -> None:
+    desired = DNSRecordConfig(name="home.example.com", ttl=120, comment="home")
+
+    assert diff_record(desired, "1.2.3.4", make_record(ttl=120, proxied=False, comment="home")) == []
+    assert diff_record(desired, "5.6.7.8", make_record(ttl=60, proxied=False, comment=None)) == [
+        "content",
+        "ttl",
+        "comment",
+    ]
+
+
+def test_diff_ignores_ttl_of_proxied_records() -> None:
+    desired = DNSRecordConfig(name="home.example.com", ttl=120, proxied=True)
+
+    assert diff_record(desired, "1.2.3.4", make_record(ttl=1, proxied=True)) == []
+
+
+def test_diff_resets_ttl_when_leaving_proxy() -> None:
+    desired = DNSRecordConfig(name="home.example.com", ttl=1)
+
+    assert diff_record(desired, "1.2.3.4", make_record(ttl=1, proxied=True)) == ["proxied", "ttl"]
+
+
+def test_diff_leaves_unmanaged_comment_alone() -> None:
+    desired = DNSRecordConfig(name="home.example.com")
+
+    assert diff_record(desired, "1.2.3.4", make_record(comment="edited by hand")) == []
@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+
+from app.config import Config, DNSRecordConfig, ZoneConfig
+from app.main import reload_records
+from app.src.dns_updater import DNSUpdater
+from app.src.models import DNSRecord
+from app.src.multi_zone import MultiZoneUpdater
+from app.src.reload import ReloadTrigger
+
+
+@pytest.mark.asyncio
+async def test_set_records_reconciles_only_added_and_changed_records(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    cf_client = cloudflare_client_factory(
+        records={
+            "keep.example.com": DNSRecord(id="rec-1", name="keep.example.com", content="1.2.3.4", ttl=300),
+            "change.example.com": DNSRecord(id="rec-2", name="change.example.com", content="1.2.3.4", ttl=300),
+        },
+    )
+    keep = DNSRecordConfig(name="keep.example.com")
+    updater = updater_factory(
+        ip_detector_factory("1.2.3.4"),
+        cf_client,
+        [keep, DNSRecordConfig(name="change.example.com"), DNSRecordConfig(name="drop.example.com")],
+    )
+    await updater.update()
+    cf_client.listed_names.clear()
+    cf_client.created_calls.clear()
+
+    updater.set_records(
+        [keep, DNSRecordConfig(name="change.example.com", ttl=60), DNSRecordConfig(name="new.example.com")],
+    )
+    changed = await updater.update()
+
+    assert changed is True
+    assert cf_client.listed_names == [["new.example.com"]]
+    assert [call["name"] for call in cf_client.created_calls] == ["new.example.com"]
+    assert cf_client.updated_calls[-1] == {"id": "rec-2", "name": "change.example.com", "ttl": "60"}
+    assert [r.name for r in updater.status().records] == ["keep.example.com", "change.example.com", "new.example.com"]
+    assert await updater.update() is False
+
+
+@pytest.mark.asyncio
+async def test_set_records_without_detector_keeps_configuration(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    updater = updater_factory(
+        ip_detector_factory("1.2.3.4"),
+        cloudflare_client_factory(),
+        [DNSRecordConfig(name="a.example.com")],
+    )
+
+    with pytest.raises(ValueError, match="AAAA"):
+        updater.set_records([DNSRecordConfig(name="a.example.com", type="both")])
+
+    assert updater.record_types == {"A"}
+    assert [r.name for r in updater.status().records] == ["a.example.com"]
+
+
+@pytest.mark.asyncio
+async def test_multi_zone_reload_keeps_existing_zones_and_builds_new_ones(
+    ip_detector_factory,
+    cloudflare_client_factory,
+) -> None:
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone")
+    ip_detector = ip_detector_factory("1.2.3.4")
+    clients = {zone_id: cloudflare_client_factory(zone_id=zone_id) for zone_id in ("one", "two")}
+    built: list[str] = []
+
+    async def build(zones: list[ZoneConfig]) -> list[DNSUpdater]:
+        built.extend(zone.zone_id or "" for zone in zones)
+        return [DNSUpdater(config, ip_detector, clients[zone.zone_id or ""], zone.records) for zone in zones]
+
+    zone_one = ZoneConfig(zone_id="one", api_token="token", records=[DNSRecordConfig(name="a.one.example")])
+    updaters = await build([zone_one])
+    multi_zone = MultiZoneUpdater({"A": ip_detector}, updaters, zones=[zone_one], build_updaters=build)
+    await multi_zone.update()
+
+    zone_two = ZoneConfig(zone_id="two", api_token="token", records=[DNSRecordConfig(name="b.two.example")])
+    await multi_zone.reload([zone_one, zone_two], {"A": ip_detector})
+    await multi_zone.update()
+
+    assert built == ["one", "two"]
+    assert [zone.zone_id for zone in multi_zone.status().zones] == ["one", "two"]
+    assert len(clients["one"].created_calls) == 1
+    assert [call["name"] for call in clients["two"].created_calls] == ["b.two.example"]
+
+
+@pytest.mark.asyncio
+async def test_reload_records_keeps_previous_configuration_when_invalid(
+    tmp_path,
+    ip_detector_factory,
+    cloudflare_client_factory,
+) -> None:
+    records_path = tmp_path / "records.json"
+    records_path.write_text(json.dumps({"records": []}))
+    config = Config(cloudflare_api_token="token", cloudflare_zone_id="zone", records_config_path=str(records_path))
+    ip_detector = ip_detector_factory("1.2.3.4")
+    zone = ZoneConfig(zone_id="zone", api_token="token", records=[DNSRecordConfig(name="a.example.com")])
+
+    async def build(zones: list[ZoneConfig]) -> list[DNSUpdater]:
+        return [DNSUpdater(config, ip_detector, cloudflare_client_factory(), z.records) for z in zones]
+
+    multi_zone = MultiZoneUpdater({"A": ip_detector}, await build([zone]), zones=[zone], build_updaters=build)
+
+    await reload_records(config, multi_zone, {"A": ip_detector})
+
+    assert [r.name for r in multi_zone.status().zones[0].records] == ["a.example.com"]
+
+
+@pytest.mark.asyncio
+async def test_reload_trigger_detects_file_changes(tmp_path) -> None:
+    records_path = tmp_path / "records.json"
+    records_path.write_text("{}")
+    trigger = ReloadTrigger(records_path, poll_interval=0.01)
+    trigger.start()
+    try:
+        assert trigger.consume() is False
+        replacement = tmp_path / "records.json.new"
+        replacement.write_text('{"records": []}')
+        replacement.replace(records_path)
+        await asyncio.wait_for(trigger.event.wait(), timeout=1)
+    finally:
+        await trigger.stop()
+
+    assert trigger.consume() is True
+    assert trigger.consume() is False
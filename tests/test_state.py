@@ -0,0 +1,65 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import DNSRecordConfig
+from app.src.state import RecordState, StateStore, ZoneState, records_config_hash
+
+
+def make_state(config_hash: str = "hash", verified_at: float | None = None) -> ZoneState:
+    return ZoneState(
+        config_hash=config_hash,
+        last_ips={"A": "1.2.3.4"},
+        verified_at=time.time() if verified_at is None else verified_at,
+        records={"A home.example.com": RecordState(id="rec-1", content="1.2.3.4", ttl=300, proxied=False)},
+    )
+
+
+@pytest.mark.asyncio
+async def test_state_round_trips_through_file(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    await StateStore(path).save("zone", make_state())
+
+    restored = StateStore(path).load("zone", "hash", max_age=60)
+
+    assert restored is not None
+    assert restored.last_ips == {"A": "1.2.3.4"}
+    assert restored.records["A home.example.com"].id == "rec-1"
+    assert not (tmp_path / "state.json.tmp").exists()
+
+
+@pytest.mark.asyncio
+async def test_state_keeps_zones_separate(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    store = StateStore(path)
+    await store.save("zone-a", make_state())
+    await store.save("zone-b", make_state(config_hash="other"))
+
+    data = json.loads(path.read_text())
+
+    assert set(data["zones"]) == {"zone-a", "zone-b"}
+    assert StateStore(path).load("zone-a", "other", max_age=60) is None
+
+
+@pytest.mark.asyncio
+async def test_state_ignores_expired_entries(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    await StateStore(path).save("zone", make_state(verified_at=time.time() - 120))
+
+    assert StateStore(path).load("zone", "hash", max_age=60) is None
+
+
+def test_state_ignores_corrupt_file(tmp_path: Path) -> None:
+    path = tmp_path / "state.json"
+    path.write_text("not-json")
+
+    assert StateStore(path).load("zone", "hash", max_age=60) is None
+
+
+def test_records_config_hash_ignores_order() -> None:
+    first = [DNSRecordConfig(name="a.example.com"), DNSRecordConfig(name="b.example.com", ttl=60)]
+
+    assert records_config_hash(first) == records_config_hash(list(reversed(first)))
+    assert records_config_hash(first) != records_config_hash([DNSRecordConfig(name="a.example.com")])
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from app.config import DNSRecordConfig
+from app.src.models import DNSRecord
+from app.src.state import records_config_hash
+from app.src.verify_schedule import VerifySchedule
+
+
+def test_first_due_times_are_spread_over_the_interval() -> None:
+    schedule = VerifySchedule()
+    schedule.set_intervals({f"host{i}.example.com/A": 100.0 for i in range(100)}, now=0.0)
+
+    due = [len(schedule.pop_due(now)) for now in (25.0, 50.0, 75.0, 100.0)]
+
+    assert sum(due) == 100
+    assert all(count < 50 for count in due)
+
+
+def test_due_record_is_rescheduled_after_verification() -> None:
+    schedule = VerifySchedule()
+    schedule.set_intervals({"a/A": 10.0}, now=0.0)
+    (first,) = schedule.pop_due(10.0)
+
+    assert schedule.next_due() is None
+    schedule.verified(first, now=12.0)
+    assert schedule.next_due() == 22.0
+    schedule.verified(first, now=15.0)
+    assert schedule.next_due() == 22.0
+
+
+def test_removed_and_changed_intervals() -> None:
+    schedule = VerifySchedule()
+    schedule.set_intervals({"a/A": 10.0, "b/A": 10.0}, now=0.0)
+    schedule.set_intervals({"a/A": 1000.0}, now=0.0)
+
+    assert schedule.pop_due(10.0) == []
+    assert schedule.pop_due(1000.0) == ["a/A"]
+
+
+def test_scheduling_fields_do_not_change_config_hash() -> None:
+    plain = [DNSRecordConfig(name="vpn.example.com")]
+    scheduled = [DNSRecordConfig(name="vpn.example.com", priority=10, verify_interval=60)]
+
+    assert records_config_hash(plain) == records_config_hash(scheduled)
+
+
+@pytest.mark.asyncio
+async def test_higher_priority_records_are_written_first(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+) -> None:
+    cf_client = cloudflare_client_factory()
+    records = [
+        DNSRecordConfig(name="www.example.com"),
+        DNSRecordConfig(name="vpn.example.com", priority=10),
+        DNSRecordConfig(name="mail.example.com", priority=5),
+        DNSRecordConfig(name="ftp.example.com"),
+    ]
+    updater = updater_factory(ip_detector_factory("1.2.3.4"), cf_client, records, max_concurrency=1)
+
+    await updater.update()
+
+    assert [call["name"] for call in cf_client.created_calls] == [
+        "vpn.example.com",
+        "mail.example.com",
+        "www.example.com",
+        "ftp.example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_due_records_are_verified_individually(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+    monkeypatch,
+) -> None:
+    cf_client = cloudflare_client_factory(
+        records={
+            "vpn.example.com": DNSRecord(id="rec-1", name="vpn.example.com", content="1.2.3.4", ttl=300),
+            "www.example.com": DNSRecord(id="rec-2", name="www.example.com", content="1.2.3.4", ttl=300),
+        },
+    )
+    records = [DNSRecordConfig(name="vpn.example.com", verify_interval=60), DNSRecordConfig(name="www.example.com")]
+    updater = updater_factory(ip_detector_factory("1.2.3.4"), cf_client, records)
+    await updater.update()
+    assert cf_client.list_calls == 1
+    assert updater.next_verification is not None
+
+    cf_client.records["vpn.example.com"] = DNSRecord(id="rec-1", name="vpn.example.com", content="9.9.9.9", ttl=300)
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    changed = await updater.update()
+
+    assert changed is True
+    assert cf_client.list_calls == 1
+    assert cf_client.get_calls == 1
+    assert cf_client.updated_calls[-1]["name"] == "vpn.example.com"
+    assert updater.next_verification == pytest.approx(later + 60)
+    assert await updater.update() is False
+
+
+@pytest.mark.asyncio
+async def test_drift_sweep_leaves_records_with_their_own_interval_alone(
+    ip_detector_factory,
+    cloudflare_client_factory,
+    updater_factory,
+    monkeypatch,
+) -> None:
+    cf_client = cloudflare_client_factory(
+        records={
+            "vpn.example.com": DNSRecord(id="rec-1", name="vpn.example.com", content="1.2.3.4", ttl=300),
+            "www.example.com": DNSRecord(id="rec-2", name="www.example.com", content="1.2.3.4", ttl=300),
+        },
+    )
+    records = [DNSRecordConfig(name="vpn.example.com", verify_interval=86400), DNSRecordConfig(name="www.example.com")]
+    updater = updater_factory(ip_detector_factory("1.2.3.4"), cf_client, records, bulk_fetch=False)
+    await updater.update()
+    calls = cf_client.get_calls
+
+    cf_client.records["www.example.com"] = DNSRecord(id="rec-2", name="www.example.com", content="9.9.9.9", ttl=300)
+    later = time.time() + 3700
+    monkeypatch.setattr(time, "time", lambda: later)
+    changed = await updater.update()
+
+    assert changed is True
+    assert cf_client.get_calls == calls + 1
+    assert [call["name"] for call in cf_client.updated_calls] == ["www.example.com"]